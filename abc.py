@@ -1,4 +1,7 @@
-from deep_translator import GoogleTranslator
+import time
+
+from fanout import FanOut
+from translation_backends import build_chain
 
 # List of languages to test
 languages = {
@@ -12,11 +15,21 @@ languages = {
 # Text to translate
 text_to_translate = "Hello i am good, how are you"
 
-# Loop through each language and test translation
-for language_name, language_code in languages.items():
-    try:
-        # Perform translation
-        translated_text = GoogleTranslator(source="en", target=language_code).translate(text_to_translate)
-        print(f"{language_name} Translation: {translated_text}")
-    except Exception as e:
-        print(f"Translation failed for {language_name}: {e}")
+# Same backends, timeouts and circuit breakers as the app (LIBRETRANSLATE_URL is not set here)
+translator = build_chain('google,mymemory', timeouts='10')
+
+# All languages at once: total time is about the slowest language, not the sum
+tasks = {
+    language_name: (lambda code=language_code: translator.translate(text_to_translate, "en", code))
+    for language_name, language_code in languages.items()
+}
+started = time.perf_counter()
+for result in FanOut(max_workers=len(tasks)).run(tasks, timeout=20):
+    if result.ok:
+        print(f"{result.key} Translation: {result.value} ({result.seconds}s)")
+    else:
+        print(f"Translation failed for {result.key}: {result.error}")
+print(f"All languages in {time.perf_counter() - started:.2f}s")
+
+# Which backend answered, and how fast
+print(translator.stats())
@@ -1,27 +1,146 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify
+from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify, Response, stream_with_context, send_file, g
 import os
-import torch
-from transformers import MarianMTModel, MarianTokenizer, BertTokenizer, BertModel
-import speech_recognition as sr
-from moviepy.editor import AudioFileClip
-from googletrans import Translator  # Using googletrans for fallback
-from gtts import gTTS
-import uuid
-import time, random
+import sys
+import threading
+import time, random, json, hashlib, sqlite3, io
+import click
 from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import selectinload, joinedload
+from model_registry import ModelRegistry, parse_pairs
+from model_routing import ModelRouter, load_routes, local_model_path
+from translation_cache import TranslationCache
+from batching import BatchScheduler
+from inference_backends import make_loader
+from tts_cache import TTSCache
+from audio_janitor import AudioJanitor
+from quiz_import import QuizImportError, parse_quiz_file, bulk_insert_quizzes
+from speech_pipeline import (SpeechSession, SpeechSessionStore, UnrecognizedSpeech, RecognitionServiceError,
+                             RecordingTooLong, make_recognizer, recognize_file)
+from segmentation import segment_text, join_segments
+from jobs import JobManager, QueueFull, RetryLater
+from translation_backends import TranslationBackendError, build_chain
+from translation_memory import TranslationMemory, read_parallel_file, read_parallel_dataset
+from fanout import FanOut
+from static_assets import AssetBuilder, StaticAssets
+import metrics
+from metrics import span
 
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "ABC"
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
 app.config['UPLOAD_FOLDER'] = 'static/saved_audios'
+# Total size allowed for cached TTS audio before least recently used files are removed
+app.config['TTS_CACHE_MAX_MB'] = int(os.environ.get('TTS_CACHE_MAX_MB', 500))
+# Background cleanup of the audio folder: maximum file age, total size and how often it runs
+app.config['AUDIO_MAX_AGE_SECONDS'] = int(os.environ.get('AUDIO_MAX_AGE_SECONDS', 86400))
+app.config['AUDIO_FOLDER_MAX_MB'] = int(os.environ.get('AUDIO_FOLDER_MAX_MB', 1024))
+app.config['AUDIO_CLEANUP_INTERVAL'] = int(os.environ.get('AUDIO_CLEANUP_INTERVAL', 300))
+# Speech recognition for audio recorded in the browser: google (online) or vosk (offline, one model per language)
+app.config['SPEECH_BACKEND'] = os.environ.get('SPEECH_BACKEND', 'google')
+app.config['VOSK_MODEL_DIR'] = os.environ.get('VOSK_MODEL_DIR', 'models/vosk')
+app.config['SPEECH_MAX_UPLOAD_MB'] = int(os.environ.get('SPEECH_MAX_UPLOAD_MB', 10))
+app.config['SPEECH_SESSION_TIMEOUT'] = int(os.environ.get('SPEECH_SESSION_TIMEOUT', 120))
+# MarianMT model registry: pairs loaded at startup and limits for keeping models in memory
+app.config['PRELOAD_MODEL_PAIRS'] = parse_pairs(os.environ.get('PRELOAD_MODEL_PAIRS', 'en-hi'))
+# torch/transformers load on first use.  At startup the preload models are loaded
+# in the background (background), before serving (blocking) or not at all (lazy).
+app.config['WARMUP'] = os.environ.get('WARMUP', 'background')
+# Under wsgi.py the preload models are loaded once in the parent before the workers fork,
+# so their weights are shared copy-on-write instead of loaded once per worker
+app.config['PRELOAD_BEFORE_FORK'] = os.environ.get('PRELOAD_BEFORE_FORK', '1') == '1'
+app.config['MODEL_REGISTRY_MAX_MODELS'] = int(os.environ.get('MODEL_REGISTRY_MAX_MODELS', 4))
+app.config['MODEL_REGISTRY_MAX_MEMORY_MB'] = int(os.environ.get('MODEL_REGISTRY_MAX_MEMORY_MB', 2048))
+app.config['MODEL_REGISTRY_IDLE_SECONDS'] = int(os.environ.get('MODEL_REGISTRY_IDLE_SECONDS', 1800))
+# MarianMT inference backend: torch, torch-int8, onnx or ctranslate2 (see convert_model.py)
+app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', 'torch')
+app.config['INFERENCE_THREADS'] = int(os.environ.get('INFERENCE_THREADS', 0))  # 0 keeps the library default
+app.config['NUM_BEAMS'] = int(os.environ.get('NUM_BEAMS', 0))  # 1 is greedy search, 0 keeps the model default
+app.config['MAX_NEW_TOKENS'] = int(os.environ.get('MAX_NEW_TOKENS', 0))
+app.config['CONVERTED_MODEL_DIR'] = os.environ.get('CONVERTED_MODEL_DIR', 'models/converted')
+# Local MarianMT models for every pair (see model_routing.py).  MODEL_DIR holds local copies
+# of the hub models (flask download-models fills it) for machines without network access;
+# MODEL_ROUTES_FILE is an optional JSON file that replaces routes, e.g. with tiny test models.
+app.config['MODEL_DIR'] = os.environ.get('MODEL_DIR', 'models/marian')
+app.config['MODEL_ROUTES_FILE'] = os.environ.get('MODEL_ROUTES_FILE', '')
+# Shared translation cache; set TRANSLATION_CACHE_DB to an empty string to keep it in memory only
+app.config['TRANSLATION_CACHE_SIZE'] = int(os.environ.get('TRANSLATION_CACHE_SIZE', 10000))
+app.config['TRANSLATION_CACHE_TTL'] = int(os.environ.get('TRANSLATION_CACHE_TTL', 7 * 86400))
+app.config['TRANSLATION_CACHE_DB'] = os.environ.get('TRANSLATION_CACHE_DB', os.path.join(app.instance_path, 'translation_cache.db'))
+# MarianMT micro-batching: how long to wait for more requests and how large a batch may get
+app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', 16))
+app.config['BATCH_MAX_WAIT_MS'] = int(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+app.config['BATCH_MAX_TOKENS'] = int(os.environ.get('BATCH_MAX_TOKENS', 4096))
+app.config['BATCH_API_MAX_TEXTS'] = int(os.environ.get('BATCH_API_MAX_TEXTS', 256))
+# Long texts are split into segments no longer than this and streamed back in growing groups
+app.config['SEGMENT_MAX_CHARS'] = int(os.environ.get('SEGMENT_MAX_CHARS', 400))
+app.config['STREAM_GROUP_SIZE'] = int(os.environ.get('STREAM_GROUP_SIZE', 8))
+# Near-duplicate inputs (casing, punctuation, small edits) reuse stored translations; '' turns it off
+app.config['TRANSLATION_MEMORY_DB'] = os.environ.get('TRANSLATION_MEMORY_DB', os.path.join(app.instance_path, 'translation_memory.db'))
+app.config['TRANSLATION_MEMORY_THRESHOLD'] = float(os.environ.get('TRANSLATION_MEMORY_THRESHOLD', 0.9))
+app.config['TRANSLATION_MEMORY_LEARN'] = os.environ.get('TRANSLATION_MEMORY_LEARN', '1') == '1'  # Store new MT output too
+# Online translators, tried in order; "http" is a LibreTranslate-compatible server
+app.config['TRANSLATION_BACKENDS'] = os.environ.get('TRANSLATION_BACKENDS', 'google,mymemory,http')
+app.config['TRANSLATION_TIMEOUTS'] = os.environ.get('TRANSLATION_TIMEOUTS', '10')  # "10" or "google:3,http:1.5"
+app.config['TRANSLATION_HEDGE_MS'] = int(os.environ.get('TRANSLATION_HEDGE_MS', 0))  # 0 turns hedged requests off
+app.config['TRANSLATION_BREAKER_FAILURES'] = int(os.environ.get('TRANSLATION_BREAKER_FAILURES', 5))
+app.config['TRANSLATION_BREAKER_RESET'] = int(os.environ.get('TRANSLATION_BREAKER_RESET', 30))
+app.config['LIBRETRANSLATE_URL'] = os.environ.get('LIBRETRANSLATE_URL', '')
+app.config['LIBRETRANSLATE_API_KEY'] = os.environ.get('LIBRETRANSLATE_API_KEY', '')
+# One text into many languages at once
+app.config['FANOUT_WORKERS'] = int(os.environ.get('FANOUT_WORKERS', 16))
+app.config['FANOUT_DEADLINE_SECONDS'] = float(os.environ.get('FANOUT_DEADLINE_SECONDS', 20))
+# Background translate -> TTS jobs
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', 100))  # Waiting jobs before new ones get a 503
+app.config['JOB_MAX_RETRIES'] = int(os.environ.get('JOB_MAX_RETRIES', 3))
+app.config['JOB_RETRY_DELAY'] = float(os.environ.get('JOB_RETRY_DELAY', 0.5))  # First backoff, doubled on every retry
+app.config['JOB_KEEP_SECONDS'] = int(os.environ.get('JOB_KEEP_SECONDS', 600))  # How long finished jobs can be polled
+# Requests slower than this log their stage-by-stage timings as one JSON line
+app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 2000))
+# With profiling enabled, a request that sends the PROFILE_HEADER header is run under cProfile
+# and its .prof file is written to PROFILE_DIR.  Keep it off in production.
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '0') == '1'
+app.config['PROFILE_HEADER'] = os.environ.get('PROFILE_HEADER', 'X-Profile')
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+# Hashed, resized and precompressed copies of css/, js/, lib/ and img/ made by `flask build-assets`
+app.config['ASSETS_DIR'] = os.environ.get('ASSETS_DIR', os.path.join(app.instance_path, 'assets'))
+app.config['ASSET_IMAGE_WIDTHS'] = os.environ.get('ASSET_IMAGE_WIDTHS', '320,640,1024,1600')
 
 
 db = SQLAlchemy(app)
 bcrypt = Bcrypt(app)
 
 
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets quiz pages keep reading while an import or admin edit is writing
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.close()
+
+# Every SQL statement is a span, so slow pages show how much of their time was spent in the database
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    metrics.record('sql', time.perf_counter() - conn.info['query_started'].pop(), backend=conn.dialect.name)
+
+@event.listens_for(Engine, 'handle_error')
+def drop_query_timer(exception_context):
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
@@ -33,111 +152,384 @@ class User(db.Model):
 
 class Quizes(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    language = db.Column(db.String(1000), nullable=False)
+    language = db.Column(db.String(1000), nullable=False, index=True)
     question = db.Column(db.String(1000), nullable=False)
+    # Load with selectinload(Quizes.options) to fetch the options of many quizzes in one query
+    # Deleting a quiz deletes its options with it
+    options = db.relationship('Options', backref='quiz', order_by='Options.id', cascade='all, delete-orphan')
 
 class Options(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     opt = db.Column(db.String(500), nullable=False)
     answer = db.Column(db.Boolean, nullable=False)
-    question_id = db.Column(db.Integer, nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('quizes.id'), nullable=False, index=True)
 
-# ======= ContextAwareTranslator Class with Retry and Caching =======
-from deep_translator import GoogleTranslator  # Ensure this is at the top
+class TranslatedOption(db.Model):
+    # Stored translation of a quiz option, filled when quizzes are saved so that
+    # rendering a quiz page never calls a translation service.
+    # content_hash is the hash of the option text it was made from; a mismatch means it is stale.
+    id = db.Column(db.Integer, primary_key=True)
+    option_id = db.Column(db.Integer, db.ForeignKey('options.id'), nullable=False)
+    lang = db.Column(db.String(10), nullable=False)
+    content_hash = db.Column(db.String(40), nullable=False)
+    text = db.Column(db.String(1000), nullable=False)
+    __table_args__ = (db.UniqueConstraint('option_id', 'lang', name='uq_translated_option_lang'),)
 
-class ContextAwareTranslator:
-    def __init__(self, source_lang='en', target_lang='hi'):
-        self.source_lang = source_lang
-        self.target_lang = target_lang
-        self.translation_cache = {}
+def ensure_indexes():
+    # create_all() only adds indexes to new tables; add them to databases created before they existed
+    for model in (Quizes, Options, TranslatedOption):
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
 
-        # Initialize MarianMT only for Hindi
-        if target_lang == 'hi':
-            self.model_name = f'Helsinki-NLP/opus-mt-{source_lang}-{target_lang}'
-            try:
-                self.model = MarianMTModel.from_pretrained(self.model_name)
-                self.tokenizer = MarianTokenizer.from_pretrained(self.model_name)
-                self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-                self.model.to(self.device)
-                print(f"MarianMT model loaded for {source_lang}-{target_lang}")
-            except Exception as e:
-                print(f"Error loading MarianMT model for Hindi: {e}")
-                self.model = None
-                self.tokenizer = None
-        else:
-            self.model = None
-            self.tokenizer = None
+# SQLite limits the number of bound parameters, so long IN lists are split up
+IN_CHUNK_SIZE = 500
 
-    def translate(self, text, retries=3, delay=1):
-        # Check if translation is already in cache
-        cache_key = (text, self.source_lang, self.target_lang)
-        if cache_key in self.translation_cache:
-            return self.translation_cache[cache_key]
+def chunked(items, size=IN_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
-        # Use MarianMT for Hindi
-        if self.target_lang == 'hi' and self.model and self.tokenizer:
-            try:
-                tokens = self.tokenizer(text, return_tensors='pt', padding=True, truncation=True).to(self.device)
-                translated_tokens = self.model.generate(**tokens)
-                translation = self.tokenizer.decode(translated_tokens[0], skip_special_tokens=True)
-                self.translation_cache[cache_key] = translation
-                return translation
-            except Exception as e:
-                print(f"Error during translation with MarianMT for Hindi: {e}")
+# ======= ContextAwareTranslator Class with Retry and Caching =======
+# Which local model(s) translate each pair: direct, multilingual with a target token, or via English
+model_router = ModelRouter(
+    routes=load_routes(app.config['MODEL_ROUTES_FILE']) if app.config['MODEL_ROUTES_FILE'] else None,
+)
+
+# Shared by every request thread, so each model is loaded once per process
+model_registry = ModelRegistry(
+    loader=make_loader(
+        app.config['INFERENCE_BACKEND'],
+        threads=app.config['INFERENCE_THREADS'],
+        num_beams=app.config['NUM_BEAMS'],
+        max_new_tokens=app.config['MAX_NEW_TOKENS'],
+        converted_dir=app.config['CONVERTED_MODEL_DIR'],
+        model_dir=app.config['MODEL_DIR'],
+    ),
+    max_models=app.config['MODEL_REGISTRY_MAX_MODELS'],
+    max_memory_mb=app.config['MODEL_REGISTRY_MAX_MEMORY_MB'],
+    idle_timeout=app.config['MODEL_REGISTRY_IDLE_SECONDS'],
+)
+
+# Shared by every request thread, keyed on (text, source, target, backend)
+translation_cache = TranslationCache(
+    max_entries=app.config['TRANSLATION_CACHE_SIZE'],
+    ttl_seconds=app.config['TRANSLATION_CACHE_TTL'],
+    db_path=app.config['TRANSLATION_CACHE_DB'] or None,
+)
+
+# Collects concurrent MarianMT requests per model into batched generate() calls
+batch_scheduler = BatchScheduler(
+    model_registry,
+    model_router,
+    max_batch_size=app.config['BATCH_MAX_SIZE'],
+    max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+    max_batch_tokens=app.config['BATCH_MAX_TOKENS'],
+)
+
+# Every online translation goes through here: per-backend timeouts, circuit
+# breakers and optional hedging instead of sleeping between retries
+remote_translator = build_chain(
+    app.config['TRANSLATION_BACKENDS'],
+    timeouts=app.config['TRANSLATION_TIMEOUTS'],
+    hedge_after=app.config['TRANSLATION_HEDGE_MS'] / 1000.0 or None,
+    failure_threshold=app.config['TRANSLATION_BREAKER_FAILURES'],
+    reset_timeout=app.config['TRANSLATION_BREAKER_RESET'],
+    http_url=app.config['LIBRETRANSLATE_URL'] or None,
+    http_api_key=app.config['LIBRETRANSLATE_API_KEY'] or None,
+)
+
+# Fuzzy matches on normalized source segments, shared like the cache
+translation_memory = TranslationMemory(
+    app.config['TRANSLATION_MEMORY_DB'],
+    threshold=app.config['TRANSLATION_MEMORY_THRESHOLD'],
+) if app.config['TRANSLATION_MEMORY_DB'] else None
+
+TRANSLATION_FAILED = "Translation failed"
 
-        # Use deep-translator for other languages
-        for attempt in range(retries):
+class ContextAwareTranslator:
+    def __init__(self, source_lang='en', target_lang='hi', registry=None, cache=None, batcher=None, remote=None,
+                 memory=None, router=None):
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        # Models are borrowed from the registry instead of being loaded per instance
+        self.registry = registry if registry is not None else model_registry
+        self.router = router if router is not None else model_router
+        # The cache outlives this object, so repeated requests actually get hits
+        self.translation_cache = cache if cache is not None else translation_cache
+        self.batcher = batcher if batcher is not None else batch_scheduler
+        self.remote = remote if remote is not None else remote_translator
+        self.memory = memory if memory is not None else translation_memory
+
+    @property
+    def pair(self):
+        return f'{self.source_lang}-{self.target_lang}'
+
+    def _backend(self):
+        # Local models first; online backends only when no route exists or one of its models failed to load
+        hops = self.router.route(self.source_lang, self.target_lang)
+        if hops and all(self.registry.is_available(hop.model) for hop in hops):
+            return 'marian'
+        return 'remote'
+
+    def _cache_key(self, text, backend):
+        # The backend is part of the key so MarianMT and online results are kept apart
+        return (text, self.source_lang, self.target_lang, backend)
+
+    def translate(self, text, failed=TRANSLATION_FAILED):
+        backend = self._backend()
+        with span('translate', backend=backend, pair=self.pair):
+            translation = self.translation_cache.get_or_compute(
+                self._cache_key(text, backend), lambda: self._translate_uncached(text))
+        if translation is None:
+            return failed
+        return translation
+
+    def translate_batch(self, texts, failed=TRANSLATION_FAILED):
+        backend = self._backend()
+        with span('translate', backend=backend, pair=self.pair):
+            return self._translate_batch(texts, backend, failed)
+
+    def _translate_batch(self, texts, backend, failed):
+        results = {}
+        misses = []
+        for text in dict.fromkeys(texts):
+            cached = self.translation_cache.get(self._cache_key(text, backend))
+            if cached is None:
+                cached = self._recall(text)
+                if cached is not None:
+                    self.translation_cache.set(self._cache_key(text, backend), cached)
+            if cached is not None:
+                results[text] = cached
+            else:
+                misses.append(text)
+
+        # Submit every miss at once so the scheduler can batch them together
+        if backend == 'marian':
+            futures = {text: self.batcher.submit(self.source_lang, self.target_lang, text) for text in misses}
+            for text, future in futures.items():
+                try:
+                    results[text] = future.result()
+                except Exception as e:
+                    metrics.EVENTS.inc(event='marian_fallback', backend='marian')
+                    print(f"Error during batched translation with MarianMT: {e}")
+
+        for text in misses:
+            if text not in results:
+                translation = self._translate_remote(text)
+                if translation is None:
+                    continue
+                results[text] = translation
+            self.translation_cache.set(self._cache_key(text, backend), results[text])
+            self._remember(text, results[text], backend)
+
+        return [results.get(text, failed) for text in texts]
+
+    def translate_long(self, text, max_chars=None, failed=TRANSLATION_FAILED):
+        # Translate sentence by sentence so MarianMT never truncates a long paragraph.
+        # With failed=None the whole text is None if any sentence could not be translated.
+        segments = segment_text(text, max_chars or app.config['SEGMENT_MAX_CHARS'])
+        if len(segments) <= 1:
+            return self.translate(text, failed)
+        translations = self.translate_batch([segment for segment, _ in segments], failed)
+        if failed is None and None in translations:
+            return None
+        return join_segments(translations, [separator for _, separator in segments])
+
+    def translate_stream(self, text, max_chars=None, group_size=None):
+        # Yields (index, total, translation, separator) as each segment finishes.
+        # The first group is a single sentence so the first output arrives quickly,
+        # later groups grow to group_size to make better use of batching.
+        segments = segment_text(text, max_chars or app.config['SEGMENT_MAX_CHARS'])
+        group_size = group_size or app.config['STREAM_GROUP_SIZE']
+        index = 0
+        size = 1
+        while index < len(segments):
+            group = segments[index:index + size]
+            translations = self.translate_batch([segment for segment, _ in group])
+            for (_, separator), translation in zip(group, translations):
+                yield index, len(segments), translation, separator
+                index += 1
+            size = min(size * 2, group_size)
+
+    def _translate_uncached(self, text):
+        # A near-identical sentence translated before is reused as is
+        translation = self._recall(text)
+        if translation is not None:
+            return translation
+
+        # Local MarianMT models, batched with other requests for the same model
+        if self._backend() == 'marian':
             try:
-                print(f"Attempting translation using GoogleTranslator for {self.target_lang}")
-                translation = GoogleTranslator(source=self.source_lang, target=self.target_lang).translate(text)
-                self.translation_cache[cache_key] = translation
+                translation = self.batcher.submit(self.source_lang, self.target_lang, text).result()
+                self._remember(text, translation, 'marian')
                 return translation
             except Exception as e:
-                print(f"deep-translator attempt {attempt + 1} failed for {self.target_lang}: {e}")
-                time.sleep(delay)
+                metrics.EVENTS.inc(event='marian_fallback', backend='marian')
+                print(f"Error during translation with MarianMT for {self.source_lang}-{self.target_lang}: {e}")
+
+        translation = self._translate_remote(text)
+        if translation is not None:
+            self._remember(text, translation, 'remote')
+        return translation
+
+    def _recall(self, text):
+        if self.memory is None:
+            return None
+        with span('memory_lookup', backend='translation_memory', pair=self.pair):
+            match = self.memory.lookup(text, self.source_lang, self.target_lang)
+        return match.translation if match is not None else None
+
+    def _remember(self, text, translation, backend):
+        if self.memory is None or not app.config['TRANSLATION_MEMORY_LEARN']:
+            return
+        try:
+            self.memory.add(text, translation, self.source_lang, self.target_lang, origin=backend)
+        except sqlite3.Error as e:
+            print(f"Could not store translation in the translation memory: {e}")
 
-        print(f"Failed to translate text after {retries} attempts for {self.target_lang}.")
-        return "Translation failed"
+    def _translate_remote(self, text):
+        # Online backends for other languages; a provider that keeps failing is skipped, not retried
+        try:
+            with span('remote', backend='online', pair=self.pair):
+                return self.remote.translate(text, self.source_lang, self.target_lang)
+        except TranslationBackendError as e:
+            metrics.EVENTS.inc(event='translation_failed', backend='online')
+            print(f"Failed to translate text to {self.target_lang}: {e}")
+            return None
 
     
 # Define supported languages for gTTS
 SUPPORTED_LANGUAGES = {'en', 'hi', 'ml', 'bn', 'ta', 'te', 'kn', 'mr'}  # Add other supported languages as needed
 
-def text_to_speech(text, lang='en', retries=3):
+# Removes old audio off the request path; started by the first registered file or at startup
+audio_janitor = AudioJanitor(
+    app.config['UPLOAD_FOLDER'],
+    max_age_seconds=app.config['AUDIO_MAX_AGE_SECONDS'],
+    max_bytes=app.config['AUDIO_FOLDER_MAX_MB'] * 1024 * 1024,
+    interval_seconds=app.config['AUDIO_CLEANUP_INTERVAL'],
+)
+
+# Audio is reused for identical (text, lang, slow) instead of calling gTTS every time
+tts_cache = TTSCache(
+    app.config['UPLOAD_FOLDER'],
+    max_bytes=app.config['TTS_CACHE_MAX_MB'] * 1024 * 1024,
+    on_store=audio_janitor.register,
+    on_evict=audio_janitor.forget,
+)
+audio_janitor.on_remove = tts_cache.forget
+
+def tts_language(lang):
     # Check if the language is supported by gTTS, if not, default to 'en'
     if lang not in SUPPORTED_LANGUAGES:
         print(f"Language '{lang}' not supported by gTTS. Defaulting to English.")
-        lang = 'en'
-    
-    # Generate a unique filename for each audio file
-    unique_filename = f'translated_audio_{uuid.uuid4().hex}.mp3'
-    audio_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        return 'en'
+    return lang
+
+def text_to_speech(text, lang='en', retries=3, slow=False):
+    lang = tts_language(lang)
+
+    def synthesize(audio_path):
+        # Retry mechanism
+        for attempt in range(retries):
+            try:
+                from gtts import gTTS  # Imported on first use, like torch and transformers
+                with span('tts', backend='gtts', pair=lang):
+                    tts = gTTS(text=text, lang=lang, slow=slow)
+                    tts.save(audio_path)
+                return True
+            except Exception as e:
+                metrics.EVENTS.inc(event='tts_attempt_failed', backend='gtts')
+                print(f"Attempt {attempt + 1} failed: {e}")
+                if attempt + 1 < retries:
+                    time.sleep(1)  # Wait a bit before retrying
 
-    # Retry mechanism
+        # If all attempts fail, log the error
+        print(f"Failed to convert text to audio after {retries} attempts.")
+        return False
+
+    return tts_cache.get_or_create(text, lang, synthesize, slow=slow)
+
+def stream_sentence_audio(sentence, lang, slow=False, retries=2):
+    # MP3 bytes from gTTS as they arrive.  A failed attempt is only retried if
+    # nothing has been sent yet, since the client already has the earlier bytes.
+    from gtts import gTTS
     for attempt in range(retries):
+        sent = False
         try:
-            tts = gTTS(text=text, lang=lang, slow=False)
-            tts.save(audio_path)
-            return audio_path
+            for chunk in gTTS(text=sentence, lang=lang, slow=slow).stream():
+                sent = True
+                yield chunk
+            return
         except Exception as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            time.sleep(1)  # Wait a bit before retrying
-    
-    # If all attempts fail, log the error and return None
-    print(f"Failed to convert text to audio after {retries} attempts.")
-    return None
-
-# Cleanup function to remove old audio files
-def cleanup_old_files(folder, age_threshold_seconds=86400):  # Default is 24 hours
-    current_time = time.time()
-    for filename in os.listdir(folder):
-        file_path = os.path.join(folder, filename)
-        if os.path.isfile(file_path):
-            file_age = current_time - os.path.getmtime(file_path)
-            if file_age > age_threshold_seconds:
-                os.remove(file_path)
-                print(f"Deleted old file: {file_path}")
+            print(f"Streaming attempt {attempt + 1} failed: {e}")
+            if sent or attempt + 1 == retries:
+                raise
+
+def speech_stream(text, lang, slow=False):
+    # Synthesizes sentence by sentence and yields MP3 frames straight away, so
+    # playback starts after the first sentence.  MP3 frames can be concatenated,
+    # so the complete stream is then stored in the TTS cache for Range requests.
+    audio = bytearray()
+    for sentence, _ in segment_text(text, app.config['SEGMENT_MAX_CHARS']):
+        if not sentence.strip():
+            continue
+        try:
+            for chunk in stream_sentence_audio(sentence, lang, slow):
+                audio.extend(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"Failed to stream audio, stopping after {len(audio)} bytes: {e}")
+            return
+
+    def write(audio_path):
+        with open(audio_path, 'wb') as f:
+            f.write(audio)
+        return True
+
+    if audio:
+        tts_cache.get_or_create(text, lang, write, slow=slow)
+
+# Translation and TTS run here instead of in the request thread.  Steps make a
+# single attempt and raise RetryLater, so backoff happens in the job manager's
+# timer instead of a worker sleeping.
+job_manager = JobManager(
+    max_workers=app.config['JOB_WORKERS'],
+    max_queue=app.config['JOB_QUEUE_SIZE'],
+    max_retries=app.config['JOB_MAX_RETRIES'],
+    base_delay=app.config['JOB_RETRY_DELAY'],
+    keep_seconds=app.config['JOB_KEEP_SECONDS'],
+)
+
+def translate_job_step(job):
+    source_lang = job.payload['source_lang']
+    target_lang = job.payload['target_lang']
+    text = job.result.get('original_text', job.payload.get('text', ''))
+    translator = ContextAwareTranslator(source_lang=source_lang, target_lang=target_lang)
+
+    # Segments that already succeeded are in the translation cache, so a retry only redoes the failed ones
+    translated_text = translator.translate_long(text, failed=None)
+    if translated_text is None:
+        raise RetryLater(f'Could not translate to {target_lang}')
+    job.result['translated_text'] = translated_text
+
+def speech_job_step(job):
+    lang = LANG_CODE_MAPPING_TTS.get(job.payload['target_lang'], 'en')
+    audio_path = text_to_speech(job.result['translated_text'], lang, retries=1)
+    if not audio_path:
+        raise RetryLater('Could not convert the translation to audio')
+    job.result['audio_file'] = audio_path
+
+def submit_job(kind, steps, payload, result=None):
+    # Returns (job, None) or (None, 503 response) when the queue is full
+    try:
+        job = job_manager.submit(kind, steps, payload, result)
+    except QueueFull:
+        response = jsonify({'error': 'The server is busy, please try again shortly.'})
+        response.headers['Retry-After'] = '5'
+        return None, (response, 503)
+    return job, None
 
+def job_accepted(job):
+    return jsonify({'job_id': job.id, 'status_url': url_for('job_status', job_id=job.id)}), 202
 
 @app.route('/translation_text', methods=['GET', 'POST'])
 def translation_text():
@@ -149,58 +541,449 @@ def translation_text():
         # Use the updated ContextAwareTranslator
         translator = ContextAwareTranslator(source_lang=original_lang, target_lang=translated_lang)
 
-        translated_text = translator.translate(user_text)
-        print(f"Translated text: {translated_text}")
+        translated_text = translator.translate_long(user_text)
 
         audio_path = text_to_speech(translated_text, translated_lang)
         if not audio_path:
             flash("Failed to convert text to audio. Please try again later.", "danger")
 
-        cleanup_old_files(app.config['UPLOAD_FOLDER'])  # Clean old files
-
-        return render_template('translation1.html', translated_text=translated_text, audio_file=audio_path)
+        with span('render'):
+            return render_template('translation1.html', translated_text=translated_text, audio_file=audio_path)
     return render_template('translation1.html')
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/translate/stream', methods=['POST'])
+def translate_stream_api():
+    # Accepts the translation1.html form fields or a JSON body and streams
+    # Server-Sent Events: one "segment" event per sentence, then "done".
+    data = request.get_json(silent=True) or request.form
+    source_lang = data.get('originalLanguage') or data.get('source_lang', 'en')
+    target_lang = data.get('translatedLanguage') or data.get('target_lang')
+    user_text = data.get('userText') or data.get('text', '')
+
+    if not target_lang or not user_text.strip():
+        return jsonify({'error': 'Expected a target language and some text to translate.'}), 400
+
+    translator = ContextAwareTranslator(source_lang=source_lang, target_lang=target_lang)
+
+    def events():
+        parts = []
+        for index, total, translation, separator in translator.translate_stream(user_text):
+            parts.append(translation + separator)
+            yield sse_event('segment', {'index': index, 'total': total, 'text': translation, 'separator': separator})
+
+        # The text is complete now; the page streams the audio from audio_url
+        translated_text = ''.join(parts).strip()
+        key = tts_cache.register_text(translated_text, tts_language(LANG_CODE_MAPPING_TTS.get(target_lang, 'en')))
+        yield sse_event('done', {'translated_text': translated_text,
+                                 'audio_url': url_for('stream_speech', key=key)})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Shared by all fan-out requests; targets run concurrently instead of one after another
+fanout = FanOut(max_workers=app.config['FANOUT_WORKERS'])
+
+def translate_fanout(text, source_lang, targets, deadline=None, audio=False):
+    # Yields one result dict per target as it finishes.  MarianMT or the online backends are
+    # picked per target by ContextAwareTranslator; with audio=True each target's TTS runs
+    # right after its translation, so the audio files are made in parallel too.
+    def task(target_lang):
+        translated_text = ContextAwareTranslator(source_lang=source_lang, target_lang=target_lang).translate_long(
+            text, failed=None)
+        if translated_text is None:
+            raise TranslationBackendError(f'Could not translate to {target_lang}')
+        result = {'translated_text': translated_text}
+        if audio:
+            result['audio_file'] = text_to_speech(translated_text, LANG_CODE_MAPPING_TTS.get(target_lang, 'en'),
+                                                  retries=1)
+        return result
+
+    tasks = {target_lang: (lambda target_lang=target_lang: task(target_lang)) for target_lang in targets}
+    for result in fanout.run(tasks, timeout=deadline):
+        row = {'target_lang': result.key, 'status': 'ok' if result.ok else 'error', 'seconds': result.seconds}
+        if result.ok:
+            row.update(result.value)
+        else:
+            row['status'] = 'timeout' if result.error == 'timeout' else 'error'
+            row['error'] = result.error
+        yield row
+
+@app.route('/api/translate/fanout', methods=['POST'])
+def translate_fanout_api():
+    # JSON body: {"text": "...", "source_lang": "en", "targets": ["hi", "ta"], "audio": false,
+    #             "deadline_ms": 20000, "stream": true}
+    # Without targets, every supported language except the source.  With stream (the default)
+    # the response is NDJSON: one line per target as it finishes, then a "done" line.
+    data = request.get_json(silent=True) or {}
+    text = data.get('text', '')
+    source_lang = data.get('source_lang', 'en')
+    if not isinstance(source_lang, str):
+        return jsonify({'error': 'Expected source_lang to be a language code.'}), 400
+    targets = data.get('targets') or sorted(SUPPORTED_LANGUAGES - {source_lang})
+    if not isinstance(text, str) or not text.strip() or not isinstance(targets, list):
+        return jsonify({'error': 'Expected some text and a list of target languages.'}), 400
+    if not all(isinstance(target, str) for target in targets):
+        return jsonify({'error': 'Expected every target language to be a language code.'}), 400
+    unsupported = [target for target in targets if target not in SUPPORTED_LANGUAGES]
+    if unsupported:
+        return jsonify({'error': f"Unsupported target languages: {', '.join(map(str, unsupported))}"}), 400
+
+    try:
+        deadline_ms = float(data.get('deadline_ms') or app.config['FANOUT_DEADLINE_SECONDS'] * 1000)
+    except (TypeError, ValueError):
+        deadline_ms = None
+    if deadline_ms is None or not 0 < deadline_ms < float('inf'):  # Also rejects NaN
+        return jsonify({'error': 'Expected deadline_ms to be a positive number of milliseconds.'}), 400
+    deadline = min(deadline_ms / 1000.0, app.config['FANOUT_DEADLINE_SECONDS'])
+    audio = bool(data.get('audio'))
+    targets = list(dict.fromkeys(targets))
+
+    if not data.get('stream', True):
+        started = time.perf_counter()
+        results = {row.pop('target_lang'): row for row in translate_fanout(text, source_lang, targets, deadline, audio)}
+        return jsonify({'source_lang': source_lang, 'results': results,
+                        'seconds': round(time.perf_counter() - started, 3)})
+
+    def lines():
+        started = time.perf_counter()
+        for row in translate_fanout(text, source_lang, targets, deadline, audio):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        yield json.dumps({'done': True, 'seconds': round(time.perf_counter() - started, 3)}) + '\n'
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/translate/batch', methods=['POST'])
+def translate_batch_api():
+    # JSON body: {"source_lang": "en", "target_lang": "hi", "texts": ["...", "..."]}
+    data = request.get_json(silent=True) or {}
+    source_lang = data.get('source_lang', 'en')
+    target_lang = data.get('target_lang')
+    texts = data.get('texts')
+
+    if not target_lang or not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': 'Expected target_lang and a list of strings in texts.'}), 400
+    if len(texts) > app.config['BATCH_API_MAX_TEXTS']:
+        return jsonify({'error': f"At most {app.config['BATCH_API_MAX_TEXTS']} texts per request."}), 413
+
+    translator = ContextAwareTranslator(source_lang=source_lang, target_lang=target_lang)
+    translations = translator.translate_batch(texts)
+    return jsonify({
+        'source_lang': source_lang,
+        'target_lang': target_lang,
+        'translations': translations,
+    })
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    # Hit/miss/eviction counters used to size the caches
+    return jsonify({
+        'translation_cache': translation_cache.stats(),
+        'model_registry': model_registry.stats(),
+        'batching': batch_scheduler.stats(),
+        'tts_cache': tts_cache.stats(),
+        'audio_janitor': audio_janitor.stats(),
+        'translation_memory': translation_memory.stats() if translation_memory is not None else None,
+    })
+
+@app.route('/api/tts', methods=['POST'])
+def register_speech():
+    # JSON body: {"text": "...", "lang": "hi", "slow": false}.  Returns the URL to play;
+    # nothing is synthesized until that URL is requested.
+    data = request.get_json(silent=True) or request.form
+    text = data.get('text', '')
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({'error': 'Expected some text to speak.'}), 400
+    lang = tts_language(LANG_CODE_MAPPING_TTS.get(data.get('lang', 'en'), 'en'))
+    key = tts_cache.register_text(text, lang, slow=bool(data.get('slow')))
+    return jsonify({'audio_url': url_for('stream_speech', key=key), 'cached': tts_cache.cached_path(key) is not None})
+
+@app.route('/api/tts/stream/<key>')
+def stream_speech(key):
+    # Finished audio is sent from the cache with Range/ETag support (send_file answers
+    # Range requests with 206); otherwise it is synthesized and streamed with chunked
+    # transfer.  Streams cannot seek, so a Range request that does not start at 0 waits
+    # for the whole file instead.
+    if not key.isalnum():
+        return jsonify({'error': 'Unknown audio.'}), 404
+    path = tts_cache.cached_path(key)
+    if path is None:
+        registered = tts_cache.registered_text(key)
+        if registered is None:
+            return jsonify({'error': 'Unknown or expired audio.'}), 404
+        text, lang, slow = registered
+        range_header = request.headers.get('Range', '')
+        if not range_header or range_header.replace(' ', '') == 'bytes=0-':
+            return Response(stream_with_context(speech_stream(text, lang, slow)), mimetype='audio/mpeg',
+                            headers={'Cache-Control': 'no-cache', 'Accept-Ranges': 'none', 'X-Accel-Buffering': 'no'})
+        path = text_to_speech(text, lang, slow=slow)
+        if not path:
+            return jsonify({'error': 'Failed to convert text to audio.'}), 503
+    return send_file(os.path.abspath(path), mimetype='audio/mpeg', conditional=True, max_age=86400)
+
+@app.route('/api/translate/backends')
+def translation_backend_stats():
+    # Circuit breaker state, timeouts, latency and hedging counters per online backend
+    return jsonify(remote_translator.stats())
+
+@app.route('/api/translate/routes')
+def translation_routes():
+    # Local model route for every supported pair; pairs missing here use the online backends
+    routes = model_router.table(sorted(SUPPORTED_LANGUAGES))
+    for hops in routes.values():
+        for hop in hops:
+            hop['available'] = model_registry.is_available(hop['model'])
+    return jsonify({'routes': routes, 'model_dir': app.config['MODEL_DIR']})
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    g.trace_token = metrics.start_trace()
+    g.profile = None
+    if app.config['PROFILING_ENABLED'] and request.headers.get(app.config['PROFILE_HEADER']):
+        g.profile = metrics.start_profile()
+
+@app.after_request
+def finish_request_timing(response):
+    # Streamed bodies are produced after this point, so their stages are not part of the request trace
+    if 'request_started' not in g:
+        return response
+    seconds = time.perf_counter() - g.request_started
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.REQUEST_SECONDS.observe(seconds, endpoint=endpoint, method=request.method, status=response.status_code)
+
+    spans = metrics.current_trace()
+    if spans:
+        response.headers['Server-Timing'] = metrics.server_timing(spans)
+    if seconds * 1000 >= app.config['SLOW_REQUEST_MS']:
+        print(json.dumps({'slow_request': endpoint, 'method': request.method, 'status': response.status_code,
+                          'ms': round(seconds * 1000, 1), 'spans': spans}))
+
+    if g.profile is not None:
+        path, summary = metrics.finish_profile(g.profile, app.config['PROFILE_DIR'], request.endpoint or 'request')
+        g.profile = None
+        response.headers['X-Profile-File'] = os.path.basename(path)
+        print(summary)
+    return response
+
+@app.teardown_request
+def end_request_timing(exception=None):
+    if g.get('profile') is not None:
+        g.profile.disable()  # The request failed before after_request
+    if 'trace_token' in g:
+        metrics.end_trace(g.pop('trace_token'))
+
+def collect_app_metrics():
+    # Counters and gauges the caches, queues and breakers already keep, read when /metrics is scraped
+    translation = translation_cache.stats()
+    tts = tts_cache.stats()
+    lookups = [
+        ({'cache': 'translation', 'result': 'hit'}, translation['hits']),
+        ({'cache': 'translation', 'result': 'disk_hit'}, translation['disk_hits']),
+        ({'cache': 'translation', 'result': 'miss'}, translation['misses']),
+        ({'cache': 'tts', 'result': 'hit'}, tts['hits']),
+        ({'cache': 'tts', 'result': 'miss'}, tts['misses']),
+    ]
+    if translation_memory is not None:
+        memory = translation_memory.stats()
+        lookups += [
+            ({'cache': 'translation_memory', 'result': 'hit'}, memory['exact_hits']),
+            ({'cache': 'translation_memory', 'result': 'fuzzy_hit'}, memory['fuzzy_hits']),
+            ({'cache': 'translation_memory', 'result': 'miss'}, memory['misses']),
+        ]
+    registry = model_registry.stats()
+    jobs = job_manager.stats()
+    batching = batch_scheduler.stats()
+    backends = remote_translator.stats()['backends']
+    return [
+        ('app_cache_lookups', 'counter', 'Cache lookups by cache and result', lookups),
+        ('app_models_loaded', 'gauge', 'MarianMT models in memory', [({}, len(registry['models']))]),
+        ('app_model_memory_bytes', 'gauge', 'Memory used by loaded models', [({}, registry['memory_mb'] * 1024 * 1024)]),
+        ('app_marian_batches', 'counter', 'generate() calls made by the batch scheduler', [({}, batching['batches'])]),
+        ('app_marian_batched_items', 'counter', 'Texts translated by the batch scheduler', [({}, batching['items'])]),
+        ('app_job_queue_depth', 'gauge', 'Background jobs waiting for a worker', [({}, jobs['queue_depth'])]),
+        ('app_jobs_rejected', 'counter', 'Jobs refused because the queue was full', [({}, jobs['rejected'])]),
+        ('app_backend_circuit_open', 'gauge', '1 while an online backend is skipped by its circuit breaker',
+         [({'backend': name}, int(state['state'] == 'open')) for name, state in backends.items()]),
+    ]
+
+metrics.registry.add_collector(collect_app_metrics)
+
+# ======= Static files =======
+# /static/<hashed name> is served from ASSETS_DIR with a one-year immutable Cache-Control and
+# the precompressed copy the browser accepts; original names are revalidated with their ETag.
+# Everything else (saved audio) still comes from Flask's own static folder.
+static_assets = StaticAssets(app.config['ASSETS_DIR'], app.root_path)
+app.jinja_env.globals.update(asset_url=static_assets.url, asset_srcset=static_assets.srcset,
+                             picture=static_assets.picture)
+
+def serve_static(filename):
+    asset = static_assets.resolve(filename, request.headers.get('Accept-Encoding', ''))
+    if asset is None:
+        return app.send_static_file(filename)
+    response = send_file(asset.path, mimetype=asset.mimetype, conditional=True, etag=asset.etag or True,
+                         max_age=asset.max_age)
+    if asset.encoding:
+        response.headers['Content-Encoding'] = asset.encoding
+    if asset.vary:
+        response.vary.add('Accept-Encoding')
+    if asset.immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Heavy libraries that are only imported by the code paths that need them
+LAZY_MODULES = ('torch', 'transformers', 'gtts', 'speech_recognition', 'moviepy', 'deep_translator')
+warmup_state = {'state': 'not started', 'seconds': None}
+
+def warm_up(pin=False):
+    # Loads the preload models (and with them torch/transformers) off the request path
+    warmup_state['state'] = 'running'
+    started = time.perf_counter()
+    try:
+        model_registry.preload(model_router.models_for(app.config['PRELOAD_MODEL_PAIRS']), pin=pin)
+        warmup_state['state'] = 'done'
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        warmup_state['state'] = 'failed'
+    warmup_state['seconds'] = round(time.perf_counter() - started, 2)
+
+@app.route('/ready')
+def ready():
+    # 200 once the database answers; ?models=1 also waits for the preload models.
+    # "components" shows what is warm, so cold starts can be tracked.
+    try:
+        db.session.execute(db.text('SELECT 1'))
+        database_ok = True
+    except Exception as e:
+        print(f"Readiness check: database unavailable: {e}")
+        database_ok = False
+
+    loaded_models = {model['name'] for model in model_registry.stats()['models']}
+    preload_models = model_router.models_for(app.config['PRELOAD_MODEL_PAIRS'])
+    models_warm = all(name in loaded_models for name in preload_models)
+
+    is_ready = database_ok and (models_warm or not request.args.get('models'))
+    return jsonify({
+        'ready': is_ready,
+        'components': {
+            'database': database_ok,
+            'models': {name: name in loaded_models for name in preload_models},
+            'warmup': warmup_state,
+            'modules': {name: name in sys.modules for name in LAZY_MODULES},
+        },
+    }), 200 if is_ready else 503
+
 @app.route('/translation_audio', methods=['GET', 'POST'])
 def translation_audio():
     return render_template('translation2.html')
 
+# Language code mapping for speech recognition and gTTS
+LANG_CODE_MAPPING_SR = {
+    'en': 'en-US',
+    'hi': 'hi-IN',
+    'ml': 'ml-IN',
+    'bn': 'bn-IN',
+    'ta': 'ta-IN',
+    'te': 'te-IN',
+    'kn': 'kn-IN',
+    'mr': 'mr-IN',
+}
+LANG_CODE_MAPPING_TTS = {
+    'en': 'en',
+    'hi': 'hi',
+    'ml': 'ml',
+    'bn': 'bn',
+    'ta': 'ta',
+    'te': 'te',
+    'kn': 'kn',
+    'mr': 'mr',
+}
+
+# Recordings streamed from the browser in chunks, by session id
+speech_sessions = SpeechSessionStore(timeout_seconds=app.config['SPEECH_SESSION_TIMEOUT'])
+
+def new_recognizer(from_lang, backend=None):
+    backend = backend or request.values.get('backend') or app.config['SPEECH_BACKEND']
+    return make_recognizer(backend, from_lang, LANG_CODE_MAPPING_SR.get(from_lang, 'en-US'), app.config['VOSK_MODEL_DIR'])
+
+def speech_error_response(e):
+    if isinstance(e, RecordingTooLong):
+        return jsonify({'error': f"Recording is too long (at most {app.config['SPEECH_MAX_UPLOAD_MB']} MB)."}), 413
+    if isinstance(e, UnrecognizedSpeech):
+        return jsonify({'error': 'Could not understand audio, please try again.'}), 400
+    return jsonify({'error': f'Speech Recognition service error: {e}. Check your internet connection.'}), 500
+
+@app.route('/api/speech/sessions', methods=['POST'])
+def start_speech_session():
+    # Starts decoding right away; the browser then posts MediaRecorder chunks as they are recorded
+    data = request.get_json(silent=True) or request.form
+    from_lang = data.get('from_lang', 'en')
+    try:
+        session_ = SpeechSession(new_recognizer(from_lang), max_bytes=app.config['SPEECH_MAX_UPLOAD_MB'] * 1024 * 1024)
+        speech_sessions.add(session_)
+    except (UnrecognizedSpeech, RecognitionServiceError) as e:
+        return speech_error_response(e)
+    return jsonify({'session_id': session_.id})
+
+@app.route('/api/speech/sessions/<session_id>/chunks', methods=['POST'])
+def upload_speech_chunk(session_id):
+    session_ = speech_sessions.get(session_id)
+    if session_ is None:
+        return jsonify({'error': 'Unknown or expired recording session.'}), 404
+    try:
+        session_.write(request.get_data())
+    except (UnrecognizedSpeech, RecognitionServiceError) as e:
+        speech_sessions.pop(session_id)
+        return speech_error_response(e)
+    # Offline recognizers already have text for what has been said so far
+    return jsonify({'partial': session_.partial()})
+
+def recognize_request_audio(from_lang):
+    # Either a finished streamed session (session_id) or a whole recording uploaded as "audio"
+    session_id = request.values.get('session_id') or (request.get_json(silent=True) or {}).get('session_id')
+    if session_id:
+        session_ = speech_sessions.pop(session_id)
+        if session_ is None:
+            raise UnrecognizedSpeech('Unknown or expired recording session')
+        with span('recognize', backend=app.config['SPEECH_BACKEND'], pair=from_lang or ''):
+            return session_.finish()
+
+    upload = request.files.get('audio')
+    if upload is None:
+        raise UnrecognizedSpeech('No audio uploaded')
+    with span('recognize', backend=app.config['SPEECH_BACKEND'], pair=from_lang or ''):
+        return recognize_file(upload.stream, new_recognizer(from_lang),
+                              max_bytes=app.config['SPEECH_MAX_UPLOAD_MB'] * 1024 * 1024)
+
+@app.route('/api/speech/recognize', methods=['POST'])
+def recognize_speech():
+    from_lang = request.values.get('from_lang', 'en')
+    try:
+        return jsonify({'text': recognize_request_audio(from_lang)})
+    except (UnrecognizedSpeech, RecognitionServiceError) as e:
+        return speech_error_response(e)
+
 @app.route('/translate', methods=['POST'])
 def translate():
+    # Audio comes from the browser (translation2.html) instead of a microphone on the server
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or request.form
         from_lang = data.get('from_lang')
         to_lang = data.get('to_lang')
 
-        recognizer = sr.Recognizer()
-        with sr.Microphone() as source:
-            recognizer.adjust_for_ambient_noise(source, duration=1)
-            audio = recognizer.listen(source, timeout=5)
-
-        # Language code mapping for speech recognition and gTTS
-        LANG_CODE_MAPPING_SR = {
-            'en': 'en-US',
-            'hi': 'hi-IN',
-            'ml': 'ml-IN',
-            'bn': 'bn-IN',
-            'ta': 'ta-IN',
-            'te': 'te-IN',
-            'kn': 'kn-IN',
-            'mr': 'mr-IN',
-        }
-        LANG_CODE_MAPPING_TTS = {
-            'en': 'en',
-            'hi': 'hi',
-            'ml': 'ml',
-            'bn': 'bn',
-            'ta': 'ta',
-            'te': 'te',
-            'kn': 'kn',
-            'mr': 'mr',
-        }
-
-        recognized_text = recognizer.recognize_google(audio, language=LANG_CODE_MAPPING_SR.get(from_lang, 'en-US'))
-        print(99999999999999, recognized_text)
+        recognized_text = recognize_request_audio(from_lang)
         translator = ContextAwareTranslator(source_lang=from_lang, target_lang=to_lang)
         translated_text = translator.translate(recognized_text)
         audio_path = text_to_speech(translated_text, LANG_CODE_MAPPING_TTS.get(to_lang, 'en'))
@@ -208,8 +991,6 @@ def translate():
         if not audio_path:
             return jsonify({'error': 'Failed to convert translated text to audio.'}), 500
 
-        cleanup_old_files(app.config['UPLOAD_FOLDER'])  # Clean old files
-
         response = {
             'original_text': recognized_text,
             'translated_text': translated_text,
@@ -217,14 +998,90 @@ def translate():
         }
         return jsonify(response)
 
-    except sr.UnknownValueError:
-        return jsonify({'error': 'Could not understand audio, please try again.'}), 400
-
-    except sr.RequestError as e:
-        return jsonify({'error': f'Speech Recognition service error: {e}. Check your internet connection.'}), 500
+    except (UnrecognizedSpeech, RecognitionServiceError) as e:
+        return speech_error_response(e)
 
     except Exception as e:
         return jsonify({'error': f'Unexpected error: {str(e)}'}), 500
+
+def recognize_job_step(job):
+    # Recognition needs the network for the Google backend; the PCM is kept so a retry can reuse it
+    recognize = job.payload['recognize']
+    try:
+        job.result['original_text'] = recognize()
+    except UnrecognizedSpeech as e:
+        print(f"Speech job {job.id}: {e}")
+        raise UnrecognizedSpeech('Could not understand audio, please try again.')
+    except RecognitionServiceError as e:
+        raise RetryLater(str(e))
+
+def json_flag(value):
+    # true/false from JSON, or "true"/"false"/"1"/"0" from a form
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    # Text: {"text": "...", "source_lang": "en", "target_lang": "hi"}
+    # Audio: from_lang/to_lang plus a finished session_id or an uploaded "audio" file
+    data = request.get_json(silent=True) or request.form
+    text = data.get('text') or data.get('userText')
+    if text is not None:
+        source_lang = data.get('source_lang') or data.get('originalLanguage', 'en')
+        target_lang = data.get('target_lang') or data.get('translatedLanguage')
+        if not target_lang or not text.strip():
+            return jsonify({'error': 'Expected a target language and some text to translate.'}), 400
+        steps = [('translating', translate_job_step), ('synthesizing', speech_job_step)]
+        if not json_flag(data.get('audio', True)):
+            steps = steps[:1]  # The page streams the audio itself from /api/tts
+        job, busy = submit_job('text', steps, {'source_lang': source_lang, 'target_lang': target_lang},
+                               result={'original_text': text})
+        return busy or job_accepted(job)
+
+    from_lang = data.get('from_lang', 'en')
+    to_lang = data.get('to_lang')
+    if not to_lang:
+        return jsonify({'error': 'Expected from_lang and to_lang.'}), 400
+
+    session_id = data.get('session_id')
+    if session_id:
+        session_ = speech_sessions.pop(session_id)
+        if session_ is None:
+            return jsonify({'error': 'Unknown or expired recording session.'}), 404
+        recognize = session_.finish
+    else:
+        upload = request.files.get('audio')
+        if upload is None:
+            return jsonify({'error': 'Expected a session_id or an uploaded audio file.'}), 400
+        # Read the upload now; decoding and recognition happen in the job
+        max_bytes = app.config['SPEECH_MAX_UPLOAD_MB'] * 1024 * 1024
+        audio = upload.read(max_bytes + 1)
+        if len(audio) > max_bytes:
+            return jsonify({'error': 'Recording is too long.'}), 413
+        backend = request.values.get('backend') or app.config['SPEECH_BACKEND']
+        recognize = lambda: recognize_file(io.BytesIO(audio), new_recognizer(from_lang, backend), max_bytes=max_bytes)
+
+    steps = [('recognizing', recognize_job_step), ('translating', translate_job_step), ('synthesizing', speech_job_step)]
+    if not json_flag(data.get('audio', True)):
+        steps = steps[:2]
+    job, busy = submit_job('audio', steps, {'source_lang': from_lang, 'target_lang': to_lang, 'recognize': recognize})
+    if busy and session_id:
+        session_.abort()
+    return busy or job_accepted(job)
+
+@app.route('/api/jobs/stats')
+def job_stats():
+    # Queue depth, retries, rejections and end-to-end latency of recent jobs
+    return jsonify(job_manager.stats())
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    # Polled by the pages: translated_text shows up before audio_file
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    return jsonify(job.to_dict())
     
 
 
@@ -308,39 +1165,151 @@ def about_1():
 
 
 
+# ======= Stored translations of quiz options =======
+def option_content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def translate_option_text(text, lang):
+    # Options are written in English; English quizzes need no translation.  Local models
+    # first, through the translation cache and memory; the online backends are the fallback.
+    if lang == 'en':
+        return text
+    translation = ContextAwareTranslator(source_lang='en', target_lang=lang).translate(text, failed=None)
+    if translation is None:
+        raise TranslationBackendError(f'No translation to {lang}')
+    return translation
+
+def translate_options(options, lang, texts=None):
+    # Translate options whose stored translation is missing or was made from older text.
+    # Only reads and network calls: call it before changing anything in the session, because a
+    # pending change would be flushed by the lookup and hold SQLite's write lock through every
+    # remote call.  texts maps option ids to text that is about to be saved over option.opt.
+    # Returns what save_option_translations() writes.
+    texts = texts or {}
+    existing = {}
+    with db.session.no_autoflush:
+        for ids in chunked([option.id for option in options]):
+            for row in TranslatedOption.query.filter(TranslatedOption.option_id.in_(ids), TranslatedOption.lang == lang):
+                existing[row.option_id] = row
+
+    pending = []
+    for option in options:
+        source = texts.get(option.id, option.opt)
+        content_hash = option_content_hash(source)
+        row = existing.get(option.id)
+        if row is not None and row.content_hash == content_hash:
+            continue
+        try:
+            text = translate_option_text(source, lang)
+        except Exception as e:
+            print(f"Could not translate option {option.id} to {lang}: {e}")
+            continue
+        pending.append((option.id, lang, row, content_hash, text))
+    return pending
+
+def save_option_translations(pending):
+    # Adds the translations from translate_options() to the session; the caller commits
+    for option_id, lang, row, content_hash, text in pending:
+        if row is None:
+            db.session.add(TranslatedOption(option_id=option_id, lang=lang, content_hash=content_hash, text=text))
+        else:
+            row.content_hash = content_hash
+            row.text = text
+
+def translate_quizzes(quiz_ids):
+    # One chunk of quizzes at a time: translate with nothing pending, then write and commit the chunk
+    translated = 0
+    for ids in chunked(quiz_ids):
+        pending = []
+        for quiz in Quizes.query.options(selectinload(Quizes.options)).filter(Quizes.id.in_(ids)):
+            pending.extend(translate_options(quiz.options, quiz.language))
+        save_option_translations(pending)
+        db.session.commit()
+        translated += len(pending)
+    return translated
+
+def translate_quizzes_job_step(job):
+    # Runs on a job worker thread, which has no app context of its own
+    with app.app_context():
+        job.result['translated_options'] = translate_quizzes(job.payload['quiz_ids'])
+
+def load_option_translations(options, lang, quiz_language=None):
+    # Falls back to the original text for anything not translated yet.
+    # With quiz_language, every translation for that language's quizzes is read in a single
+    # joined query; otherwise one IN query per IN_CHUNK_SIZE options.
+    stored = {}
+    if quiz_language is not None:
+        rows = TranslatedOption.query.join(Options, Options.id == TranslatedOption.option_id).join(
+            Quizes, Quizes.id == Options.question_id).filter(Quizes.language == quiz_language, TranslatedOption.lang == lang)
+        stored = {row.option_id: row for row in rows}
+    else:
+        for ids in chunked([option.id for option in options]):
+            for row in TranslatedOption.query.filter(TranslatedOption.option_id.in_(ids), TranslatedOption.lang == lang):
+                stored[row.option_id] = row
+
+    translations = {}
+    for option in options:
+        row = stored.get(option.id)
+        if row is not None and row.content_hash == option_content_hash(option.opt):
+            translations[option.id] = row.text
+        else:
+            translations[option.id] = option.opt
+    return translations
+
+def delete_option_translations(option_ids):
+    if option_ids:
+        TranslatedOption.query.filter(TranslatedOption.option_id.in_(option_ids)).delete(synchronize_session=False)
+
+@app.cli.command('translate-quizzes')
+def translate_quizzes_command():
+    # Backfill translations for quizzes saved before stored translations existed
+    translate_quizzes([quiz_id for quiz_id, in db.session.query(Quizes.id)])
+    print("Quiz option translations are up to date.")
+
+
 @app.route('/quiz/<lang>', methods=["GET", "POST"])
 def quiz(lang):
-    from translate import Translator
-    # Initialize the translator with the correct target language
-    translator = Translator(from_lang="en", to_lang=lang)
-
     if request.method == "POST":
         total_questions = 0
         correct_answers = 0
         feedback_list = []
 
+        # Submitted answers arrive as answer_<quiz id> = <option id>
+        submitted = []
         for key, value in request.form.items():
-            if key.startswith("answer_"):  # Keys that start with 'answer_' are the submitted answers
-                quiz_id = key.split('_')[1]
-                opt_id = value  # opt_id is the selected option's ID
-
-                # Get the correct answer from the Options table
-                correct_option = Options.query.filter_by(question_id=quiz_id, answer=True).first()
-                user_answer = Options.query.filter_by(id=opt_id).first()  # Get the user's selected answer
-
-                if correct_option and user_answer:
-                    is_correct = (int(opt_id) == correct_option.id)  # Compare the option IDs
-                    feedback_list.append({
-                        'question_number': total_questions + 1,
-                        'question': Quizes.query.get(quiz_id).question,
-                        'user_answer': translator.translate(user_answer.opt),  # Access the user's selected option text
-                        'correct_answer': translator.translate(correct_option.opt),  # Access the correct option text
-                        'is_correct': is_correct
-                    })
-                    if is_correct:
-                        correct_answers += 1
-                
-                total_questions += 1
+            if key.startswith("answer_"):
+                try:
+                    submitted.append((int(key.split('_')[1]), int(value)))
+                except ValueError:
+                    continue
+
+        # One IN query loads every option (and its quiz) for all submitted questions
+        quiz_ids = [quiz_id for quiz_id, _ in submitted]
+        options_by_quiz = {}
+        for ids in chunked(quiz_ids):
+            for option in Options.query.options(joinedload(Options.quiz)).filter(Options.question_id.in_(ids)):
+                options_by_quiz.setdefault(option.question_id, []).append(option)
+        translations = load_option_translations(
+            [option for options in options_by_quiz.values() for option in options], lang)
+
+        for quiz_id, opt_id in submitted:
+            options = options_by_quiz.get(quiz_id, [])
+            correct_option = next((option for option in options if option.answer), None)
+            user_answer = next((option for option in options if option.id == opt_id), None)  # The user's selected answer
+
+            if correct_option and user_answer:
+                is_correct = (opt_id == correct_option.id)  # Compare the option IDs
+                feedback_list.append({
+                    'question_number': total_questions + 1,
+                    'question': correct_option.quiz.question,
+                    'user_answer': translations[user_answer.id],  # Access the user's selected option text
+                    'correct_answer': translations[correct_option.id],  # Access the correct option text
+                    'is_correct': is_correct
+                })
+                if is_correct:
+                    correct_answers += 1
+
+            total_questions += 1
 
         # Calculate the percentage of correct answers
         if total_questions > 0:
@@ -348,21 +1317,22 @@ def quiz(lang):
         else:
             score_percentage = 0
 
-        return render_template('quiz.html', quizzes_list=[], lang=lang, feedback_list=feedback_list, score_percentage=score_percentage)
+        with span('render'):
+            return render_template('quiz.html', quizzes_list=[], lang=lang, feedback_list=feedback_list, score_percentage=score_percentage)
     
 
     # Handling GET request - Displaying the quizzes
-    quizzes = Quizes.query.filter_by(language=lang).all()
+    # All quizzes and their options are loaded up front instead of one query per quiz
+    quizzes = Quizes.query.options(selectinload(Quizes.options)).filter_by(language=lang).all()
+    translations = load_option_translations(
+        [option for quiz in quizzes for option in quiz.options], lang, quiz_language=lang)
     quizzes_list = []
 
     for quiz in quizzes:
-        # Fetch options for the current quiz
-        options = Options.query.filter_by(question_id=quiz.id).all()
-
-        # Translate each option and shuffle them
+        # Use the stored translation of each option and shuffle them
         translated_options = []
-        for option in options:
-            translated_option = translator.translate(option.opt)  # The result is already a string
+        for option in quiz.options:
+            translated_option = translations[option.id]
             translated_options.append({
                 'name': f'answer_{quiz.id}',
                 'value': option.id,  # Use the option ID as the value
@@ -378,7 +1348,8 @@ def quiz(lang):
             'options': translated_options
         })
 
-    return render_template('quiz.html', quizzes_list=quizzes_list, lang=lang)
+    with span('render'):
+        return render_template('quiz.html', quizzes_list=quizzes_list, lang=lang)
 
 @app.route('/admin_home')
 def admin_home():
@@ -395,13 +1366,22 @@ def add_quiz():
         opt2 = request.form['opt2']
         opt3 = request.form['opt3']
 
+        # Translate before writing anything: SQLite holds its write lock from the first flush
+        # until the commit, so a slow translator in between would block every other writer
+        translated = {}
+        for text in dict.fromkeys([answer, opt1, opt2, opt3]):
+            try:
+                translated[text] = translate_option_text(text, language)
+            except Exception as e:
+                print(f"Could not translate option '{text}' to {language}: {e}")
+
         # Create and add the new quiz to the database
         new_quiz = Quizes(
             language=language,
             question=question
         )
         db.session.add(new_quiz)
-        db.session.commit()  # Commit to assign an ID to the quiz
+        db.session.flush()  # Flush to assign an ID to the quiz; everything is committed once below
 
         # Now, retrieve the ID of the newly created quiz
         latest_quiz_id = new_quiz.id
@@ -436,7 +1416,14 @@ def add_quiz():
         )
         db.session.add(option3)
 
-        # Commit all options to the database at once
+        # Store the translations now so the quiz page never has to translate
+        db.session.flush()
+        for option in (correct_option, option1, option2, option3):
+            if option.opt in translated:
+                db.session.add(TranslatedOption(option_id=option.id, lang=language,
+                                                content_hash=option_content_hash(option.opt), text=translated[option.opt]))
+
+        # Commit the quiz, its options and their translations at once
         db.session.commit()
 
         flash('Quiz added successfully!', 'success')
@@ -446,6 +1433,122 @@ def add_quiz():
 
 
 
+def import_quizzes(stream, filename='', translate=True):
+    # All quizzes and options are written in one transaction; nothing is saved if any record is invalid.
+    # Returns the ids of the new quizzes.
+    records = parse_quiz_file(stream, filename)
+    try:
+        quiz_ids = bulk_insert_quizzes(db.session, Quizes, Options, records)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if translate:
+        # Translations need network calls, so they are committed in chunks after the import itself
+        translate_quizzes(quiz_ids)
+    return quiz_ids
+
+@app.cli.command('import-quizzes')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--skip-translations', is_flag=True, help="Import only; run 'flask translate-quizzes' later.")
+def import_quizzes_command(path, skip_translations):
+    with open(path, 'rb') as f:
+        try:
+            quiz_ids = import_quizzes(f, path, translate=not skip_translations)
+        except QuizImportError as e:
+            raise click.ClickException(str(e))
+    print(f"Imported {len(quiz_ids)} quizzes from {path}.")
+
+@app.cli.command('load-translation-memory')
+@click.argument('path', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--dataset', help="Hugging Face dataset with a translation column, e.g. hind_encorp.")
+@click.option('--split', default='train', show_default=True)
+@click.option('--source-lang', default='en', show_default=True)
+@click.option('--target-lang', default='hi', show_default=True)
+@click.option('--limit', type=int, help="Load at most this many pairs.")
+def load_translation_memory_command(path, dataset, split, source_lang, target_lang, limit):
+    # PATH is a .jsonl, .csv (language codes as columns) or tab-separated file of sentence pairs
+    if translation_memory is None:
+        raise click.ClickException("TRANSLATION_MEMORY_DB is empty, so the translation memory is turned off.")
+    if bool(path) == bool(dataset):
+        raise click.ClickException("Give either a PATH or --dataset.")
+    if dataset:
+        pairs = read_parallel_dataset(dataset, source_lang, target_lang, split)
+        origin = dataset
+    else:
+        pairs = read_parallel_file(path, source_lang, target_lang)
+        origin = os.path.basename(path)
+    started = time.perf_counter()
+    try:
+        added = translation_memory.bulk_load(pairs, source_lang, target_lang, origin=origin, limit=limit)
+    except ImportError as e:
+        raise click.ClickException(f"--dataset needs the datasets package: {e}")
+    print(f"Added {added} {source_lang}-{target_lang} segments in {time.perf_counter() - started:.1f}s.")
+
+@app.cli.command('build-assets')
+@click.option('--widths', help="Comma-separated image widths; default ASSET_IMAGE_WIDTHS.")
+def build_assets_command(widths):
+    # Run on deploy, before the server starts; running servers pick the new manifest up on restart
+    builder = AssetBuilder(app.root_path, app.config['ASSETS_DIR'],
+                           widths=[int(w) for w in (widths or app.config['ASSET_IMAGE_WIDTHS']).split(',')])
+    assets = builder.build()
+    static_assets.reload()
+    if builder.brotli is None:
+        print("brotli is not installed, so only gzip copies were made (pip install brotli)")
+    print(f"Built {len(assets)} assets into {app.config['ASSETS_DIR']}: "
+          f"{builder.bytes_in / 1048576:.1f} MB of sources, {builder.bytes_out / 1048576:.1f} MB written")
+
+@app.cli.command('download-models')
+@click.option('--pairs', help="Comma-separated pairs such as en-ta,hi-en; default is every supported pair.")
+def download_models_command(pairs):
+    # Saves the routed hub models into MODEL_DIR while there is network access, so an
+    # air-gapped deployment only needs that folder copied over
+    from transformers import MarianMTModel, MarianTokenizer
+
+    if pairs:
+        wanted = parse_pairs(pairs)
+    else:
+        wanted = [(s, t) for s in sorted(SUPPORTED_LANGUAGES) for t in sorted(SUPPORTED_LANGUAGES) if s != t]
+    for model_name in model_router.models_for(wanted):
+        path = local_model_path(app.config['MODEL_DIR'], model_name)
+        if path != model_name:
+            print(f"{model_name}: already in {path}")
+            continue
+        path = os.path.join(app.config['MODEL_DIR'], model_name.replace('/', '--'))
+        MarianMTModel.from_pretrained(model_name).save_pretrained(path)
+        MarianTokenizer.from_pretrained(model_name).save_pretrained(path)
+        print(f"{model_name}: saved to {path}")
+
+@app.route('/import_quizzes', methods=["POST"])
+def import_quizzes_upload():
+    upload = request.files.get('quiz_file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV or JSON file to import.', 'danger')
+        return redirect(url_for('add_quiz'))
+
+    try:
+        quiz_ids = import_quizzes(upload.stream, upload.filename, translate=False)
+    except QuizImportError as e:
+        flash(f'Import failed: {e}', 'danger')
+        return redirect(url_for('add_quiz'))
+
+    if request.form.get('skip_translations') or not quiz_ids:
+        flash(f'Imported {len(quiz_ids)} quizzes successfully!', 'success')
+        return redirect(url_for('add_quiz'))
+
+    # Translating thousands of options takes minutes, so it runs as a job instead of inside this request
+    job, busy = submit_job('quiz-import', [('translating', translate_quizzes_job_step)], {'quiz_ids': quiz_ids},
+                           result={'imported': len(quiz_ids)})
+    if busy:
+        flash(f'Imported {len(quiz_ids)} quizzes, but the server is too busy to translate their options now. '
+              'Run "flask translate-quizzes" later.', 'danger')
+    else:
+        flash(f'Imported {len(quiz_ids)} quizzes successfully! Their options are being translated in the background '
+              f"(progress: {url_for('job_status', job_id=job.id)}).", 'success')
+    return redirect(url_for('add_quiz'))
+
+
 @app.route('/quiz_list/<lang>', methods=["GET", "POST"])
 def quiz_list(lang):
     if request.method == "POST":
@@ -461,28 +1564,35 @@ def quiz_list(lang):
         # Update the quiz question and language
         quiz = Quizes.query.get(quiz_id)
         if quiz:
-            quiz.language = language
-            quiz.question = question
-            db.session.commit()
-
-            # Update the answer option
-            answer_option = Options.query.get(answer_id)
-            if answer_option:
-                answer_option.opt = answer_text
-                db.session.commit()
+            quiz_options = {option.id: option for option in quiz.options}
 
-            # Update each option (but not the answer)
+            # New option texts: the answer first, then each option (which wins if it is the answer too)
+            texts = {}
+            edited = []
+            if int(answer_id) in quiz_options:
+                texts[int(answer_id)] = answer_text
             for i in range(1, 5):
                 option_id = request.form.get(f'option_id_{i}')
                 option_text = request.form.get(f'option_text_{i}')
                 
-                if option_id and option_text:
-                    option = Options.query.get(option_id)
-                    if option:
-                        option.opt = option_text
-                        # Check if this is the correct answer
-                        option.answer = (option.id == int(answer_id))  # Mark as answer if matched
-                        db.session.commit()
+                if option_id and option_text and int(option_id) in quiz_options:
+                    texts[int(option_id)] = option_text
+                    edited.append(int(option_id))
+
+            # Re-translate options whose text or quiz language changed before anything is written
+            pending = translate_options(quiz.options, language, texts)
+
+            quiz.language = language
+            quiz.question = question
+            for option_id, option_text in texts.items():
+                quiz_options[option_id].opt = option_text
+            for option_id in edited:
+                # Check if this is the correct answer
+                quiz_options[option_id].answer = (option_id == int(answer_id))  # Mark as answer if matched
+
+            # Save the quiz, its options and their translations at once
+            save_option_translations(pending)
+            db.session.commit()
 
             flash("Quiz updated successfully!", 'success')
         else:
@@ -491,11 +1601,11 @@ def quiz_list(lang):
         return redirect(url_for('quiz_list', lang=lang))
 
     # For GET request: render the page with quiz data
-    quizzes = Quizes.query.filter_by(language=lang).all()
+    quizzes = Quizes.query.options(selectinload(Quizes.options)).filter_by(language=lang).all()
 
     quizzes_list = []
     for quiz in quizzes:
-        options = Options.query.filter_by(question_id=quiz.id).all()
+        options = quiz.options
 
         quiz_data = {
             'id': quiz.id,
@@ -541,17 +1651,24 @@ def edit_quiz(lang):
     # Update the quiz record in the database
     quiz = Quizes.query.get(quiz_id)
     if quiz:
+        quiz_options = {option.id: option for option in quiz.options}
+        options = [opt for opt in options if opt['option_id'] in quiz_options]
+
+        # Re-translate options whose text or quiz language changed before anything is written
+        pending = translate_options(quiz.options, language, {opt['option_id']: opt['option_text'] for opt in options})
+
         quiz.language = language
         quiz.question = question
-        db.session.commit()
 
-        # Update the options
+        # Update the options (already loaded with the quiz)
         for opt in options:
-            option = Options.query.get(opt['option_id'])
-            if option:
-                option.opt = opt['option_text']
-                option.answer = (option.id == answer_id)  # Mark this option as the correct answer if it matches answer_id
-                db.session.commit()
+            option = quiz_options[opt['option_id']]
+            option.opt = opt['option_text']
+            option.answer = (option.id == answer_id)  # Mark this option as the correct answer if it matches answer_id
+
+        # Save the quiz, its options and their translations at once
+        save_option_translations(pending)
+        db.session.commit()
 
         flash("Quiz updated successfully!", 'success')
     else:
@@ -566,16 +1683,11 @@ def remove_quiz(id, lang):
     # Find the quiz by its ID
     quiz = Quizes.query.filter_by(id=id).first()
     if quiz:
-        # Delete the quiz
+        # Delete the stored translations, then the quiz; its options go with it
+        delete_option_translations([option.id for option in quiz.options])
         db.session.delete(quiz)
         db.session.commit()
 
-        # Find all options related to the quiz and delete them
-        options = Options.query.filter_by(question_id=id).all()
-        for option in options:
-            db.session.delete(option)
-        db.session.commit()
-
         flash("Quiz and its options deleted successfully!", 'success')
     else:
         flash("Quiz not found!", 'danger')
@@ -585,12 +1697,38 @@ def remove_quiz(id, lang):
 
 
 
-if __name__ == '__main__':
+def init_storage():
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
 
-        # Create the database tables
+    # Create the database tables
     with app.app_context():
         db.create_all()
+        ensure_indexes()
+
+def after_fork(workers=1):
+    # Runs in every worker of a pre-fork server (see gunicorn.conf.py).  Threads, SQLite
+    # connections and pooled database connections do not survive fork(), so they are
+    # recreated here; the preloaded models are inherited as they are.
+    with app.app_context():
+        db.engine.dispose(close=False)  # The parent's connections stay with the parent
+    translation_cache.reopen()
+    if translation_memory is not None:
+        translation_memory.reopen()
+    audio_janitor.start()
+    if 'torch' in sys.modules:
+        # Split the cores between the workers instead of every worker using all of them
+        import torch
+        torch.set_num_threads(app.config['INFERENCE_THREADS'] or max(1, (os.cpu_count() or 1) // workers))
+
+if __name__ == '__main__':
+    init_storage()
+    audio_janitor.start()
+
+    # Load the configured MarianMT models; pages that do not translate are served meanwhile
+    if app.config['WARMUP'] == 'blocking':
+        warm_up()
+    elif app.config['WARMUP'] == 'background':
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
 
     app.run(debug=True)
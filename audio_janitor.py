@@ -0,0 +1,174 @@
+# ======= Background cleanup of generated audio =======
+# Replaces the per-request os.listdir() scan of the audio folder.  Files are
+# kept in a min-heap ordered by mtime; a daemon thread periodically removes
+# files older than max_age and, if the folder is still over max_bytes, the
+# least recently touched files until it fits.
+import heapq
+import os
+import threading
+import time
+
+from metrics import span
+
+
+def is_temporary(name):
+    # Files still being written (TTSCache's .tts_<key>.mp3.<uuid>.tmp) and hidden files such
+    # as indexes are never counted or removed; they are renamed or cleaned up by their owner
+    return name.startswith('.') or name.endswith('.tmp')
+
+
+class AudioJanitor:
+    def __init__(self, folder, max_age_seconds=86400, max_bytes=1024 * 1024 * 1024, interval_seconds=300,
+                 on_remove=None):
+        self.folder = folder
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self.on_remove = on_remove  # Called with the file name after a file is deleted
+
+        self._heap = []  # (mtime, name)
+        self._sizes = {}  # name -> size in bytes
+        self._total_bytes = 0
+        self._scanned = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.runs = 0
+        self.files_removed = 0
+        self.bytes_removed = 0
+        self.last_run = None
+
+    def start(self):
+        with self._lock:
+            # is_alive() also catches a thread object inherited across fork()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audio-janitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def register(self, path):
+        # Record a new or re-used file; cheap enough to call on the request path
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        name = os.path.basename(path)
+        if is_temporary(name):
+            return
+        with self._lock:
+            self._total_bytes += stat.st_size - self._sizes.get(name, 0)
+            self._sizes[name] = stat.st_size
+            heapq.heappush(self._heap, (stat.st_mtime, name))
+        self.start()
+
+    def forget(self, name):
+        # Called when a file is deleted by someone else (e.g. TTS cache eviction)
+        with self._lock:
+            if name in self._sizes:
+                self._total_bytes -= self._sizes.pop(name)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with span('audio_cleanup'):
+                    self.run_once()
+            except Exception as e:
+                print(f"Audio cleanup failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def _scan_locked(self):
+        # One directory scan when the janitor starts; afterwards files are registered as they are written
+        self._heap = []
+        self._sizes = {}
+        self._total_bytes = 0
+        if os.path.isdir(self.folder):
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and not is_temporary(entry.name):
+                    stat = entry.stat()
+                    self._heap.append((stat.st_mtime, entry.name))
+                    self._sizes[entry.name] = stat.st_size
+                    self._total_bytes += stat.st_size
+        heapq.heapify(self._heap)
+        self._scanned = True
+
+    def run_once(self):
+        # Returns how many files and bytes this run reclaimed
+        removed_files = 0
+        removed_bytes = 0
+        with self._lock:
+            if not self._scanned:
+                self._scan_locked()
+            cutoff = time.time() - self.max_age_seconds if self.max_age_seconds else None
+
+            while self._heap:
+                mtime, name = self._heap[0]
+                too_old = cutoff is not None and mtime < cutoff
+                too_big = self.max_bytes is not None and self._total_bytes > self.max_bytes
+                if not too_old and not too_big:
+                    break
+                heapq.heappop(self._heap)
+                if name not in self._sizes:
+                    continue  # Stale heap entry for a file already removed
+
+                path = os.path.join(self.folder, name)
+                try:
+                    current_mtime = os.path.getmtime(path)
+                except OSError:
+                    self._total_bytes -= self._sizes.pop(name)
+                    continue
+                if current_mtime > mtime:
+                    # Touched since it was queued (e.g. a TTS cache hit); re-queue with its new time
+                    heapq.heappush(self._heap, (current_mtime, name))
+                    continue
+
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Could not delete old file {path}: {e}")
+                    continue
+                size = self._sizes.pop(name)
+                self._total_bytes -= size
+                removed_files += 1
+                removed_bytes += size
+                if self.on_remove is not None:
+                    self.on_remove(name)
+
+            # Drop duplicate entries left behind by re-registered files
+            if len(self._heap) > 2 * len(self._sizes) + 64:
+                self._rebuild_heap_locked()
+
+            self.runs += 1
+            self.files_removed += removed_files
+            self.bytes_removed += removed_bytes
+            self.last_run = time.time()
+
+        if removed_files:
+            print(f"Audio cleanup removed {removed_files} files ({removed_bytes} bytes)")
+        return {'files': removed_files, 'bytes': removed_bytes}
+
+    def _rebuild_heap_locked(self):
+        self._heap = []
+        for name in list(self._sizes):
+            try:
+                self._heap.append((os.path.getmtime(os.path.join(self.folder, name)), name))
+            except OSError:
+                self._total_bytes -= self._sizes.pop(name)
+        heapq.heapify(self._heap)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._sizes),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_age_seconds': self.max_age_seconds,
+                'runs': self.runs,
+                'files_removed': self.files_removed,
+                'bytes_removed': self.bytes_removed,
+                'last_run': self.last_run,
+            }
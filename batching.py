@@ -0,0 +1,150 @@
+# ======= Dynamic micro-batching for MarianMT =======
+# Requests for the same model are queued for a few milliseconds and translated
+# together with one generate() call instead of one call each.  The router turns
+# a language pair into hops (model + optional >>xxx<< target token); every hop
+# has its own queue, and a pivot route feeds the output of one hop into the next.
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import add_span, span, trace_handle
+
+
+class _PendingTranslation:
+    def __init__(self, text, trace=None):
+        self.text = text
+        self.trace = trace  # Trace of the request waiting for it; generate() runs on the batcher thread
+        self.future = Future()
+
+
+class BatchScheduler:
+    def __init__(self, registry, router, max_batch_size=16, max_wait_ms=10, max_batch_tokens=4096):
+        self.registry = registry
+        self.router = router
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        # Upper bound on padded tokens (longest item x batch size) per generate() call
+        self.max_batch_tokens = max_batch_tokens
+
+        self._queues = {}  # Hop(model, token) -> queue of _PendingTranslation
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, source_lang, target_lang, text):
+        # Returns a Future resolved with the translation. It fails with LookupError
+        # when the pair has no local model, so callers can fall back to another backend.
+        hops = self.router.route(source_lang, target_lang)
+        if not hops:
+            future = Future()
+            future.set_exception(LookupError(f'No local model for {source_lang}-{target_lang}'))
+            return future
+        return self._submit_hops(hops, text, trace_handle())
+
+    def _submit_hops(self, hops, text, trace=None):
+        pending = _PendingTranslation(text, trace)
+        self._queue_for(hops[0]).put(pending)
+        if len(hops) == 1:
+            return pending.future
+
+        # Pivot: when the first hop finishes, queue its output on the next hop
+        result = Future()
+
+        def next_hop(future):
+            try:
+                intermediate = future.result()
+            except Exception as e:
+                result.set_exception(e)
+                return
+            self._submit_hops(hops[1:], intermediate, trace).add_done_callback(copy_result)
+
+        def copy_result(future):
+            try:
+                result.set_result(future.result())
+            except Exception as e:
+                result.set_exception(e)
+
+        pending.future.add_done_callback(next_hop)
+        return result
+
+    def translate_many(self, source_lang, target_lang, texts):
+        futures = [self.submit(source_lang, target_lang, text) for text in texts]
+        return [future.result() for future in futures]
+
+    def _queue_for(self, hop):
+        with self._lock:
+            hop_queue = self._queues.get(hop)
+            if hop_queue is None:
+                hop_queue = self._queues[hop] = queue.Queue()
+                worker = threading.Thread(
+                    target=self._run, args=(hop, hop_queue), name=f'batcher-{hop_label(hop)}', daemon=True)
+                worker.start()
+            return hop_queue
+
+    def _run(self, hop, hop_queue):
+        while True:
+            batch = [hop_queue.get()]
+            # Keep collecting until the batch is full or the wait window closes
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(hop_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(hop, batch)
+
+    def _process(self, hop, batch):
+        # Multilingual models pick the target language from a leading >>xxx<< token
+        prefix = f'{hop.token} ' if hop.token else ''
+        try:
+            with self.registry.borrow(hop.model) as entry:
+                if entry is None:
+                    raise LookupError(f'Local model {hop.model} is not available')
+                lengths = entry.token_lengths([prefix + item.text for item in batch])
+                ordered = sorted(zip(lengths, batch), key=lambda pair: pair[0])
+                for group in self._split_by_tokens(ordered):
+                    started = time.perf_counter()
+                    with span('generate', backend=hop.model):
+                        translations = entry.translate_batch([prefix + item.text for item in group])
+                    # Once per request in the group, however many of its segments were batched together
+                    seconds = time.perf_counter() - started
+                    for trace in {id(item.trace): item.trace for item in group}.values():
+                        add_span(trace, 'generate', seconds, backend=hop.model)
+                    for item, translation in zip(group, translations):
+                        item.future.set_result(translation)
+                    with self._lock:
+                        self.batches += 1
+                        self.items += len(group)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+
+    def _split_by_tokens(self, ordered):
+        # Items are sorted by length, so each group pads to roughly its own length
+        group = []
+        for length, item in ordered:
+            if group and length * (len(group) + 1) > self.max_batch_tokens:
+                yield group
+                group = []
+            group.append(item)
+        if group:
+            yield group
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'queued': {hop_label(hop): q.qsize() for hop, q in self._queues.items()},
+            }
+
+
+def hop_label(hop):
+    return f'{hop.model} {hop.token}' if hop.token else hop.model
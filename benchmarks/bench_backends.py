@@ -0,0 +1,98 @@
+# ======= Translation backend tail latency =======
+# Runs the backend chain against two local stub servers: a primary with slow
+# outliers (or outright failures) and a fast secondary.  Compares p50/p95/p99
+# for the primary alone, plain fallback, and hedged requests, so the effect of
+# TRANSLATION_HEDGE_MS and the circuit breaker can be measured offline.
+#
+#   python benchmarks/bench_backends.py --requests 400 --hedge-ms 150
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_translation_server import start_stub_server
+from translation_backends import BackendChain, HTTPBackend, TranslationBackendError
+
+
+class NamedHTTPBackend(HTTPBackend):
+    # Two http backends in one chain need different names for their stats
+    def __init__(self, name, url, timeout):
+        super().__init__(url, timeout=timeout)
+        self.name = name
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def run(chain, requests, concurrency):
+    def one(i):
+        started = time.perf_counter()
+        try:
+            chain.translate(f'Sentence number {i}.', 'en', 'hi')
+            ok = True
+        except TranslationBackendError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    latencies = sorted(seconds for seconds, _ in results)
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'errors': sum(1 for _, ok in results if not ok),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tail latency of the translation backend chain')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--delay-ms', type=float, default=40, help='Usual primary latency')
+    parser.add_argument('--slow-ms', type=float, default=1500, help='Latency of the primary slow outliers')
+    parser.add_argument('--slow-fraction', type=float, default=0.1)
+    parser.add_argument('--secondary-ms', type=float, default=80)
+    parser.add_argument('--hedge-ms', type=float, default=150)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    primary = start_stub_server(delay_ms=args.delay_ms, slow_ms=args.slow_ms, slow_fraction=args.slow_fraction, seed=1)
+    down = start_stub_server(delay_ms=args.delay_ms, error_rate=1.0, seed=2)
+    secondary = start_stub_server(delay_ms=args.secondary_ms, seed=3)
+
+    def chain(primary_url, with_secondary, hedge_ms=None):
+        backends = [NamedHTTPBackend('primary', primary_url, args.timeout)]
+        if with_secondary:
+            backends.append(NamedHTTPBackend('secondary', secondary.url, args.timeout))
+        timeouts = {backend.name: args.timeout for backend in backends}
+        return BackendChain(backends, timeouts=timeouts, hedge_after=hedge_ms / 1000.0 if hedge_ms else None,
+                            max_workers=args.concurrency * 3)
+
+    scenarios = [
+        ('slow primary only', chain(primary.url, False)),
+        ('slow primary + fallback', chain(primary.url, True)),
+        (f'slow primary + hedge after {args.hedge_ms:g} ms', chain(primary.url, True, args.hedge_ms)),
+        ('failing primary + fallback (circuit breaker)', chain(down.url, True)),
+    ]
+    results = []
+    for name, backend_chain in scenarios:
+        row = {'scenario': name, **run(backend_chain, args.requests, args.concurrency)}
+        stats = backend_chain.stats()
+        row['hedges'] = stats['hedges']
+        row['hedge_wins'] = stats['hedge_wins']
+        row['calls'] = {backend: data['calls'] for backend, data in stats['backends'].items()}
+        results.append(row)
+        print(json.dumps(row))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# ======= MarianMT generate() micro-benchmark =======
+# Times one translate_batch() call (tokenize + generate + decode) for every
+# combination of batch size and source length on CPU, through the same loader
+# the app uses, so backends (torch, torch-int8, onnx, ctranslate2) and settings
+# such as NUM_BEAMS can be compared.  With --fixed-output every hypothesis is
+# forced to the source length, so runs from different commits do the same work
+# even if the model's output changes.
+#
+#   python benchmarks/bench_generate.py --model Helsinki-NLP/opus-mt-en-hi --output generate.json
+#   python benchmarks/bench_generate.py --backend ctranslate2 --compare generate.json
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from inference_backends import BACKENDS, make_loader
+from report import compare, environment, write_report
+
+WORDS = ('the children walked to school in the morning and their teacher told them a story about '
+         'a small village near the river where farmers grew rice and people sold fruit at the market').split()
+
+
+def sentence_of_length(entry, tokens):
+    # Smallest prefix of the word list (repeated as needed) that tokenizes to at least `tokens` tokens
+    words = []
+    while True:
+        words.append(WORDS[len(words) % len(WORDS)])
+        text = ' '.join(words)
+        if entry.token_lengths([text])[0] >= tokens:
+            return text
+
+
+def time_batch(entry, texts, repeat, generate_kwargs):
+    entry.translate_batch(texts, **generate_kwargs)  # Warm-up: allocator, caches, lazy initialization
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        entry.translate_batch(texts, **generate_kwargs)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='MarianMT translate_batch() across batch sizes and lengths')
+    parser.add_argument('--model', default='Helsinki-NLP/opus-mt-en-hi', help='Hub name or local directory')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch')
+    parser.add_argument('--converted-dir', default=os.environ.get('CONVERTED_MODEL_DIR', 'models/converted'))
+    parser.add_argument('--model-dir', default=os.environ.get('MODEL_DIR', 'models/marian'))
+    parser.add_argument('--threads', type=int, default=0, help='0 keeps the library default')
+    parser.add_argument('--num-beams', type=int, default=0, help='1 for greedy search, 0 for the model default')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[8, 32, 64, 128], help='Source tokens per sentence')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fixed-output', action=argparse.BooleanOptionalAction, default=True,
+                        help='Force every output to the source length (default) instead of stopping at </s>')
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--compare', help='Earlier JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # Relative model directories are relative to the app, as in app.py
+    loader = make_loader(args.backend, threads=args.threads, num_beams=args.num_beams,
+                         converted_dir=args.converted_dir, model_dir=args.model_dir)
+    started = time.perf_counter()
+    entry = loader(args.model)
+    load_seconds = time.perf_counter() - started
+
+    rows = []
+    for length in args.lengths:
+        text = sentence_of_length(entry, length)
+        source_tokens = entry.token_lengths([text])[0]
+        generate_kwargs = {'min_new_tokens': source_tokens, 'max_new_tokens': source_tokens} if args.fixed_output else {}
+        for batch_size in args.batch_sizes:
+            timings = time_batch(entry, [text] * batch_size, args.repeat, generate_kwargs)
+            median = statistics.median(timings)
+            row = {
+                'batch_size': batch_size,
+                'source_tokens': source_tokens,
+                'length': length,
+                'median_ms': round(median * 1000, 2),
+                'min_ms': round(min(timings) * 1000, 2),
+                'ms_per_sentence': round(median * 1000 / batch_size, 2),
+                'sentences_per_second': round(batch_size / median, 1),
+                'source_tokens_per_second': round(batch_size * source_tokens / median, 1),
+            }
+            rows.append(row)
+            print(json.dumps(row))
+
+    meta = environment(benchmark='generate', model=args.model, backend=args.backend, num_beams=args.num_beams,
+                       fixed_output=args.fixed_output, load_seconds=round(load_seconds, 2),
+                       model_size_mb=round(entry.size_bytes / (1024 * 1024), 1))
+    if 'torch' in sys.modules:
+        import torch
+        meta.update(torch=torch.__version__, torch_threads=torch.get_num_threads())
+    if args.output:
+        write_report(args.output, meta, rows)
+    if args.compare:
+        compare(args.compare, rows, ['batch_size', 'length'], ['median_ms', 'sentences_per_second'])
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# ======= Quiz page benchmark =======
+# Seeds a throwaway SQLite database with N quizzes per language and times the
+# quiz page, the grading POST and the admin quiz list through the Flask test
+# client.  Page time and SQL statement count should stay flat per quiz as N grows.
+#
+#   python benchmarks/bench_quiz_pages.py --sizes 10 100 1000 5000
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(app_module, language, count):
+    db = app_module.db
+    quizzes = [app_module.Quizes(language=language, question=f'Question {i}?') for i in range(count)]
+    db.session.add_all(quizzes)
+    db.session.flush()
+    options = []
+    for quiz in quizzes:
+        options.append(app_module.Options(opt=f'Right {quiz.id}', answer=True, question_id=quiz.id))
+        options.extend(app_module.Options(opt=f'Wrong {quiz.id}.{j}', answer=False, question_id=quiz.id)
+                       for j in range(3))
+    db.session.add_all(options)
+    db.session.flush()
+    db.session.add_all(
+        app_module.TranslatedOption(option_id=option.id, lang=language,
+                                    content_hash=app_module.option_content_hash(option.opt), text=f'[{language}] {option.opt}')
+        for option in options
+    )
+    db.session.commit()
+    return quizzes
+
+
+def timed(client, counter, method, url, repeat, **kwargs):
+    timings = []
+    statements = 0
+    for _ in range(repeat):
+        counter['statements'] = 0
+        started = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        timings.append(time.perf_counter() - started)
+        statements = counter['statements']
+        assert response.status_code in (200, 302), response.status_code
+    timings.sort()
+    return {'median_ms': round(timings[len(timings) // 2] * 1000, 2), 'sql_statements': statements}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='quiz-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['TRANSLATION_CACHE_DB'] = ''
+    os.environ['TRANSLATION_MEMORY_DB'] = ''
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)  # Templates are looked up relative to the app
+
+    import app as app_module
+    from sqlalchemy import event
+
+    counter = {'statements': 0}
+    results = []
+    with app_module.app.app_context():
+        app_module.db.create_all()
+
+        @event.listens_for(app_module.db.engine, 'before_cursor_execute')
+        def count_statement(*_):
+            counter['statements'] += 1
+
+        client = app_module.app.test_client()
+        for index, size in enumerate(args.sizes):
+            # A separate language per size keeps each measurement independent
+            language = f'b{index}'
+            quizzes = seed(app_module, language, size)
+            answers = {f'answer_{quiz.id}': str(quiz.options[0].id) for quiz in quizzes}
+
+            row = {'quizzes': size}
+            row['quiz_page'] = timed(client, counter, 'get', f'/quiz/{language}', args.repeat)
+            row['grading'] = timed(client, counter, 'post', f'/quiz/{language}', args.repeat, data=answers)
+            row['quiz_list'] = timed(client, counter, 'get', f'/quiz_list/{language}', args.repeat)
+            row['quiz_page_us_per_quiz'] = round(row['quiz_page']['median_ms'] * 1000 / size, 1)
+            results.append(row)
+            print(json.dumps(row))
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
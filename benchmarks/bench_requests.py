@@ -0,0 +1,222 @@
+# ======= Request path load test =======
+# Serves the app from a threaded local server against a seeded throwaway
+# SQLite, with every external service replaced by a local stub:
+#   online translation - stub_translation_server.py via the "http" backend
+#   gTTS and speech recognition - offline_stubs.py (fixed delays)
+# Each scenario is driven at several concurrency levels and reports
+# throughput and p50/p95/p99 latency.  Local MarianMT routes are switched off
+# unless --local-models is given, so the numbers do not depend on which
+# models happen to be on the machine.
+#
+#   python benchmarks/bench_requests.py --concurrency 1 4 16 --requests 200 --quizzes 500 --output requests.json
+#   python benchmarks/bench_requests.py --compare requests.json
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_quiz_pages import seed
+from offline_stubs import install_fake_gtts, install_stub_recognizer, tone_wav
+from report import compare, environment, percentile, write_report
+from stub_translation_server import start_stub_server
+
+SCENARIOS = ['translation_text', 'translate_audio', 'quiz_page', 'quiz_grade', 'admin_quiz_list', 'admin_add_quiz']
+
+SENTENCES = [
+    "Hello, how are you?",
+    "I am learning a new language every day.",
+    "The weather is very pleasant today. We should go for a walk in the evening.",
+    "Please tell me the way to the railway station.",
+    "Education is the most powerful tool to change the world.",
+    "My mother is cooking food in the kitchen while my father reads the newspaper.",
+    "We will meet tomorrow morning at nine o'clock near the temple.",
+    "Children are playing in the park near our house.",
+]
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content_type, data) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def form(fields):
+    return urllib.parse.urlencode(fields).encode(), 'application/x-www-form-urlencoded'
+
+
+class Workload:
+    # Builds (method, path, body, content type) for request number i of a scenario
+    def __init__(self, quizzes, texts, seed_value):
+        self.quizzes = quizzes  # [(quiz id, [option ids])] in the 'hi' quiz set
+        self.texts = texts
+        self.audio = tone_wav()
+        self.random = random.Random(seed_value)
+        self._lock = threading.Lock()
+
+    def pick(self, items):
+        with self._lock:
+            return self.random.choice(items)
+
+    def build(self, scenario, i):
+        if scenario == 'translation_text':
+            body, content_type = form({'originalLanguage': 'en', 'translatedLanguage': 'hi',
+                                       'userText': self.pick(self.texts)})
+            return 'POST', '/translation_text', body, content_type
+        if scenario == 'translate_audio':
+            body, content_type = multipart({'from_lang': 'en', 'to_lang': 'hi'},
+                                           {'audio': ('recording.wav', 'audio/wav', self.audio)})
+            return 'POST', '/translate', body, content_type
+        if scenario == 'quiz_page':
+            return 'GET', '/quiz/hi', None, None
+        if scenario == 'quiz_grade':
+            answers = {}
+            for _ in range(min(10, len(self.quizzes))):
+                quiz_id, option_ids = self.pick(self.quizzes)
+                answers[f'answer_{quiz_id}'] = self.pick(option_ids)
+            body, content_type = form(answers)
+            return 'POST', '/quiz/hi', body, content_type
+        if scenario == 'admin_quiz_list':
+            return 'GET', '/quiz_list/hi', None, None
+        if scenario == 'admin_add_quiz':
+            # New quizzes go to their own language so the quiz pages being measured do not grow
+            body, content_type = form({'language': 'bench', 'question': f'Added question {i}?', 'answer': 'Right',
+                                       'opt1': 'Wrong one', 'opt2': 'Wrong two', 'opt3': 'Wrong three'})
+            return 'POST', '/add_quiz', body, content_type
+        raise ValueError(f'Unknown scenario {scenario}')
+
+
+def run_level(port, workload, scenario, concurrency, requests):
+    local = threading.local()
+
+    def one(i):
+        method, path, body, content_type = workload.build(scenario, i)
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        headers = {'Content-Type': content_type} if content_type else {}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for seconds, _ in results)
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, ok in results if not ok),
+        'throughput_rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Latency and throughput of the main request paths, fully offline')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=100, help='Requests per scenario and concurrency level')
+    parser.add_argument('--quizzes', type=int, default=200, help='Quizzes seeded into the measured quiz set')
+    parser.add_argument('--distinct-texts', type=int, default=50,
+                        help='Size of the text pool for translations; smaller means more cache hits')
+    parser.add_argument('--translate-delay-ms', type=float, default=50)
+    parser.add_argument('--tts-delay-ms', type=float, default=30)
+    parser.add_argument('--recognize-delay-ms', type=float, default=100)
+    parser.add_argument('--local-models', action='store_true', help='Keep the local MarianMT routes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--compare', help='Earlier JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    stub = start_stub_server(delay_ms=args.translate_delay_ms, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix='request-bench-')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'TRANSLATION_CACHE_DB': '',
+        'TRANSLATION_MEMORY_DB': '',
+        'TRANSLATION_BACKENDS': 'http',
+        'LIBRETRANSLATE_URL': stub.url,
+        'WARMUP': 'lazy',
+        'SLOW_REQUEST_MS': str(10 ** 9),
+    })
+    os.chdir(workdir)  # Generated audio goes to <workdir>/static/saved_audios
+    install_fake_gtts(delay_ms=args.tts_delay_ms)
+
+    import logging
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No access log line per request
+
+    install_stub_recognizer(app_module, delay_ms=args.recognize_delay_ms)
+    if not args.local_models:
+        app_module.model_router.route = lambda source_lang, target_lang: None
+
+    app_module.init_storage()
+    with app_module.app.app_context():
+        quizzes = seed(app_module, 'hi', args.quizzes)
+        quiz_options = [(quiz.id, [option.id for option in quiz.options]) for quiz in quizzes]
+
+    rng = random.Random(args.seed)
+    texts = [' '.join(rng.sample(SENTENCES, 2)) + f' ({i})' for i in range(args.distinct_texts)]
+    workload = Workload(quiz_options, texts, args.seed)
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    rows = []
+    try:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                row = run_level(port, workload, scenario, concurrency, args.requests)
+                rows.append(row)
+                print(json.dumps(row))
+    finally:
+        server.shutdown()
+        stub.shutdown()
+
+    meta = environment(benchmark='requests', quizzes=args.quizzes, distinct_texts=args.distinct_texts,
+                       translate_delay_ms=args.translate_delay_ms, tts_delay_ms=args.tts_delay_ms,
+                       recognize_delay_ms=args.recognize_delay_ms, local_models=args.local_models)
+    if args.output:
+        write_report(args.output, meta, rows)
+    if args.compare:
+        compare(args.compare, rows, ['scenario', 'concurrency'], ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'])
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# ======= Startup cost =======
+# Imports app.py in fresh interpreters and reports import time, peak RSS and
+# which heavy libraries got loaded, then does the same after one request to a
+# page that does not translate (/login).  Both numbers should stay small and
+# torch/transformers should not show up until something is translated.
+#
+#   python benchmarks/bench_startup.py --repeat 5 --top 10
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['torch', 'transformers', 'gtts', 'speech_recognition', 'moviepy', 'deep_translator']
+
+PROBE = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+row = {'import_seconds': imported}
+if sys.argv[1] == 'request':
+    with app.app.app_context():
+        app.db.create_all()
+    started = time.perf_counter()
+    status = app.app.test_client().get('/login').status_code
+    row['first_request_seconds'] = time.perf_counter() - started
+    row['status'] = status
+row['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+row['heavy_modules'] = [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+print(json.dumps(row))
+'''
+
+
+def probe(mode, env):
+    output = subprocess.run([sys.executable, '-c', PROBE, mode, json.dumps(HEAVY_MODULES)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top):
+    # -X importtime writes "import time: self | cumulative | name" to stderr
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    rows.sort(reverse=True)
+    return [{'module': name.strip(), 'cumulative_ms': round(us / 1000.0, 1)} for us, name in rows[:top]]
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import time and RSS of app.py')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Also list the N slowest imports')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env['TRANSLATION_CACHE_DB'] = ''
+    env['TRANSLATION_MEMORY_DB'] = ''
+
+    results = {}
+    for mode in ('import', 'request'):
+        rows = [probe(mode, env) for _ in range(args.repeat)]
+        result = {
+            'import_seconds': round(median(row['import_seconds'] for row in rows), 3),
+            'max_rss_mb': round(median(row['max_rss_mb'] for row in rows), 1),
+            'heavy_modules': rows[-1]['heavy_modules'],
+        }
+        if mode == 'request':
+            result['first_request_seconds'] = round(median(row['first_request_seconds'] for row in rows), 3)
+        results[mode] = result
+    if args.top:
+        results['slowest_imports'] = slowest_imports(env, args.top)
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# ======= Memory per pre-fork worker =======
+# Starts gunicorn (gunicorn.conf.py, wsgi:application) with N workers, sends
+# translation requests so every worker has run the model, then reads
+# /proc/<pid>/smaps_rollup of the parent and each worker:
+#   rss  - resident pages, shared ones counted in full in every worker
+#   pss  - shared pages divided between the processes that map them; the sum
+#          over all processes is the real memory use
+#   uss  - pages private to the worker (what one more worker really costs)
+# Runs once with PRELOAD_BEFORE_FORK=1 and once with 0 so the two can be compared.
+# Linux only.  Point it at local models as usual (MODEL_DIR / MODEL_ROUTES_FILE).
+#
+#   python benchmarks/bench_workers.py --workers 4 --pairs en-hi --requests 64
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory_mb(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return {
+        'rss': round(fields.get('Rss', 0) / 1024, 1),
+        'pss': round(fields.get('Pss', 0) / 1024, 1),
+        'uss': round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1),
+        'anonymous': round(fields.get('Anonymous', 0) / 1024, 1),
+    }
+
+
+def children(pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The process name is in parentheses and may contain spaces
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return sorted(pids)
+
+
+def post_json(url, payload, timeout=300):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def wait_ready(url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {process.returncode}')
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'{url} not ready after {timeout}s')
+
+
+def measure(preload, args):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    workdir = tempfile.mkdtemp(prefix='workers-bench-')
+    env = dict(os.environ)
+    env.update({
+        'BIND': f'127.0.0.1:{port}',
+        'WEB_CONCURRENCY': str(args.workers),
+        'PRELOAD_BEFORE_FORK': '1' if preload else '0',
+        'PRELOAD_MODEL_PAIRS': args.pairs,
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'TRANSLATION_CACHE_DB': '',
+        'TRANSLATION_MEMORY_DB': '',
+    })
+    env.setdefault('TRANSLATION_BACKENDS', '')  # Stay offline unless asked otherwise
+
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(f'{base}/ready', process, args.timeout)
+        ready_seconds = time.perf_counter() - started
+
+        # Unique texts so no translation cache answers; enough requests that every worker gets some
+        source_lang, target_lang = args.pairs.split(',')[0].split('-')
+        payloads = [{'source_lang': source_lang, 'target_lang': target_lang,
+                     'texts': [f'Sentence number {i} for the memory test.']} for i in range(args.requests)]
+        with ThreadPoolExecutor(max_workers=args.workers * 2) as pool:
+            results = list(pool.map(lambda payload: post_json(f'{base}/api/translate/batch', payload), payloads))
+        failed = sum(1 for result in results if result['translations'][0] == 'Translation failed')
+
+        workers = children(process.pid)
+        per_worker = [dict(memory_mb(pid), pid=pid) for pid in workers]
+        parent = memory_mb(process.pid)
+        return {
+            'preload_before_fork': preload,
+            'ready_seconds': round(ready_seconds, 2),
+            'requests': args.requests,
+            'failed_translations': failed,
+            'parent': parent,
+            'workers': per_worker,
+            'worker_rss_mb_avg': round(sum(w['rss'] for w in per_worker) / len(per_worker), 1),
+            'worker_uss_mb_avg': round(sum(w['uss'] for w in per_worker) / len(per_worker), 1),
+            'total_pss_mb': round(parent['pss'] + sum(w['pss'] for w in per_worker), 1),
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-worker RSS/PSS/USS under gunicorn, with and without preloading')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--pairs', default='en-hi', help='Pairs to preload; the first one is used for requests')
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=600, help='Seconds to wait for the server to come up')
+    parser.add_argument('--mode', choices=['both', 'preload', 'no-preload'], default='both')
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.mode in ('both', 'preload'):
+        results.append(measure(True, args))
+    if args.mode in ('both', 'no-preload'):
+        results.append(measure(False, args))
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# ======= Offline stand-ins for gTTS and speech recognition =======
+# Benchmarks must not depend on Google being reachable or fast.  Online
+# translation goes to stub_translation_server.py through the real "http"
+# backend; gTTS and the speech recognizer are replaced in-process with stubs
+# that sleep for a fixed time and return fixed output, so request latency
+# measures our own code plus a known, constant amount of "network".
+import io
+import math
+import struct
+import sys
+import time
+import types
+import wave
+
+# A valid MPEG-1 Layer III frame header followed by padding; players accept it
+FAKE_MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+def install_fake_gtts(delay_ms=30, frames=8):
+    # Replaces the gtts package for everything imported afterwards (app imports it lazily)
+    module = types.ModuleType('gtts')
+
+    class gTTS:
+        def __init__(self, text, lang='en', slow=False, **kwargs):
+            self.text = text
+            self.lang = lang
+
+        def stream(self):
+            time.sleep(delay_ms / 1000.0)
+            for _ in range(frames):
+                yield FAKE_MP3_FRAME
+
+        def write_to_fp(self, fp):
+            for chunk in self.stream():
+                fp.write(chunk)
+
+        def save(self, path):
+            with open(path, 'wb') as f:
+                self.write_to_fp(f)
+
+    module.gTTS = gTTS
+    sys.modules['gtts'] = module
+    return module
+
+
+class StubRecognizer:
+    # Same interface as speech_pipeline.GoogleRecognizer: PCM is fed while ffmpeg decodes the upload
+    streaming = False
+
+    def __init__(self, text, delay_ms):
+        self.text = text
+        self.delay_ms = delay_ms
+        self.pcm_bytes = 0
+
+    def feed(self, pcm):
+        self.pcm_bytes += len(pcm)
+
+    def partial(self):
+        return ''
+
+    def finish(self):
+        time.sleep(self.delay_ms / 1000.0)
+        return self.text
+
+
+def install_stub_recognizer(app_module, text='Hello, how are you today?', delay_ms=100):
+    # ffmpeg still decodes the upload for real; only the Google call is replaced
+    def make_recognizer(backend, lang, sr_language, vosk_model_dir):
+        return StubRecognizer(text, delay_ms)
+
+    app_module.make_recognizer = make_recognizer
+
+
+def tone_wav(seconds=2.0, rate=16000, frequency=440.0):
+    # A short WAV file like the browser would upload
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        samples = (int(8000 * math.sin(2 * math.pi * frequency * i / rate)) for i in range(int(seconds * rate)))
+        wav.writeframes(b''.join(struct.pack('<h', sample) for sample in samples))
+    return buffer.getvalue()
@@ -0,0 +1,76 @@
+# ======= Shared helpers for benchmark reports =======
+# Every report is JSON with the same "meta" block (commit, Python, CPU, ...) so
+# runs from different commits or machines can be told apart, and --compare
+# prints how each row moved against an earlier report.
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    # values must be sorted
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cpu_model():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def environment(**extra):
+    meta = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu': cpu_model(),
+        'cpu_count': os.cpu_count(),
+        'argv': sys.argv[1:],
+    }
+    meta.update(extra)
+    return meta
+
+
+def write_report(path, meta, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': rows}, f, indent=2)
+    print(f"Wrote {path}")
+
+
+def compare(path, rows, key_fields, metrics):
+    # Prints new / old for each metric of rows that appear in both reports; > 1 means larger now
+    with open(path, encoding='utf-8') as f:
+        previous = json.load(f)
+    old_rows = {tuple(row.get(field) for field in key_fields): row for row in previous['results']}
+    print(f"Compared with {path} (commit {previous['meta'].get('commit')}):")
+    for row in rows:
+        key = tuple(row.get(field) for field in key_fields)
+        old = old_rows.get(key)
+        if old is None:
+            continue
+        ratios = {metric: round(row[metric] / old[metric], 2) for metric in metrics if old.get(metric)}
+        print(json.dumps({'key': dict(zip(key_fields, key)), 'new_over_old': ratios}))
@@ -0,0 +1,94 @@
+# ======= Stub translation server =======
+# A local LibreTranslate-compatible server (POST /translate) for exercising the
+# "http" translation backend without the network.  Latency, slow outliers and
+# errors are configurable, so timeouts, circuit breakers and hedged requests
+# can be checked against a provider that misbehaves on purpose.
+#
+#   python benchmarks/stub_translation_server.py --port 5005 --delay-ms 50 --slow-fraction 0.1 --slow-ms 2000
+#   LIBRETRANSLATE_URL=http://127.0.0.1:5005 TRANSLATION_BACKENDS=http python app.py
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubTranslationHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._reply(400, {'error': 'Invalid JSON'})
+
+        with server.lock:
+            server.requests += 1
+            slow = server.random.random() < server.slow_fraction
+            fail = server.random.random() < server.error_rate
+        time.sleep((server.slow_ms if slow else server.delay_ms) / 1000.0)
+
+        if self.path.rstrip('/') != '/translate':
+            return self._reply(404, {'error': 'Not found'})
+        if fail:
+            return self._reply(500, {'error': 'Stub failure'})
+        if 'q' not in body or 'target' not in body:
+            return self._reply(400, {'error': 'q and target are required'})
+        return self._reply(200, {'translatedText': f"[{body['target']}] {body['q']}"})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client timed out and went away
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_stub_server(port=0, delay_ms=50, slow_ms=0, slow_fraction=0.0, error_rate=0.0, seed=None, verbose=False):
+    # Serves on a daemon thread; port=0 picks a free port (server.server_address[1])
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubTranslationHandler)
+    server.daemon_threads = True
+    server.delay_ms = delay_ms
+    server.slow_ms = slow_ms
+    server.slow_fraction = slow_fraction
+    server.error_rate = error_rate
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.verbose = verbose
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, name='stub-translation-server', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='LibreTranslate-compatible stub server')
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--delay-ms', type=float, default=50)
+    parser.add_argument('--slow-ms', type=float, default=0, help='Latency of the slow outliers')
+    parser.add_argument('--slow-fraction', type=float, default=0.0, help='Share of requests that are slow')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests that return 500')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    server = start_stub_server(args.port, args.delay_ms, args.slow_ms, args.slow_fraction, args.error_rate,
+                               args.seed, verbose=True)
+    print(f'Stub translation server on {server.url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
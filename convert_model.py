@@ -0,0 +1,166 @@
+# ======= Convert a MarianMT model for faster CPU inference =======
+# Usage:
+#   python convert_model.py --model Helsinki-NLP/opus-mt-en-hi --backend onnx --check
+#   python convert_model.py --model Helsinki-NLP/opus-mt-en-hi --backend ctranslate2 --quantization int8 --check
+#   python convert_model.py --model Helsinki-NLP/opus-mt-en-hi --backend torch-int8 --check
+#
+# Converted models are written where the web app looks for them
+# (CONVERTED_MODEL_DIR/<backend>/<model name>).  --check translates a set of
+# sentences with the reference PyTorch model and the converted one and
+# reports how closely they agree and how fast each one is.  Models saved in
+# MODEL_DIR (flask download-models) are converted and checked from there, so
+# no hub access is needed.
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+
+from inference_backends import converted_model_path, directory_size_bytes, make_loader
+from model_routing import local_model_path
+
+SAMPLE_SENTENCES = [
+    "Hello, how are you?",
+    "I am learning a new language every day.",
+    "The weather is very pleasant today.",
+    "Please tell me the way to the railway station.",
+    "Education is the most powerful tool to change the world.",
+    "My mother is cooking food in the kitchen.",
+    "We will meet tomorrow morning at nine o'clock.",
+    "This book was written by a famous author.",
+    "Children are playing in the park near our house.",
+    "Can you help me translate this document?",
+]
+
+
+def export_onnx(model_name, output_path, quantize=False):
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import MarianTokenizer
+
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_path)
+    MarianTokenizer.from_pretrained(model_name).save_pretrained(output_path)
+
+    if quantize:
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for filename in os.listdir(output_path):
+            if filename.endswith('.onnx'):
+                quantizer = ORTQuantizer.from_pretrained(output_path, file_name=filename)
+                quantizer.quantize(save_dir=output_path, quantization_config=config)
+                # Replace the float graph with its quantized copy so the app picks it up
+                quantized = filename.replace('.onnx', '_quantized.onnx')
+                os.replace(os.path.join(output_path, quantized), os.path.join(output_path, filename))
+
+
+def export_ctranslate2(model_name, output_path, quantization='int8'):
+    import ctranslate2
+    from transformers import MarianTokenizer
+
+    converter = ctranslate2.converters.TransformersConverter(model_name)
+    converter.convert(output_path, quantization=quantization, force=True)
+    MarianTokenizer.from_pretrained(model_name).save_pretrained(output_path)
+
+
+def timed_translate(entry, sentences, batch_size):
+    outputs = []
+    started = time.perf_counter()
+    for i in range(0, len(sentences), batch_size):
+        outputs.extend(entry.translate_batch(sentences[i:i + batch_size]))
+    return outputs, time.perf_counter() - started
+
+
+def parity_check(model_name, backend, sentences, threads, num_beams, converted_dir, batch_size, model_dir=None):
+    reference = make_loader('torch', threads=threads, num_beams=num_beams, model_dir=model_dir)(model_name)
+    candidate = make_loader(backend, threads=threads, num_beams=num_beams, converted_dir=converted_dir,
+                            model_dir=model_dir)(model_name)
+
+    # Warm both models up so the first timed batch is not dominated by lazy initialisation
+    reference.translate_batch(sentences[:1])
+    candidate.translate_batch(sentences[:1])
+
+    reference_out, reference_time = timed_translate(reference, sentences, batch_size)
+    candidate_out, candidate_time = timed_translate(candidate, sentences, batch_size)
+
+    exact = sum(1 for a, b in zip(reference_out, candidate_out) if a == b)
+    similarity = sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(reference_out, candidate_out))
+    report = {
+        'model': model_name,
+        'backend': backend,
+        'sentences': len(sentences),
+        'exact_match': round(exact / len(sentences), 3),
+        'char_similarity': round(similarity / len(sentences), 3),
+        'reference_seconds': round(reference_time, 3),
+        'candidate_seconds': round(candidate_time, 3),
+        'speedup': round(reference_time / candidate_time, 2) if candidate_time else None,
+        'reference_size_mb': round(reference.size_bytes / (1024 * 1024), 1),
+        'candidate_size_mb': round(candidate.size_bytes / (1024 * 1024), 1),
+    }
+    try:
+        import sacrebleu
+        report['bleu_vs_reference'] = round(sacrebleu.corpus_bleu(candidate_out, [reference_out]).score, 2)
+    except ImportError:
+        pass
+
+    mismatches = [
+        {'source': s, 'reference': a, 'candidate': b}
+        for s, a, b in zip(sentences, reference_out, candidate_out) if a != b
+    ]
+    return report, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a MarianMT model and check it against the PyTorch reference.')
+    parser.add_argument('--model', default='Helsinki-NLP/opus-mt-en-hi')
+    parser.add_argument('--backend', choices=['onnx', 'ctranslate2', 'torch-int8'], required=True)
+    parser.add_argument('--output-dir', default=os.environ.get('CONVERTED_MODEL_DIR', 'models/converted'))
+    parser.add_argument('--model-dir', default=os.environ.get('MODEL_DIR', 'models/marian'),
+                        help='Local model copies; used instead of the hub when the model is there')
+    parser.add_argument('--quantization', default='int8',
+                        help='CTranslate2 weight type (int8, int8_float32, float32); for onnx any value but "none" quantizes')
+    parser.add_argument('--skip-convert', action='store_true', help='Only run the parity check')
+    parser.add_argument('--check', action='store_true', help='Compare the converted model with the reference')
+    parser.add_argument('--sentences', help='File with one source sentence per line for the parity check')
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--num-beams', type=int, default=0, help='1 for greedy search, 0 for the model default')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--min-similarity', type=float, default=0.9,
+                        help='Exit with an error when the average character similarity is lower than this')
+    args = parser.parse_args(argv)
+
+    output_path = converted_model_path(args.output_dir, args.backend, args.model)
+    if not args.skip_convert and args.backend != 'torch-int8':
+        # torch-int8 is quantized when the app loads it, so there is nothing to write
+        os.makedirs(output_path, exist_ok=True)
+        source = local_model_path(args.model_dir, args.model)
+        if args.backend == 'onnx':
+            export_onnx(source, output_path, quantize=args.quantization != 'none')
+        else:
+            export_ctranslate2(source, output_path, args.quantization)
+        print(f"Wrote {args.backend} model to {output_path} ({directory_size_bytes(output_path) / (1024 * 1024):.1f} MB)")
+
+    if not args.check:
+        return 0
+
+    sentences = SAMPLE_SENTENCES
+    if args.sentences:
+        with open(args.sentences, encoding='utf-8') as f:
+            sentences = [line.strip() for line in f if line.strip()]
+
+    report, mismatches = parity_check(args.model, args.backend, sentences, args.threads, args.num_beams,
+                                      args.output_dir, args.batch_size, args.model_dir)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    for mismatch in mismatches[:5]:
+        print(json.dumps(mismatch, ensure_ascii=False))
+
+    if report['char_similarity'] < args.min_similarity:
+        print(f"Parity check failed: similarity {report['char_similarity']} < {args.min_similarity}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+# ======= Offline evaluation: corpus BLEU and token accuracy =======
+# Replaces calculate_accuracy() and evaluate_bleu() from
+# backend/English--Hindi.ipynb, which reloaded the dataset on every call and
+# translated one sentence at a time.  Here:
+#   - the corpus is a local parallel file (jsonl / csv / tsv, as for the
+#     translation memory), read once
+#   - sources are sorted by token length and grouped into batches that pad to
+#     about their own length, and the batches are spread over a process pool
+#     with one copy of the model per worker
+#   - hypotheses are cached in SQLite under a hash of the model files and the
+#     decoding settings, so running again on an unchanged checkpoint decodes
+#     nothing
+#   - BLEU and token accuracy are computed together in a single pass
+#
+# Usage:
+#   python evaluation.py data/en-hi.tsv --model Helsinki-NLP/opus-mt-en-hi --source-lang en --target-lang hi
+#   python evaluation.py data/en-hi.jsonl --model models/finetuned/en-hi --workers 4 --output eval.json
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from inference_backends import BACKENDS, converted_model_path, make_loader
+from model_routing import local_model_path
+from translation_memory import read_parallel_file
+
+MAX_BLEU_ORDER = 4
+
+
+# ======= Corpus and model checkpoint =======
+def read_corpus(path, source_lang, target_lang, limit=None):
+    pairs = []
+    for source, reference in read_parallel_file(path, source_lang, target_lang):
+        if source and reference and source.strip() and reference.strip():
+            pairs.append((source.strip(), reference.strip()))
+            if limit and len(pairs) >= limit:
+                break
+    return pairs
+
+
+def checkpoint_path(model, backend='torch', model_dir=None, converted_dir='models/converted'):
+    # The directory whose files actually do the decoding, or None when the
+    # model is only known by a hub name that has not been downloaded
+    if backend in ('onnx', 'ctranslate2'):
+        converted = converted_model_path(converted_dir, backend, model)
+        if os.path.isdir(converted):
+            return converted
+    path = local_model_path(model_dir, model)
+    if os.path.isdir(path):
+        return path
+    try:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(model, local_files_only=True)
+    except Exception:
+        return None
+
+
+def checkpoint_hash(path):
+    # Content hash of every file under the checkpoint directory (weights,
+    # config, vocabulary), so a retrained model gets a new key even when it is
+    # saved to the same place
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path, followlinks=True):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for filename in sorted(files):
+            if filename.startswith('.'):
+                continue
+            full_path = os.path.join(root, filename)
+            digest.update(os.path.relpath(full_path, path).replace(os.sep, '/').encode('utf-8') + b'\0')
+            with open(full_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+# ======= Hypothesis cache =======
+class HypothesisCache:
+    # SQLite table of (checkpoint key, source) -> hypothesis; the checkpoint key
+    # includes the decoding settings because they change the output too
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(db_path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS hypotheses ('
+            ' key_hash TEXT PRIMARY KEY,'
+            ' checkpoint TEXT NOT NULL,'
+            ' hypothesis TEXT NOT NULL,'
+            ' stored_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS ix_hypotheses_checkpoint ON hypotheses (checkpoint)')
+
+    @staticmethod
+    def _hash_key(checkpoint, source):
+        return hashlib.sha256(f'{checkpoint}\x1f{source}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, checkpoint, sources):
+        found = {}
+        keys = {self._hash_key(checkpoint, source): source for source in set(sources)}
+        key_list = list(keys)
+        for start in range(0, len(key_list), 500):  # Stay under SQLite's bound parameter limit
+            chunk = key_list[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key_hash, hypothesis FROM hypotheses WHERE key_hash IN ({','.join('?' * len(chunk))})", chunk)
+            for key_hash, hypothesis in rows:
+                found[keys[key_hash]] = hypothesis
+        return found
+
+    def put_many(self, checkpoint, items):
+        now = time.time()
+        with self._db:
+            self._db.execute('BEGIN')
+            self._db.executemany(
+                'INSERT OR REPLACE INTO hypotheses (key_hash, checkpoint, hypothesis, stored_at) VALUES (?, ?, ?, ?)',
+                [(self._hash_key(checkpoint, source), checkpoint, hypothesis, now) for source, hypothesis in items])
+
+    def close(self):
+        self._db.close()
+
+
+# ======= Batched, parallel decoding =======
+def length_batches(lengths, max_batch_tokens=4096, max_batch_size=64):
+    # Indices grouped so each batch holds sentences of similar token length,
+    # like BatchScheduler does for live requests; longest batches first so the
+    # slowest work does not trail at the end of the pool
+    ordered = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    batch = []
+    for i in ordered:
+        if batch and (lengths[i] * (len(batch) + 1) > max_batch_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    batches.reverse()
+    return batches
+
+
+_worker_entry = None  # The model loaded once in each pool worker
+
+
+def _init_worker(model, backend, threads, num_beams, max_new_tokens, converted_dir, model_dir):
+    global _worker_entry
+    loader = make_loader(backend, threads=threads, num_beams=num_beams, max_new_tokens=max_new_tokens,
+                         converted_dir=converted_dir, model_dir=model_dir)
+    _worker_entry = loader(model)
+
+
+def _translate_batch(indices, texts):
+    return indices, _worker_entry.translate_batch(texts)
+
+
+def decode(sources, model, backend='torch', workers=1, threads=None, num_beams=None, max_new_tokens=None,
+           converted_dir='models/converted', model_dir=None, max_batch_tokens=4096, max_batch_size=64):
+    # Returns one hypothesis per source, in order
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(local_model_path(model_dir, model))
+    lengths = [len(ids) for ids in tokenizer(sources, truncation=True)['input_ids']]
+    batches = length_batches(lengths, max_batch_tokens, max_batch_size)
+    if not threads:
+        threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    init_args = (model, backend, threads, num_beams, max_new_tokens, converted_dir, model_dir)
+
+    hypotheses = [None] * len(sources)
+    done = 0
+    if workers <= 1:
+        _init_worker(*init_args)
+        results = (_translate_batch(batch, [sources[i] for i in batch]) for batch in batches)
+        for indices, outputs in results:
+            for i, output in zip(indices, outputs):
+                hypotheses[i] = output
+            done += len(indices)
+            print(f"Decoded {done}/{len(sources)}", file=sys.stderr)
+        return hypotheses
+
+    # spawn rather than fork: torch and the tokenizer's thread pools do not survive fork()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=init_args) as pool:
+        futures = [pool.submit(_translate_batch, batch, [sources[i] for i in batch]) for batch in batches]
+        for future in as_completed(futures):
+            indices, outputs = future.result()
+            for i, output in zip(indices, outputs):
+                hypotheses[i] = output
+            done += len(indices)
+            print(f"Decoded {done}/{len(sources)}", file=sys.stderr)
+    return hypotheses
+
+
+# ======= Scores =======
+def _stemmer():
+    # The notebook compared Porter stems; without nltk only the prefix rule applies
+    try:
+        from nltk.stem import PorterStemmer
+        return PorterStemmer().stem
+    except ImportError:
+        return None
+
+
+def token_accuracy(ref_tokens, pred_tokens, stem=None):
+    # Position by position, as in the notebook: a token counts when the stems or the first four letters agree
+    if not ref_tokens:
+        return 0.0
+    correct = 0
+    for ref, pred in zip(ref_tokens, pred_tokens):
+        if ref.lower()[:4] == pred.lower()[:4] or (stem is not None and stem(ref) == stem(pred)):
+            correct += 1
+    return correct / len(ref_tokens)
+
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def score(hypotheses, references):
+    # Corpus BLEU (0-100) and mean token accuracy over whitespace tokens in one
+    # pass.  BLEU matches nltk's corpus_bleu with smoothing method1, which the
+    # notebook used; when sacrebleu is installed its standard (13a-tokenized)
+    # score is reported as well, for comparison with published numbers.
+    stem = _stemmer()
+    matches = [0] * MAX_BLEU_ORDER
+    totals = [0] * MAX_BLEU_ORDER
+    hyp_length = ref_length = 0
+    accuracy_sum = 0.0
+    for hypothesis, reference in zip(hypotheses, references):
+        hyp_tokens = hypothesis.split()
+        ref_tokens = reference.split()
+        hyp_length += len(hyp_tokens)
+        ref_length += len(ref_tokens)
+        for n in range(1, MAX_BLEU_ORDER + 1):
+            hyp_ngrams = _ngrams(hyp_tokens, n)
+            ref_ngrams = _ngrams(ref_tokens, n)
+            matches[n - 1] += sum(min(count, ref_ngrams[gram]) for gram, count in hyp_ngrams.items())
+            totals[n - 1] += max(1, len(hyp_tokens) - n + 1)  # nltk counts at least one n-gram per sentence
+        accuracy_sum += token_accuracy(ref_tokens, hyp_tokens, stem)
+
+    if hyp_length == 0 or matches[0] == 0:
+        bleu = 0.0
+    else:
+        # method1: an n-gram order with no matches counts as 0.1 matches instead of zeroing the score
+        log_precision = sum(math.log((matches[n] or 0.1) / totals[n]) for n in range(MAX_BLEU_ORDER) if totals[n])
+        brevity = 1.0 if hyp_length > ref_length else math.exp(1 - ref_length / hyp_length)
+        bleu = 100 * brevity * math.exp(log_precision / MAX_BLEU_ORDER)
+
+    scores = {
+        'bleu': round(bleu, 2),
+        'token_accuracy': round(accuracy_sum / len(references), 4) if references else 0.0,
+        'hypothesis_tokens': hyp_length,
+        'reference_tokens': ref_length,
+    }
+    try:
+        import sacrebleu
+        scores['sacrebleu'] = round(sacrebleu.corpus_bleu(list(hypotheses), [list(references)]).score, 2)
+    except ImportError:
+        pass
+    return scores
+
+
+# ======= Evaluation =======
+def evaluate(pairs, model, backend='torch', workers=1, cache_db=None, **decode_options):
+    # pairs: [(source, reference)].  Returns the scores plus timing and cache counts.
+    started = time.perf_counter()
+    sources = [source for source, _ in pairs]
+    references = [reference for _, reference in pairs]
+
+    cache = None
+    checkpoint = None
+    if cache_db:
+        path = checkpoint_path(model, backend, decode_options.get('model_dir'),
+                               decode_options.get('converted_dir', 'models/converted'))
+        if path is None:
+            print(f"{model} is not on disk, so its hypotheses are not cached", file=sys.stderr)
+        else:
+            settings = {key: decode_options.get(key) for key in ('num_beams', 'max_new_tokens')}
+            checkpoint = f"{checkpoint_hash(path)}:{backend}:{json.dumps(settings, sort_keys=True)}"
+            cache = HypothesisCache(cache_db)
+
+    cached = cache.get_many(checkpoint, sources) if cache else {}
+    hits = sum(1 for source in sources if source in cached)
+    missing = list(dict.fromkeys(source for source in sources if source not in cached))  # Unique, in order
+
+    decode_seconds = 0.0
+    if missing:
+        decode_started = time.perf_counter()
+        decoded = decode(missing, model, backend, workers, **decode_options)
+        decode_seconds = time.perf_counter() - decode_started
+        cached.update(zip(missing, decoded))
+        if cache:
+            cache.put_many(checkpoint, zip(missing, decoded))
+    if cache:
+        cache.close()
+
+    hypotheses = [cached[source] for source in sources]
+    report = {
+        'model': model,
+        'backend': backend,
+        'checkpoint': checkpoint,
+        'sentences': len(pairs),
+        'decoded': len(missing),  # Unique sources not in the cache
+        'cached': hits,
+        'workers': workers,
+        'decode_seconds': round(decode_seconds, 2),
+        'sentences_per_second': round(len(missing) / decode_seconds, 1) if decode_seconds else None,
+    }
+    report.update(score(hypotheses, references))
+    report['total_seconds'] = round(time.perf_counter() - started, 2)
+    return report, hypotheses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Corpus BLEU and token accuracy of a MarianMT model on a parallel file')
+    parser.add_argument('corpus', help='Parallel file: .jsonl, .csv with language columns, or tab-separated')
+    parser.add_argument('--model', default='Helsinki-NLP/opus-mt-en-hi', help='Hub name or local directory')
+    parser.add_argument('--source-lang', default='en')
+    parser.add_argument('--target-lang', default='hi')
+    parser.add_argument('--limit', type=int, help='Evaluate only the first N pairs')
+    parser.add_argument('--backend', choices=BACKENDS, default=os.environ.get('INFERENCE_BACKEND', 'torch'))
+    parser.add_argument('--workers', type=int, default=max(1, min(4, os.cpu_count() or 1)),
+                        help='Processes, each with its own copy of the model')
+    parser.add_argument('--threads', type=int, default=0, help='Threads per worker; 0 splits the CPUs between them')
+    parser.add_argument('--num-beams', type=int, default=0, help='1 for greedy search, 0 for the model default')
+    parser.add_argument('--max-new-tokens', type=int, default=0)
+    parser.add_argument('--max-batch-tokens', type=int, default=4096, help='Padded source tokens per batch')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--converted-dir', default=os.environ.get('CONVERTED_MODEL_DIR', 'models/converted'))
+    parser.add_argument('--model-dir', default=os.environ.get('MODEL_DIR', 'models/marian'))
+    parser.add_argument('--cache-db', default=os.environ.get('EVALUATION_CACHE_DB', 'instance/evaluation_cache.db'),
+                        help="Hypothesis cache; '' turns it off")
+    parser.add_argument('--hypotheses', help='Write source, reference and hypothesis per line (tab-separated) here')
+    parser.add_argument('--output', help='Write the report as JSON here')
+    args = parser.parse_args(argv)
+
+    pairs = read_corpus(args.corpus, args.source_lang, args.target_lang, args.limit)
+    if not pairs:
+        parser.error(f"No {args.source_lang}-{args.target_lang} pairs in {args.corpus}")
+    print(f"Evaluating {args.model} ({args.backend}) on {len(pairs)} pairs from {args.corpus}", file=sys.stderr)
+
+    report, hypotheses = evaluate(
+        pairs, args.model, args.backend, args.workers, cache_db=args.cache_db or None,
+        threads=args.threads or None, num_beams=args.num_beams or None, max_new_tokens=args.max_new_tokens or None,
+        converted_dir=args.converted_dir, model_dir=args.model_dir,
+        max_batch_tokens=args.max_batch_tokens, max_batch_size=args.max_batch_size)
+    report.update(corpus=args.corpus, source_lang=args.source_lang, target_lang=args.target_lang)
+    print(json.dumps(report, ensure_ascii=False))
+
+    if args.hypotheses:
+        with open(args.hypotheses, 'w', encoding='utf-8') as f:
+            for (source, reference), hypothesis in zip(pairs, hypotheses):
+                f.write(f"{source}\t{reference}\t{hypothesis}\n")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    return report
+
+
+if __name__ == '__main__':
+    main()
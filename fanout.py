@@ -0,0 +1,62 @@
+# ======= Concurrent fan-out with a shared deadline =======
+# Runs one callable per key (e.g. one per target language) on a shared thread
+# pool and yields each result as soon as it finishes, so the total wall-clock
+# time is close to the slowest task rather than the sum.  Whatever has not
+# finished by the deadline is reported as timed out; those calls keep running
+# in the background (their results still land in the caches) but nobody waits
+# for them.
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+
+FanOutResult = namedtuple('FanOutResult', ['key', 'ok', 'value', 'error', 'seconds'])
+
+
+class FanOut:
+    def __init__(self, max_workers=16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fanout')
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.tasks = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def _timed(task):
+        started = time.perf_counter()
+        value = task()
+        return value, time.perf_counter() - started
+
+    def run(self, tasks, timeout=None):
+        # tasks: {key: callable}.  Yields a FanOutResult per key in completion order.
+        started = time.perf_counter()
+        futures = {self._executor.submit(self._timed, task): key for key, task in tasks.items()}
+        with self._lock:
+            self.runs += 1
+            self.tasks += len(futures)
+
+        remaining = set(futures)
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                remaining.discard(future)
+                key = futures[future]
+                try:
+                    value, seconds = future.result()
+                except Exception as e:
+                    with self._lock:
+                        self.failures += 1
+                    yield FanOutResult(key, False, None, str(e), round(time.perf_counter() - started, 3))
+                    continue
+                yield FanOutResult(key, True, value, None, round(seconds, 3))
+        except TimeoutError:
+            elapsed = round(time.perf_counter() - started, 3)
+            with self._lock:
+                self.timeouts += len(remaining)
+            for future in [future for future in futures if future in remaining]:
+                future.cancel()  # Only helps if it has not started yet
+                yield FanOutResult(futures[future], False, None, 'timeout', elapsed)
+
+    def stats(self):
+        with self._lock:
+            return {'runs': self.runs, 'tasks': self.tasks, 'failures': self.failures, 'timeouts': self.timeouts}
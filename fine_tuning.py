@@ -0,0 +1,430 @@
+# ======= Fine-tuning MarianMT on a parallel corpus =======
+# Replaces fine_tune_and_plot() from backend/English--Hindi.ipynb, which
+# re-tokenized every row on every epoch, padded random batches to their longest
+# sentence and kept no checkpoints.  Here:
+#   - the corpus is tokenized once into a memory-mapped cache on disk
+#     (instance/token_cache/<key>/), reused until the corpus, tokenizer or
+#     max length change
+#   - batches are built from sentences of similar length under a token budget
+#     and padded only to their own longest sentence
+#   - gradients are accumulated over several batches, weighted by target tokens
+#   - checkpoints (model, optimizer, scheduler, position in the epoch) are saved
+#     every --save-every steps and picked up again automatically
+#   - the result is saved as a normal MarianMT directory and can be added to a
+#     MODEL_ROUTES_FILE, so the web app's registry loads it like any hub model
+#
+# Usage:
+#   python fine_tuning.py data/en-hi.tsv --model Helsinki-NLP/opus-mt-en-hi --output-dir models/finetuned/en-hi \
+#       --eval-corpus data/en-hi-dev.tsv --routes-file instance/routes.json --pair en-hi
+#   MODEL_ROUTES_FILE=instance/routes.json python app.py
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from evaluation import length_batches, read_corpus, score
+from model_routing import local_model_path
+from translation_memory import read_parallel_dataset
+
+LABEL_PAD = -100  # Label positions the loss ignores
+
+
+# ======= Pre-tokenized, memory-mapped corpus =======
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tokenizer_hash(tokenizer):
+    vocab = sorted(tokenizer.get_vocab().items())
+    return hashlib.sha256(json.dumps([type(tokenizer).__name__, vocab], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def cache_key(corpus_id, tokenizer, max_length, token=None, limit=None):
+    parts = [corpus_id, _tokenizer_hash(tokenizer), str(max_length), token or '', str(limit or '')]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def build_token_cache(pairs, tokenizer, path, max_length=256, token=None, chunk_size=1000):
+    # Writes source/target token ids as flat int32 files plus offset arrays, in
+    # a temporary directory renamed into place at the end, so an interrupted
+    # build is never mistaken for a finished one
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    offsets = {'source': [0], 'target': [0]}
+    files = {side: open(os.path.join(tmp_path, f'{side}.bin'), 'wb') for side in offsets}
+    count = 0
+
+    def flush(chunk):
+        sources = [(token + ' ' if token else '') + source for source, _ in chunk]
+        encoded = {
+            'source': tokenizer(sources, truncation=True, max_length=max_length)['input_ids'],
+            'target': tokenizer(text_target=[target for _, target in chunk], truncation=True,
+                                max_length=max_length)['input_ids'],
+        }
+        for side, sequences in encoded.items():
+            for ids in sequences:
+                np.asarray(ids, dtype=np.int32).tofile(files[side])
+                offsets[side].append(offsets[side][-1] + len(ids))
+
+    try:
+        chunk = []
+        for pair in pairs:
+            chunk.append(pair)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                count += len(chunk)
+                chunk = []
+                print(f"Tokenized {count} pairs")
+        if chunk:
+            flush(chunk)
+            count += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+    if not count:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise ValueError("The corpus has no usable pairs")
+
+    for side, values in offsets.items():
+        np.save(os.path.join(tmp_path, f'{side}_offsets.npy'), np.asarray(values, dtype=np.int64))
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'pairs': count, 'max_length': max_length, 'token': token}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"Token cache with {count} pairs written to {path}")
+    return path
+
+
+class TokenCache:
+    # Read-only view of a built cache; the ids stay on disk and are paged in as batches need them
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self._ids = {}
+        self._offsets = {}
+        for side in ('source', 'target'):
+            self._ids[side] = np.memmap(os.path.join(path, f'{side}.bin'), dtype=np.int32, mode='r')
+            self._offsets[side] = np.load(os.path.join(path, f'{side}_offsets.npy'), mmap_mode='r')
+        self.source_lengths = np.diff(self._offsets['source'])
+        self.target_lengths = np.diff(self._offsets['target'])
+
+    def __len__(self):
+        return len(self.source_lengths)
+
+    def get(self, side, i):
+        offsets = self._offsets[side]
+        return self._ids[side][offsets[i]:offsets[i + 1]]
+
+
+def open_token_cache(cache_dir, key, pairs_factory, tokenizer, max_length, token=None):
+    # pairs_factory is only called when the cache has to be built
+    path = os.path.join(cache_dir, key)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        build_token_cache(pairs_factory(), tokenizer, path, max_length, token)
+    else:
+        print(f"Using token cache {path}")
+    return TokenCache(path)
+
+
+# ======= Length-bucketed batches with dynamic padding =======
+class LengthBucketSampler:
+    # Each epoch: shuffle, sort inside pools of pool_size sentences, cut the
+    # pools into batches of similar length under max_tokens padded tokens and
+    # shuffle the batches.  The order only depends on (seed, epoch), so a
+    # resumed run sees exactly the batches it would have seen.
+    def __init__(self, source_lengths, target_lengths, max_tokens=2048, max_batch_size=64, seed=0, pool_size=None):
+        self.lengths = np.maximum(source_lengths, target_lengths)
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.seed = seed
+        self.pool_size = pool_size or max_batch_size * 50
+
+    def batches(self, epoch):
+        rng = np.random.RandomState(self.seed + epoch)
+        order = rng.permutation(len(self.lengths))
+        batches = []
+        for start in range(0, len(order), self.pool_size):
+            pool = order[start:start + self.pool_size]
+            for batch in length_batches([int(n) for n in self.lengths[pool]], self.max_tokens, self.max_batch_size):
+                batches.append([int(pool[i]) for i in batch])
+        rng.shuffle(batches)
+        return batches
+
+
+def collate(cache, indices, pad_id):
+    # Pads to the longest sentence of this batch only
+    import torch
+
+    sources = [cache.get('source', i) for i in indices]
+    targets = [cache.get('target', i) for i in indices]
+    input_ids = torch.full((len(indices), max(len(ids) for ids in sources)), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros_like(input_ids)
+    labels = torch.full((len(indices), max(len(ids) for ids in targets)), LABEL_PAD, dtype=torch.long)
+    for row, (source, target) in enumerate(zip(sources, targets)):
+        input_ids[row, :len(source)] = torch.from_numpy(np.asarray(source, dtype=np.int64))
+        attention_mask[row, :len(source)] = 1
+        labels[row, :len(target)] = torch.from_numpy(np.asarray(target, dtype=np.int64))
+    return {'input_ids': input_ids, 'attention_mask': attention_mask, 'labels': labels}
+
+
+# ======= Checkpoints =======
+def latest_checkpoint(output_dir):
+    checkpoints = sorted(glob.glob(os.path.join(output_dir, 'checkpoints', 'step-*', 'trainer_state.json')))
+    return os.path.dirname(checkpoints[-1]) if checkpoints else None
+
+
+def save_checkpoint(output_dir, model, tokenizer, optimizer, scheduler, state, keep=2):
+    import torch
+
+    path = os.path.join(output_dir, 'checkpoints', f"step-{state['step']:07d}")
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    model.save_pretrained(tmp_path)
+    tokenizer.save_pretrained(tmp_path)
+    torch.save({'optimizer': optimizer.state_dict(), 'scheduler': scheduler.state_dict(),
+                'rng': torch.get_rng_state()}, os.path.join(tmp_path, 'trainer.pt'))
+    # Written last: a directory without trainer_state.json is not a checkpoint
+    with open(os.path.join(tmp_path, 'trainer_state.json'), 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+    for old in sorted(glob.glob(os.path.join(output_dir, 'checkpoints', 'step-*')))[:-keep]:
+        if not old.endswith('.tmp'):
+            shutil.rmtree(old, ignore_errors=True)
+    print(f"Saved checkpoint {path}")
+    return path
+
+
+# ======= Export for the web app =======
+def export_model(model, tokenizer, export_dir):
+    # A plain MarianMT directory with safetensors weights, loadable by every backend loader
+    model.save_pretrained(export_dir)
+    tokenizer.save_pretrained(export_dir)
+    print(f"Exported the model to {export_dir}")
+    return export_dir
+
+
+def add_route(routes_file, pair, model_path, token=None):
+    # Adds or replaces the pair in a MODEL_ROUTES_FILE (see model_routing.load_routes)
+    routes = {}
+    if os.path.exists(routes_file):
+        with open(routes_file, encoding='utf-8') as f:
+            routes = json.load(f)
+    routes[pair] = {'model': os.path.abspath(model_path), 'token': token} if token else os.path.abspath(model_path)
+    directory = os.path.dirname(routes_file)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(routes_file, 'w', encoding='utf-8') as f:
+        json.dump(routes, f, indent=2)
+    print(f"Route {pair} -> {model_path} added to {routes_file}; start the app with MODEL_ROUTES_FILE={routes_file}")
+
+
+# ======= Training =======
+def evaluate_model(model, tokenizer, pairs, token=None, max_batch_tokens=4096):
+    # Greedy decoding of a held-out set in length-sorted batches; BLEU and token accuracy as in evaluation.py
+    from model_registry import LoadedModel
+
+    model.eval()
+    entry = LoadedModel('fine-tuning', model, tokenizer, next(model.parameters()).device, {'num_beams': 1})
+    sources = [(token + ' ' if token else '') + source for source, _ in pairs]
+    hypotheses = [None] * len(sources)
+    for batch in length_batches(entry.token_lengths(sources), max_batch_tokens):
+        for i, hypothesis in zip(batch, entry.translate_batch([sources[i] for i in batch])):
+            hypotheses[i] = hypothesis
+    model.train()
+    return score(hypotheses, [reference for _, reference in pairs])
+
+
+def train(cache, model_name, output_dir, epochs=3, lr=5e-5, weight_decay=0.01, warmup_steps=500,
+          max_tokens=2048, max_batch_size=64, accumulation=4, save_every=200, keep_checkpoints=2,
+          resume=True, seed=0, eval_pairs=None, token=None, log_every=20, cache_name=None):
+    import torch
+    from transformers import MarianMTModel, MarianTokenizer, get_linear_schedule_with_warmup
+
+    torch.manual_seed(seed)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    checkpoint = latest_checkpoint(output_dir) if resume else None
+    state = {'step': 0, 'epoch': 0, 'next_batch': 0, 'cache': cache_name, 'history': []}
+    if checkpoint:
+        with open(os.path.join(checkpoint, 'trainer_state.json'), encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('cache') != cache_name:
+            raise ValueError(f"{checkpoint} was trained on a different token cache; use --no-resume or another "
+                             "--output-dir")
+        print(f"Resuming from {checkpoint} (epoch {state['epoch'] + 1}, step {state['step']})")
+        model_name = checkpoint
+
+    model = MarianMTModel.from_pretrained(model_name).to(device)
+    tokenizer = MarianTokenizer.from_pretrained(model_name)
+    model.train()
+
+    sampler = LengthBucketSampler(cache.source_lengths, cache.target_lengths, max_tokens, max_batch_size, seed)
+    steps_per_epoch = -(-len(sampler.batches(0)) // accumulation)
+    no_decay = ('bias', 'layer_norm', 'layernorm')
+    groups = [
+        {'params': [p for n, p in model.named_parameters() if not any(k in n.lower() for k in no_decay)],
+         'weight_decay': weight_decay},
+        {'params': [p for n, p in model.named_parameters() if any(k in n.lower() for k in no_decay)],
+         'weight_decay': 0.0},
+    ]
+    optimizer = torch.optim.AdamW(groups, lr=lr)
+    scheduler = get_linear_schedule_with_warmup(optimizer, min(warmup_steps, steps_per_epoch * epochs),
+                                                steps_per_epoch * epochs)
+    if checkpoint:
+        trainer_state = torch.load(os.path.join(checkpoint, 'trainer.pt'), weights_only=False)
+        optimizer.load_state_dict(trainer_state['optimizer'])
+        scheduler.load_state_dict(trainer_state['scheduler'])
+        torch.set_rng_state(trainer_state['rng'])
+
+    def save():
+        save_checkpoint(output_dir, model, tokenizer, optimizer, scheduler, state, keep_checkpoints)
+
+    pad_id = tokenizer.pad_token_id
+    while state['epoch'] < epochs:
+        epoch = state['epoch']
+        batches = sampler.batches(epoch)
+        window_loss = window_tokens = 0.0
+        loss_sum = tokens_sum = 0.0
+        started = time.perf_counter()
+        for window_start in range(state['next_batch'], len(batches), accumulation):
+            window = batches[window_start:window_start + accumulation]
+            # Every batch's mean loss is weighted by its share of the window's target tokens,
+            # so short and long batches count per token as one big batch would
+            total_tokens = int(sum(cache.target_lengths[i] for batch in window for i in batch))
+            for batch in window:
+                inputs = {name: tensor.to(device) for name, tensor in collate(cache, batch, pad_id).items()}
+                batch_tokens = int((inputs['labels'] != LABEL_PAD).sum())
+                loss = model(**inputs).loss
+                (loss * batch_tokens / total_tokens).backward()
+                window_loss += loss.item() * batch_tokens
+                window_tokens += batch_tokens
+            torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad(set_to_none=True)
+            state['step'] += 1
+            state['next_batch'] = window_start + len(window)
+
+            if state['step'] % log_every == 0:
+                elapsed = time.perf_counter() - started
+                loss_sum += window_loss
+                tokens_sum += window_tokens
+                print(f"Epoch {epoch + 1}/{epochs} step {state['step']} batch {state['next_batch']}/{len(batches)} "
+                      f"loss {window_loss / window_tokens:.4f} lr {scheduler.get_last_lr()[0]:.2e} "
+                      f"{tokens_sum / elapsed:.0f} target tokens/s")
+                window_loss = window_tokens = 0.0
+            if save_every and state['step'] % save_every == 0:
+                save()
+        loss_sum += window_loss
+        tokens_sum += window_tokens
+
+        result = {'epoch': epoch + 1, 'step': state['step'], 'seconds': round(time.perf_counter() - started, 1)}
+        if tokens_sum:
+            # Only covers the batches run in this process when the epoch was resumed
+            result['loss'] = round(loss_sum / tokens_sum, 4)
+        if eval_pairs:
+            result.update(evaluate_model(model, tokenizer, eval_pairs, token))
+        print(json.dumps(result, ensure_ascii=False))
+        state['history'].append(result)
+        state['epoch'] = epoch + 1
+        state['next_batch'] = 0
+        save()
+
+    with open(os.path.join(output_dir, 'history.json'), 'w', encoding='utf-8') as f:
+        json.dump(state['history'], f, indent=2)
+    return model, tokenizer, state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fine-tune a MarianMT model on a parallel corpus')
+    parser.add_argument('corpus', nargs='?', help='Parallel file: .jsonl, .csv with language columns, or tab-separated')
+    parser.add_argument('--dataset', help='Hugging Face dataset with a translation column instead, e.g. hind_encorp')
+    parser.add_argument('--split', default='train')
+    parser.add_argument('--source-lang', default='en')
+    parser.add_argument('--target-lang', default='hi')
+    parser.add_argument('--limit', type=int, help='Train on the first N pairs only')
+    parser.add_argument('--model', default='Helsinki-NLP/opus-mt-en-hi', help='Hub name or local directory to start from')
+    parser.add_argument('--model-dir', default=os.environ.get('MODEL_DIR', 'models/marian'))
+    parser.add_argument('--token', help='Target language token for multilingual models, e.g. ">>hin<<"')
+    parser.add_argument('--max-length', type=int, default=256, help='Longer sentences are truncated')
+    parser.add_argument('--cache-dir', default=os.environ.get('TOKEN_CACHE_DIR', 'instance/token_cache'))
+    parser.add_argument('--output-dir', help='Checkpoints and history; default models/finetuned/<pair>')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--lr', type=float, default=5e-5)
+    parser.add_argument('--weight-decay', type=float, default=0.01)
+    parser.add_argument('--warmup-steps', type=int, default=500)
+    parser.add_argument('--max-tokens', type=int, default=2048, help='Padded tokens per batch')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--accumulation', type=int, default=4, help='Batches per optimizer step')
+    parser.add_argument('--save-every', type=int, default=200, help='Optimizer steps between checkpoints')
+    parser.add_argument('--keep-checkpoints', type=int, default=2)
+    parser.add_argument('--no-resume', action='store_true', help='Ignore checkpoints already in --output-dir')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads', type=int, default=0, help='0 keeps the torch default')
+    parser.add_argument('--log-every', type=int, default=20)
+    parser.add_argument('--eval-corpus', help='Held-out parallel file scored after every epoch')
+    parser.add_argument('--eval-limit', type=int, default=500)
+    parser.add_argument('--export-dir', help='Where the final model goes; default <output-dir>/model')
+    parser.add_argument('--routes-file', help='Add the exported model to this MODEL_ROUTES_FILE for --pair')
+    parser.add_argument('--pair', help='Pair the route is for, default <source-lang>-<target-lang>')
+    args = parser.parse_args(argv)
+    if not args.corpus and not args.dataset:
+        parser.error('Give a corpus file or --dataset')
+
+    from transformers import MarianTokenizer
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    pair = args.pair or f'{args.source_lang}-{args.target_lang}'
+    output_dir = args.output_dir or os.path.join('models', 'finetuned', pair)
+    os.makedirs(output_dir, exist_ok=True)
+    model_name = local_model_path(args.model_dir, args.model)
+    tokenizer = MarianTokenizer.from_pretrained(model_name)
+
+    if args.corpus:
+        corpus_id = 'file:' + _file_hash(args.corpus)
+
+        def pairs_factory():
+            return read_corpus(args.corpus, args.source_lang, args.target_lang, args.limit)
+    else:
+        corpus_id = f'dataset:{args.dataset}:{args.split}:{args.source_lang}-{args.target_lang}'
+
+        def pairs_factory():
+            pairs = ((s, t) for s, t in read_parallel_dataset(args.dataset, args.source_lang, args.target_lang,
+                                                              args.split) if s and t and s.strip() and t.strip())
+            return (pair for i, pair in zip(range(args.limit), pairs)) if args.limit else pairs
+
+    key = cache_key(corpus_id, tokenizer, args.max_length, args.token, args.limit)
+    cache = open_token_cache(args.cache_dir, key, pairs_factory, tokenizer, args.max_length, args.token)
+    eval_pairs = read_corpus(args.eval_corpus, args.source_lang, args.target_lang, args.eval_limit) \
+        if args.eval_corpus else None
+
+    model, tokenizer, state = train(
+        cache, model_name, output_dir, epochs=args.epochs, lr=args.lr, weight_decay=args.weight_decay,
+        warmup_steps=args.warmup_steps, max_tokens=args.max_tokens, max_batch_size=args.max_batch_size,
+        accumulation=args.accumulation, save_every=args.save_every, keep_checkpoints=args.keep_checkpoints,
+        resume=not args.no_resume, seed=args.seed, eval_pairs=eval_pairs, token=args.token,
+        log_every=args.log_every, cache_name=key)
+
+    export_dir = export_model(model, tokenizer, args.export_dir or os.path.join(output_dir, 'model'))
+    if args.routes_file:
+        add_route(args.routes_file, pair, export_dir, args.token)
+    return state
+
+
+if __name__ == '__main__':
+    main()
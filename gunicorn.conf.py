@@ -0,0 +1,26 @@
+# ======= gunicorn settings =======
+#   gunicorn -c gunicorn.conf.py wsgi:application
+# One worker by default.  Background jobs, recording sessions and TTS stream
+# keys live in the memory of the worker that created them, and the pages poll
+# or upload to them with follow-up requests, which another worker would answer
+# with 404.  More workers (WEB_CONCURRENCY) need a proxy with sticky sessions
+# so a client always reaches the same worker; the model weights are loaded
+# once in the parent (preload_app) and shared, so they cost little memory.
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Threads let one worker serve streaming responses and quick pages while another request waits on the model
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+preload_app = True
+# First requests can wait for a model load or a slow online translator
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+# Recycle workers now and then so slow leaks (e.g. in tokenizers) cannot build up
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    from app import after_fork
+    after_fork(workers)
@@ -0,0 +1,154 @@
+# ======= CPU inference backends for MarianMT =======
+# The registry asks a loader for each model.  make_loader() picks the backend
+# from config:
+#   torch        - full-precision PyTorch (reference)
+#   torch-int8   - PyTorch with int8 dynamic quantization of the Linear layers
+#   onnx         - ONNX Runtime graph exported with convert_model.py
+#   ctranslate2  - CTranslate2 model converted with convert_model.py
+import os
+
+from model_registry import LoadedModel
+from model_routing import local_model_path
+
+BACKENDS = ('torch', 'torch-int8', 'onnx', 'ctranslate2')
+
+
+def converted_model_path(converted_dir, backend, model_name):
+    # Helsinki-NLP/opus-mt-en-hi -> <converted_dir>/onnx/Helsinki-NLP--opus-mt-en-hi
+    return os.path.join(converted_dir, backend, model_name.replace('/', '--'))
+
+
+def directory_size_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+def generation_settings(num_beams=None, max_new_tokens=None):
+    # num_beams=1 means greedy search; None keeps the model's own default
+    settings = {}
+    if num_beams:
+        settings['num_beams'] = num_beams
+    if max_new_tokens:
+        settings['max_new_tokens'] = max_new_tokens
+    return settings
+
+
+def load_torch(model_name, generate_kwargs=None):
+    import torch
+    from transformers import MarianMTModel, MarianTokenizer
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = MarianMTModel.from_pretrained(model_name)
+    tokenizer = MarianTokenizer.from_pretrained(model_name)
+    model.to(device)
+    model.eval()
+    return LoadedModel(model_name, model, tokenizer, device, generate_kwargs)
+
+
+def load_torch_int8(model_name, generate_kwargs=None):
+    import torch
+    from transformers import MarianMTModel, MarianTokenizer
+
+    model = MarianMTModel.from_pretrained(model_name)
+    model.eval()
+    # Dynamic quantization only runs on CPU; weights of every Linear layer become int8
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    tokenizer = MarianTokenizer.from_pretrained(model_name)
+    entry = LoadedModel(model_name, model, tokenizer, torch.device('cpu'), generate_kwargs)
+    entry.size_bytes = quantized_size_bytes(model)
+    return entry
+
+
+def quantized_size_bytes(model):
+    # Quantized Linear weights are packed and no longer show up in parameters()
+    import io
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def load_onnx(model_path, model_name, threads=None, generate_kwargs=None):
+    import onnxruntime
+    import torch
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import MarianTokenizer
+
+    session_options = onnxruntime.SessionOptions()
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, session_options=session_options)
+    tokenizer = MarianTokenizer.from_pretrained(model_path)
+    entry = LoadedModel(model_name, model, tokenizer, torch.device('cpu'), generate_kwargs)
+    entry.size_bytes = directory_size_bytes(model_path)
+    return entry
+
+
+class CTranslate2Model(LoadedModel):
+    def __init__(self, name, translator, tokenizer, model_path, generate_kwargs=None):
+        super().__init__(name, None, tokenizer, 'cpu', generate_kwargs)
+        self.translator = translator
+        self.size_bytes = directory_size_bytes(model_path)
+
+    def translate_batch(self, texts, **generate_kwargs):
+        settings = dict(self.generate_kwargs, **generate_kwargs)
+        source_tokens = [
+            self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(text, truncation=True)) for text in texts
+        ]
+        results = self.translator.translate_batch(
+            source_tokens,
+            beam_size=settings.get('num_beams', 4),
+            max_decoding_length=settings.get('max_new_tokens', 256),
+        )
+        return [
+            self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True)
+            for result in results
+        ]
+
+
+def load_ctranslate2(model_path, model_name, threads=None, generate_kwargs=None):
+    import ctranslate2
+    from transformers import MarianTokenizer
+
+    translator = ctranslate2.Translator(model_path, device='cpu', intra_threads=threads or 0, inter_threads=1)
+    tokenizer = MarianTokenizer.from_pretrained(model_path)
+    return CTranslate2Model(model_name, translator, tokenizer, model_path, generate_kwargs)
+
+
+def make_loader(backend='torch', threads=None, num_beams=None, max_new_tokens=None, converted_dir='models/converted',
+                model_dir=None):
+    # Returns loader(model_name) -> LoadedModel for the ModelRegistry.
+    # With model_dir, hub names are loaded from local copies there when present.
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    generate_kwargs = generation_settings(num_beams, max_new_tokens)
+
+    def loader(model_name):
+        if threads and backend in ('torch', 'torch-int8'):
+            import torch
+            torch.set_num_threads(threads)
+
+        source = local_model_path(model_dir, model_name)
+        if backend == 'torch':
+            return load_torch(source, generate_kwargs)
+        if backend == 'torch-int8':
+            return load_torch_int8(source, generate_kwargs)
+
+        model_path = converted_model_path(converted_dir, backend, model_name)
+        if not os.path.isdir(model_path):
+            # Not converted yet: serve the reference model rather than failing
+            print(f"No {backend} model at {model_path}, run convert_model.py; using PyTorch for {model_name}")
+            return load_torch(source, generate_kwargs)
+        if backend == 'onnx':
+            return load_onnx(model_path, model_name, threads, generate_kwargs)
+        return load_ctranslate2(model_path, model_name, threads, generate_kwargs)
+
+    return loader
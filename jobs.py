@@ -0,0 +1,204 @@
+# ======= Background job pipeline (recognize -> translate -> TTS) =======
+# Requests get a job id back straight away.  Each job is a list of steps run
+# on a bounded thread pool; a step that hits a flaky upstream raises RetryLater
+# and is re-queued after an exponential backoff instead of sleeping in a
+# worker.  When too many jobs are waiting, submit() raises QueueFull so the
+# route can answer 503 rather than pile up work.
+import heapq
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RetryLater(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, steps, payload, result=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.steps = steps  # List of (name, callable(job))
+        self.payload = payload
+        self.result = dict(result or {})  # What the polling page sees, filled in step by step
+        self.state = 'queued'
+        self.step_index = 0
+        self.attempts = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.step_seconds = {}
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'result': dict(self.result),
+            'step_seconds': dict(self.step_seconds),
+        }
+        if self.error:
+            data['error'] = self.error
+        if self.finished_at:
+            data['seconds'] = round(self.finished_at - self.created_at, 3)
+        return data
+
+
+class JobManager:
+    def __init__(self, max_workers=4, max_queue=100, max_retries=3, base_delay=0.5, max_delay=8.0,
+                 keep_seconds=600):
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.keep_seconds = keep_seconds
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._waiting = 0  # Jobs admitted but not yet running a step
+
+        # Delayed retries: (due time, sequence, job) handled by one timer thread
+        self._delayed = []
+        self._sequence = itertools.count()
+        self._delayed_ready = threading.Condition(self._lock)
+        self._timer = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retries = 0
+        self._latencies = deque(maxlen=1000)
+
+    def submit(self, kind, steps, payload=None, result=None):
+        job = Job(kind, steps, payload or {}, result)
+        with self._lock:
+            self._expire_locked()
+            if self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f'{self._waiting} jobs are already waiting')
+            self._jobs[job.id] = job
+            self._waiting += 1
+            self.submitted += 1
+        self._executor.submit(self._run_step, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run_step(self, job):
+        with self._lock:
+            self._waiting -= 1
+        name, step = job.steps[job.step_index]
+        job.state = name
+        started = time.perf_counter()
+        try:
+            step(job)
+        except RetryLater as e:
+            job.step_seconds[name] = round(job.step_seconds.get(name, 0) + time.perf_counter() - started, 3)
+            self._retry(job, str(e))
+            return
+        except Exception as e:
+            self._finish(job, error=f'{name} failed: {e}')
+            return
+        job.step_seconds[name] = round(job.step_seconds.get(name, 0) + time.perf_counter() - started, 3)
+
+        job.step_index += 1
+        job.attempts = 0
+        if job.step_index >= len(job.steps):
+            self._finish(job)
+            return
+        # Go to the back of the queue so one long job does not hold a worker for every step
+        job.state = 'queued'
+        with self._lock:
+            self._waiting += 1
+        self._executor.submit(self._run_step, job)
+
+    def _retry(self, job, reason):
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self._finish(job, error=f'{job.steps[job.step_index][0]} failed after {self.max_retries} retries: {reason}')
+            return
+        delay = min(self.base_delay * (2 ** (job.attempts - 1)), self.max_delay)
+        delay *= random.uniform(0.8, 1.2)  # Jitter so retries of many jobs do not line up
+        job.state = 'retrying'
+        with self._lock:
+            self.retries += 1
+            self._waiting += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._sequence), job))
+            if self._timer is None or not self._timer.is_alive():
+                self._timer = threading.Thread(target=self._run_timer, name='job-retries', daemon=True)
+                self._timer.start()
+            self._delayed_ready.notify()
+
+    def _run_timer(self):
+        with self._lock:
+            while True:
+                while not self._delayed:
+                    self._delayed_ready.wait()
+                due, _, job = self._delayed[0]
+                now = time.monotonic()
+                if due > now:
+                    self._delayed_ready.wait(due - now)
+                    continue
+                heapq.heappop(self._delayed)
+                # _run_step takes the lock itself, so hand it over without holding it
+                self._lock.release()
+                try:
+                    self._executor.submit(self._run_step, job)
+                finally:
+                    self._lock.acquire()
+
+    def _finish(self, job, error=None):
+        job.finished_at = time.time()
+        with self._lock:
+            if error:
+                job.state = 'failed'
+                job.error = error
+                self.failed += 1
+            else:
+                job.state = 'done'
+                self.completed += 1
+            self._latencies.append(job.finished_at - job.created_at)
+
+    def _expire_locked(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'queue_depth': self._waiting,
+                'max_queue': self.max_queue,
+                'delayed_retries': len(self._delayed),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'retries': self.retries,
+                'latency_seconds': {
+                    'p50': round(percentile(latencies, 50), 3),
+                    'p95': round(percentile(latencies, 95), 3),
+                    'p99': round(percentile(latencies, 99), 3),
+                },
+            }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
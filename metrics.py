@@ -0,0 +1,223 @@
+# ======= Timing spans, histograms and a Prometheus endpoint =======
+# span('generate', backend=model) times one stage of the work.  Every span is
+# counted in the app_stage_seconds histogram, labelled with the stage, the
+# backend that did the work (a model, an online provider, gtts, sqlite, ...)
+# and the language pair, and is also added to the trace of the current request
+# so slow requests can be broken down stage by stage.  Work done for a request
+# on another thread reaches its trace through copy_context() (one request per
+# call) or trace_handle()/add_span() (one batch serving several requests).
+#
+# The registry renders the Prometheus text format itself, so nothing has to be
+# installed.  Values are per process: under gunicorn every worker keeps its own,
+# so scrape the workers separately or treat them as samples.
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; from a cache hit to a first model load
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="' + str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') + '"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name + '_total', list(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [count per bucket..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(row)) for key, row in self._values.items()]
+        for key, row in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                yield self.name + '_bucket', labels + [('le', _number(bound))], cumulative
+            yield self.name + '_bucket', labels + [('le', '+Inf')], row[-1]
+            yield self.name + '_sum', labels, round(row[-2], 6)
+            yield self.name + '_count', labels, row[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []  # callables returning [(name, type, help, [(labels dict, value), ...])]
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        # For numbers other objects already count (cache hits, queue depth); read at scrape time
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_label_text(labels)} {_number(value)}')
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                sample_name = name + '_total' if metric_type == 'counter' else name
+                for labels, value in samples:
+                    lines.append(f'{sample_name}{_label_text(sorted(labels.items()))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'app_stage_seconds', 'Time spent in one stage of a request', ['stage', 'backend', 'pair'])
+REQUEST_SECONDS = registry.histogram(
+    'app_request_seconds', 'Time from request to response, by endpoint', ['endpoint', 'method', 'status'])
+EVENTS = registry.counter('app_events', 'Things that happened, such as fallbacks and failures', ['event', 'backend'])
+
+# Spans of the request being handled in this thread; None outside a request
+_trace = contextvars.ContextVar('trace', default=None)
+
+
+def start_trace():
+    return _trace.set([])
+
+
+def current_trace():
+    return list(_trace.get() or [])
+
+
+def end_trace(token):
+    spans = _trace.get()
+    _trace.reset(token)
+    return spans or []
+
+
+def trace_handle():
+    # The current request's trace (None outside a request), kept by work that finishes on another thread
+    return _trace.get()
+
+
+def add_span(trace, stage, seconds, backend='', pair=''):
+    # Adds to a trace from trace_handle() without counting the span in the histogram
+    if trace is not None:
+        trace.append({'stage': stage, 'backend': backend, 'pair': pair, 'ms': round(seconds * 1000, 2)})
+
+
+def record(stage, seconds, backend='', pair=''):
+    STAGE_SECONDS.observe(seconds, stage=stage, backend=backend, pair=pair)
+    add_span(_trace.get(), stage, seconds, backend, pair)
+
+
+@contextmanager
+def span(stage, backend='', pair=''):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, backend, pair)
+
+
+def server_timing(spans):
+    # Server-Timing header value: total milliseconds per stage, shown in the browser's network panel
+    totals = {}
+    for item in spans:
+        totals[item['stage']] = totals.get(item['stage'], 0.0) + item['ms']
+    return ', '.join(f'{stage};dur={ms:.1f}' for stage, ms in totals.items())
+
+
+def start_profile():
+    # None when another profiler is already running (only one can be active on Python 3.12+)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return None
+    return profile
+
+
+def finish_profile(profile, directory, name, top=25):
+    # Saves a .prof file (open with snakeviz or pstats) and returns it with the top functions as text
+    profile.disable()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{os.getpid()}.prof")
+    profile.dump_stats(path)
+    summary = io.StringIO()
+    pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(top)
+    return path, summary.getvalue()
@@ -0,0 +1,208 @@
+# ======= Process-wide MarianMT model registry =======
+# Every request used to build its own ContextAwareTranslator and call
+# from_pretrained again.  The registry loads each model once and hands the
+# same instance out to all Flask threads.  It is keyed by model name (or local
+# path) rather than by language pair, because with multilingual models and
+# pivoting several pairs share one model; see model_routing.py.
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import span
+
+
+class LoadedModel:
+    def __init__(self, name, model, tokenizer, device, generate_kwargs=None):
+        self.name = name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.generate_kwargs = dict(generate_kwargs or {})  # e.g. num_beams, max_new_tokens
+        self.size_bytes = model_size_bytes(model)
+        self.loaded_at = time.monotonic()
+        self.last_used = self.loaded_at
+        self.in_use = 0  # Number of requests currently borrowing this model
+        self.pinned = False  # Loaded before fork and shared with the other workers: never evicted
+
+    def token_lengths(self, texts):
+        return [len(ids) for ids in self.tokenizer(texts, truncation=True)['input_ids']]
+
+    def translate_batch(self, texts, **generate_kwargs):
+        import torch
+
+        tokens = self.tokenizer(texts, return_tensors='pt', padding=True, truncation=True).to(self.device)
+        with torch.inference_mode():
+            translated_tokens = self.model.generate(**tokens, **dict(self.generate_kwargs, **generate_kwargs))
+        return self.tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)
+
+
+def model_size_bytes(model):
+    if model is None:
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    except Exception:
+        return 0
+
+
+def load_marian_model(model_name):
+    # Full-precision PyTorch; see inference_backends.make_loader for the faster CPU backends.
+    # Imported here so that only processes that actually translate pay for torch
+    from inference_backends import load_torch
+    return load_torch(model_name)
+
+
+class ModelRegistry:
+    def __init__(self, loader=load_marian_model, max_models=4, max_memory_mb=None,
+                 idle_timeout=None, retry_failed_after=300):
+        self.loader = loader
+        self.max_models = max_models
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        self.idle_timeout = idle_timeout
+        self.retry_failed_after = retry_failed_after
+
+        self._models = OrderedDict()  # model name -> LoadedModel, least recently used first
+        self._failed = {}  # model name -> time of the last failed load
+        self._lock = threading.Lock()
+        self._load_locks = {}  # One lock per model so different models can load in parallel
+        self.loads = 0
+        self.evictions = 0
+
+    def is_available(self, model_name):
+        # False while a recent load of this model failed, so callers can go straight to a fallback
+        with self._lock:
+            failed_at = self._failed.get(model_name)
+        return failed_at is None or time.monotonic() - failed_at >= self.retry_failed_after
+
+    @contextmanager
+    def borrow(self, model_name):
+        # Yields the LoadedModel, or None if the model could not be loaded.
+        # A borrowed model is never evicted until the with-block exits.
+        entry = self._acquire(model_name)
+        try:
+            yield entry
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry.in_use -= 1
+                    entry.last_used = time.monotonic()
+
+    def preload(self, model_names, pin=False):
+        # pin=True keeps the models for the life of the process.  Pre-fork servers use it so
+        # that no worker drops the copy-on-write shared weights and then loads a private copy.
+        for model_name in model_names:
+            with self.borrow(model_name) as entry:
+                if entry is None:
+                    print(f"Could not preload MarianMT model {model_name}")
+                elif pin:
+                    entry.pinned = True
+
+    def _acquire(self, model_name):
+        key = model_name
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._take_locked(key)
+            if entry is not None:
+                return entry
+            failed_at = self._failed.get(key)
+            if failed_at is not None and time.monotonic() - failed_at < self.retry_failed_after:
+                return None
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; the others wait and then reuse its result
+        with load_lock:
+            with self._lock:
+                entry = self._take_locked(key)
+                if entry is not None:
+                    return entry
+
+            try:
+                with span('model_load', backend=model_name):
+                    entry = self.loader(model_name)
+                print(f"MarianMT model loaded: {model_name}")
+            except Exception as e:
+                print(f"Error loading MarianMT model {model_name}: {e}")
+                with self._lock:
+                    self._failed[key] = time.monotonic()
+                return None
+
+            with self._lock:
+                self._failed.pop(key, None)
+                self._models[key] = entry
+                self.loads += 1
+                entry.in_use += 1
+                self._evict_to_budget_locked()
+            return entry
+
+    def _take_locked(self, key):
+        entry = self._models.get(key)
+        if entry is not None:
+            self._models.move_to_end(key)
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+        return entry
+
+    def _memory_used_locked(self):
+        return sum(entry.size_bytes for entry in self._models.values())
+
+    def _over_budget_locked(self):
+        if self.max_models is not None and len(self._models) > self.max_models:
+            return True
+        if self.max_memory_bytes is not None and self._memory_used_locked() > self.max_memory_bytes:
+            return True
+        return False
+
+    def _evict_to_budget_locked(self):
+        # Drop least recently used models that nobody is borrowing right now
+        for key in list(self._models):
+            if not self._over_budget_locked():
+                break
+            if self._models[key].in_use == 0 and not self._models[key].pinned:
+                self._evict_locked(key)
+
+    def _evict_idle_locked(self):
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        for key, entry in list(self._models.items()):
+            if entry.in_use == 0 and not entry.pinned and now - entry.last_used > self.idle_timeout:
+                self._evict_locked(key)
+
+    def _evict_locked(self, key):
+        entry = self._models.pop(key)
+        self.evictions += 1
+        print(f"Evicted MarianMT model {entry.name}")
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_idle_locked()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': [
+                    {
+                        'name': name,
+                        'size_mb': round(entry.size_bytes / (1024 * 1024), 1),
+                        'in_use': entry.in_use,
+                        'pinned': entry.pinned,
+                        'idle_seconds': round(time.monotonic() - entry.last_used, 1),
+                    }
+                    for name, entry in self._models.items()
+                ],
+                'memory_mb': round(self._memory_used_locked() / (1024 * 1024), 1),
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
+
+
+def parse_pairs(value):
+    # "en-hi,hi-en" -> [('en', 'hi'), ('hi', 'en')]
+    pairs = []
+    for item in value.split(','):
+        item = item.strip()
+        if item:
+            source_lang, target_lang = item.split('-', 1)
+            pairs.append((source_lang.strip(), target_lang.strip()))
+    return pairs
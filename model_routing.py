@@ -0,0 +1,122 @@
+# ======= Language pair -> local MarianMT model routing =======
+# Decides which local model(s) translate a pair, so the online backends are only
+# a fallback.  In order of preference:
+#   direct       - a Helsinki-NLP opus-mt model trained on exactly that pair
+#   multilingual - a one-to-many model (en-dra, en-inc, ...) steered with a
+#                  target-language token such as ">>tam<<", or a many-to-one model
+#   pivot        - two hops through English (e.g. ta -> en -> hi)
+# A route is a list of Hop(model, token) applied one after another.
+#
+# Routes can be overridden with a JSON file whose models may be local paths:
+#   {"en-ta": {"model": "/models/opus-mt-en-dra", "token": ">>tam<<"},
+#    "en-hi": "/models/tiny-en-hi"}
+# and local_model_path() lets the loaders find hub model names in a MODEL_DIR
+# copy, so air-gapped machines never reach for the network.
+import json
+import os
+from collections import namedtuple
+
+Hop = namedtuple('Hop', ['model', 'token'])
+
+# Direct opus-mt models that exist for our languages
+DIRECT_MODELS = {
+    ('en', 'hi'): 'Helsinki-NLP/opus-mt-en-hi',
+    ('hi', 'en'): 'Helsinki-NLP/opus-mt-hi-en',
+    ('en', 'ml'): 'Helsinki-NLP/opus-mt-en-ml',
+    ('ml', 'en'): 'Helsinki-NLP/opus-mt-ml-en',
+    ('en', 'mr'): 'Helsinki-NLP/opus-mt-en-mr',
+    ('mr', 'en'): 'Helsinki-NLP/opus-mt-mr-en',
+    ('bn', 'en'): 'Helsinki-NLP/opus-mt-bn-en',
+}
+
+# English -> language family models; the target is chosen with a >>xxx<< token (ISO 639-3)
+ONE_TO_MANY_MODELS = {
+    'Helsinki-NLP/opus-mt-en-dra': {'ta': '>>tam<<', 'te': '>>tel<<', 'kn': '>>kan<<', 'ml': '>>mal<<'},
+    'Helsinki-NLP/opus-mt-en-inc': {'hi': '>>hin<<', 'bn': '>>ben<<', 'mr': '>>mar<<'},
+}
+
+# Language family -> English models; the source language needs no token
+MANY_TO_ONE_MODELS = {
+    'Helsinki-NLP/opus-mt-dra-en': ('ta', 'te', 'kn', 'ml'),
+    'Helsinki-NLP/opus-mt-inc-en': ('hi', 'bn', 'mr'),
+}
+
+
+class ModelRouter:
+    def __init__(self, routes=None, pivot_lang='en'):
+        # routes: {(source, target): [Hop, ...]} overriding the built-in table
+        self.overrides = routes or {}
+        self.pivot_lang = pivot_lang
+
+    def _single_hop(self, source_lang, target_lang):
+        key = (source_lang, target_lang)
+        if key in self.overrides:
+            return self.overrides[key]
+        if key in DIRECT_MODELS:
+            return [Hop(DIRECT_MODELS[key], None)]
+        if source_lang == 'en':
+            for model, tokens in ONE_TO_MANY_MODELS.items():
+                if target_lang in tokens:
+                    return [Hop(model, tokens[target_lang])]
+        if target_lang == 'en':
+            for model, sources in MANY_TO_ONE_MODELS.items():
+                if source_lang in sources:
+                    return [Hop(model, None)]
+        return None
+
+    def route(self, source_lang, target_lang):
+        # Returns the hops for the pair, or None if no local model can translate it
+        if source_lang == target_lang:
+            return None
+        hops = self._single_hop(source_lang, target_lang)
+        if hops is None and self.pivot_lang not in (source_lang, target_lang):
+            first = self._single_hop(source_lang, self.pivot_lang)
+            second = self._single_hop(self.pivot_lang, target_lang)
+            if first and second:
+                hops = first + second
+        return hops or None
+
+    def models_for(self, pairs):
+        # Every model the pairs need, e.g. for preloading
+        models = []
+        for source_lang, target_lang in pairs:
+            for hop in self.route(source_lang, target_lang) or ():
+                if hop.model not in models:
+                    models.append(hop.model)
+        return models
+
+    def table(self, languages):
+        # {"en-ta": [{"model": ..., "token": ...}], ...} for every routable pair, for inspection
+        table = {}
+        for source_lang in languages:
+            for target_lang in languages:
+                hops = self.route(source_lang, target_lang)
+                if hops:
+                    table[f'{source_lang}-{target_lang}'] = [hop._asdict() for hop in hops]
+        return table
+
+
+def local_model_path(model_dir, model_name):
+    # Helsinki-NLP/opus-mt-en-hi -> <model_dir>/Helsinki-NLP--opus-mt-en-hi or <model_dir>/opus-mt-en-hi
+    # when one of them exists; otherwise the name is left for from_pretrained to resolve
+    if not model_dir or os.path.isdir(model_name):
+        return model_name
+    for candidate in (model_name.replace('/', '--'), model_name.rsplit('/', 1)[-1]):
+        path = os.path.join(model_dir, candidate)
+        if os.path.isdir(path):
+            return path
+    return model_name
+
+
+def load_routes(path):
+    # JSON file: {"src-tgt": "model" | {"model": ..., "token": ...} | [hop, hop]}
+    with open(path, encoding='utf-8') as f:
+        raw = json.load(f)
+    routes = {}
+    for pair, value in raw.items():
+        source_lang, target_lang = pair.split('-', 1)
+        hops = value if isinstance(value, list) else [value]
+        routes[(source_lang, target_lang)] = [
+            Hop(hop, None) if isinstance(hop, str) else Hop(hop['model'], hop.get('token')) for hop in hops
+        ]
+    return routes
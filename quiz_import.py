@@ -0,0 +1,96 @@
+# ======= Bulk quiz import =======
+# Reads a question bank from CSV or JSON and writes it in one transaction
+# with two multi-row INSERTs (quizzes, then options) instead of committing
+# once per question and option.
+#
+# CSV:  language,question,answer,opt1,opt2,opt3[,opt4...]
+# JSON: [{"language": "hi", "question": "...", "answer": "...", "options": ["...", "..."]}, ...]
+#       ("opt1", "opt2", ... keys are accepted instead of "options")
+import csv
+import io
+import json
+
+from sqlalchemy import insert
+
+
+class QuizImportError(ValueError):
+    pass
+
+
+def _option_fields(record):
+    # Extra CSV columns beyond the header end up under the key None
+    keys = sorted((key for key in record if isinstance(key, str) and key.startswith('opt') and key[3:].isdigit()),
+                  key=lambda key: int(key[3:]))
+    return [record[key] for key in keys]
+
+
+def _text_field(record, key, line):
+    value = record.get(key)
+    if value is None:
+        return ''
+    if not isinstance(value, (str, int, float)):
+        raise QuizImportError(f"Record {line}: {key} must be text")
+    return str(value).strip()
+
+
+def normalize_record(record, line):
+    if not isinstance(record, dict):
+        raise QuizImportError(f"Record {line}: expected an object with language, question, answer and options")
+    language = _text_field(record, 'language', line)
+    question = _text_field(record, 'question', line)
+    answer = _text_field(record, 'answer', line)
+    options = record.get('options')
+    if options is None:
+        options = _option_fields(record)
+    elif not isinstance(options, list):
+        raise QuizImportError(f"Record {line}: options must be a list")
+    options = [str(option).strip() for option in options if option is not None and str(option).strip()]
+
+    if not language or not question or not answer:
+        raise QuizImportError(f"Record {line}: language, question and answer are required")
+    if not options:
+        raise QuizImportError(f"Record {line}: at least one wrong option is required")
+    return {'language': language, 'question': question, 'answer': answer, 'options': options}
+
+
+def parse_quiz_file(stream, filename=''):
+    # stream may be bytes or text; the format comes from the file extension, falling back to sniffing
+    data = stream.read()
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            raise QuizImportError(f"The file is not UTF-8 text (byte {e.start}); save it as UTF-8 and try again")
+
+    if filename.lower().endswith('.json') or data.lstrip().startswith(('[', '{')):
+        try:
+            records = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise QuizImportError(f"Invalid JSON: {e}")
+        if isinstance(records, dict):
+            records = records.get('quizzes', [])
+        if not isinstance(records, list):
+            raise QuizImportError("Expected a JSON list of quizzes, or an object with a \"quizzes\" list")
+        return [normalize_record(record, i + 1) for i, record in enumerate(records)]
+
+    reader = csv.DictReader(io.StringIO(data))
+    return [normalize_record(record, i + 2) for i, record in enumerate(reader)]
+
+
+def bulk_insert_quizzes(session, quiz_model, option_model, records):
+    # Runs inside the caller's transaction; the caller commits (or rolls back on error).
+    # Returns the ids of the new quizzes.
+    if not records:
+        return []
+
+    quiz_ids = session.execute(
+        insert(quiz_model).returning(quiz_model.id, sort_by_parameter_order=True),
+        [{'language': record['language'], 'question': record['question']} for record in records],
+    ).scalars().all()
+
+    option_rows = []
+    for quiz_id, record in zip(quiz_ids, records):
+        option_rows.append({'opt': record['answer'], 'answer': True, 'question_id': quiz_id})
+        option_rows.extend({'opt': option, 'answer': False, 'question_id': quiz_id} for option in record['options'])
+    session.execute(insert(option_model), option_rows)
+    return quiz_ids
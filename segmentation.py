@@ -0,0 +1,61 @@
+# ======= Sentence segmentation for long texts =======
+# MarianMT truncates input at the model's max length, so long paragraphs are
+# split into sentences and translated one segment at a time.
+import re
+
+# Latin terminators plus the Devanagari danda / double danda used in Hindi and Marathi
+_SENTENCE_END = re.compile(r'(?<=[.!?।॥])["\')\]]*\s+|\n+')
+_CLAUSE_BREAK = re.compile(r'(?<=[,;:])\s+')
+
+
+def segment_text(text, max_chars=400):
+    # Returns a list of (segment, separator) pairs; joining segment + separator
+    # for every pair gives back the original layout (sentences and line breaks).
+    segments = []
+    position = 0
+    for match in _SENTENCE_END.finditer(text):
+        _append(segments, text[position:match.start()] + match.group(0).rstrip(), match.group(0), max_chars)
+        position = match.end()
+    _append(segments, text[position:], '', max_chars)
+    return segments
+
+
+def _append(segments, sentence, whitespace, max_chars):
+    sentence = sentence.strip()
+    if not sentence:
+        # Keep paragraph breaks even when they are not preceded by a sentence
+        if '\n' in whitespace and segments:
+            segments[-1] = (segments[-1][0], '\n')
+        return
+    separator = '\n' if '\n' in whitespace else (' ' if whitespace else '')
+    pieces = _split_long(sentence, max_chars)
+    for piece in pieces[:-1]:
+        segments.append((piece, ' '))
+    segments.append((pieces[-1], separator))
+
+
+def _split_long(sentence, max_chars):
+    if len(sentence) <= max_chars:
+        return [sentence]
+    # Prefer clause boundaries, then fall back to word boundaries
+    pieces = []
+    current = ''
+    for part in _CLAUSE_BREAK.split(sentence):
+        for word in ([part] if len(part) <= max_chars else part.split()):
+            candidate = f'{current} {word}' if current else word
+            if len(candidate) > max_chars and current:
+                pieces.append(current)
+                current = word
+            else:
+                current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_sentences(text, max_chars=400):
+    return [segment for segment, _ in segment_text(text, max_chars)]
+
+
+def join_segments(translations, separators):
+    return ''.join(translation + separator for translation, separator in zip(translations, separators)).strip()
@@ -0,0 +1,240 @@
+# ======= Speech recognition for browser-recorded audio =======
+# The browser records with MediaRecorder and uploads the audio, either as one
+# file or as a stream of chunks.  Each upload is piped through ffmpeg (the
+# binary moviepy already uses) into 16 kHz mono PCM while it arrives, and the
+# PCM is fed to a recognizer:
+#   google - speech_recognition's recognize_google, run on the full PCM at the end
+#   vosk   - offline Kaldi recognizer that decodes incrementally as chunks arrive
+import json
+import os
+import subprocess
+import threading
+import time
+import uuid
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM
+READ_SIZE = 8000  # A quarter of a second of PCM per read
+
+
+class UnrecognizedSpeech(Exception):
+    pass
+
+
+class RecognitionServiceError(Exception):
+    pass
+
+
+class RecordingTooLong(UnrecognizedSpeech):
+    # Over the upload limit; a subclass so callers that only know UnrecognizedSpeech still catch it
+    pass
+
+
+def ffmpeg_binary():
+    # Same ffmpeg moviepy is configured with, so there is nothing extra to install
+    try:
+        from moviepy.config import get_setting
+        return get_setting('FFMPEG_BINARY')
+    except Exception:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+class GoogleRecognizer:
+    streaming = False
+
+    def __init__(self, language):
+        self.language = language
+        self._pcm = bytearray()
+
+    def feed(self, pcm):
+        self._pcm.extend(pcm)
+
+    def partial(self):
+        return ''
+
+    def finish(self):
+        import speech_recognition as sr
+
+        if not self._pcm:
+            raise UnrecognizedSpeech('No audio received')
+        audio = sr.AudioData(bytes(self._pcm), SAMPLE_RATE, SAMPLE_WIDTH)
+        try:
+            return sr.Recognizer().recognize_google(audio, language=self.language)
+        except sr.UnknownValueError as e:
+            raise UnrecognizedSpeech(str(e))
+        except sr.RequestError as e:
+            raise RecognitionServiceError(str(e))
+
+
+_vosk_models = {}
+_vosk_lock = threading.Lock()
+
+
+def load_vosk_model(path):
+    # Vosk models are large; load each one once per process
+    with _vosk_lock:
+        model = _vosk_models.get(path)
+        if model is None:
+            import vosk
+            vosk.SetLogLevel(-1)
+            model = _vosk_models[path] = vosk.Model(path)
+        return model
+
+
+class VoskRecognizer:
+    streaming = True
+
+    def __init__(self, model_path):
+        try:
+            import vosk
+        except ImportError:
+            raise RecognitionServiceError('Offline speech recognition is not installed (pip install vosk)')
+
+        if not os.path.isdir(model_path):
+            raise RecognitionServiceError(f'No offline speech model at {model_path}')
+        self._recognizer = vosk.KaldiRecognizer(load_vosk_model(model_path), SAMPLE_RATE)
+        self._segments = []
+
+    def feed(self, pcm):
+        if self._recognizer.AcceptWaveform(pcm):
+            self._collect(self._recognizer.Result())
+
+    def _collect(self, result):
+        text = json.loads(result).get('text', '')
+        if text:
+            self._segments.append(text)
+
+    def partial(self):
+        pending = json.loads(self._recognizer.PartialResult()).get('partial', '')
+        return ' '.join(self._segments + ([pending] if pending else []))
+
+    def finish(self):
+        self._collect(self._recognizer.FinalResult())
+        text = ' '.join(self._segments).strip()
+        if not text:
+            raise UnrecognizedSpeech('Could not understand audio')
+        return text
+
+
+def make_recognizer(backend, lang, sr_language, vosk_model_dir):
+    if backend == 'vosk':
+        return VoskRecognizer(os.path.join(vosk_model_dir, lang))
+    return GoogleRecognizer(sr_language)
+
+
+class SpeechSession:
+    # One recording: audio goes into ffmpeg's stdin as it is uploaded and a reader
+    # thread hands the decoded PCM to the recognizer straight away.
+    def __init__(self, recognizer, max_bytes=None):
+        self.id = uuid.uuid4().hex
+        self.recognizer = recognizer
+        self.max_bytes = max_bytes
+        self.received_bytes = 0
+        self.last_activity = time.monotonic()
+        self._lock = threading.Lock()
+        self._recognizer_lock = threading.Lock()
+        self._error = None
+        self._process = subprocess.Popen(
+            [ffmpeg_binary(), '-loglevel', 'error', '-i', 'pipe:0',
+             '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        self._reader = threading.Thread(target=self._read_pcm, name=f'speech-{self.id[:8]}', daemon=True)
+        self._reader.start()
+
+    def _read_pcm(self):
+        try:
+            while True:
+                pcm = self._process.stdout.read(READ_SIZE)
+                if not pcm:
+                    break
+                with self._recognizer_lock:
+                    self.recognizer.feed(pcm)
+        except Exception as e:
+            self._error = e
+
+    def write(self, chunk):
+        with self._lock:
+            self.last_activity = time.monotonic()
+            self.received_bytes += len(chunk)
+            if self.max_bytes is not None and self.received_bytes > self.max_bytes:
+                self.abort()
+                raise RecordingTooLong('Recording is too long')
+            try:
+                self._process.stdin.write(chunk)
+                self._process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                raise UnrecognizedSpeech('Could not decode audio')
+
+    def partial(self):
+        with self._recognizer_lock:
+            return self.recognizer.partial()
+
+    def finish(self):
+        with self._lock:
+            try:
+                self._process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+            self._reader.join()
+            stderr = self._process.stderr.read().decode('utf-8', 'replace').strip()
+            self._process.wait()
+        if self._error is not None:
+            raise RecognitionServiceError(str(self._error))
+        if self._process.returncode != 0:
+            raise UnrecognizedSpeech(f'Could not decode audio: {stderr[-200:]}')
+        return self.recognizer.finish()
+
+    def abort(self):
+        try:
+            self._process.kill()
+        except OSError:
+            pass
+
+
+class SpeechSessionStore:
+    def __init__(self, timeout_seconds=120, max_sessions=64):
+        self.timeout_seconds = timeout_seconds
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def add(self, session):
+        with self._lock:
+            self._expire_locked()
+            if len(self._sessions) >= self.max_sessions:
+                session.abort()
+                raise RecognitionServiceError('Too many recordings in progress, please try again shortly')
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def pop(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_activity > self.timeout_seconds:
+                session.abort()
+                del self._sessions[session_id]
+
+
+def recognize_file(stream, recognizer, chunk_size=64 * 1024, max_bytes=None):
+    # Whole-file upload: still decoded while the request body is being read
+    session = SpeechSession(recognizer, max_bytes=max_bytes)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            session.write(chunk)
+        return session.finish()
+    except Exception:
+        session.abort()
+        raise
@@ -0,0 +1,296 @@
+# ======= Static asset pipeline =======
+# `flask build-assets` copies css/, js/, lib/ and img/ into ASSETS_DIR with a
+# content hash in every file name (css/style.3f9c2a1b7d0e.css), so the files
+# can be cached by browsers for a year: a changed file gets a new name.
+#   - images are re-encoded, resized to a few widths and also saved as WebP,
+#     for <picture> / srcset in the templates
+#   - CSS, JS, SVG and fonts that compress get .gz (and .br when the brotli
+#     package is installed) copies next to them, sent to browsers that accept
+#     them without compressing anything per request
+#   - url(...) references inside CSS are rewritten to the hashed names
+# manifest.json maps every original name to its hashed file and variants.
+#
+# Without a build, or for files the build does not know (saved audio), the
+# /static view falls back to the originals with revalidation instead of
+# long-lived caching, so nothing breaks before the first build.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from collections import namedtuple
+
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+
+DEFAULT_SOURCE_DIRS = ('css', 'js', 'lib', 'img')
+DEFAULT_WIDTHS = (320, 640, 1024, 1600)
+IMAGE_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.jfif': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.map', '.txt', '.ttf', '.eot', '.otf', '.ico'}
+SKIPPED_NAMES = {'Thumbs.db', '.DS_Store'}
+SKIPPED_EXTENSIONS = {'.php', '.scss', '.html', '.md', '.pdf'}
+IMMUTABLE_MAX_AGE = 365 * 86400
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/woff', '.woff')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/jpeg', '.jfif')
+
+ResolvedAsset = namedtuple('ResolvedAsset', ['path', 'mimetype', 'encoding', 'etag', 'max_age', 'immutable', 'vary'])
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _hashed_name(name, digest, extension=None):
+    base, original_extension = posixpath.splitext(name)
+    return f'{base}.{digest}{extension or original_extension}'
+
+
+def _mimetype(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+# ======= Build =======
+class AssetBuilder:
+    def __init__(self, source_root, output_dir, source_dirs=DEFAULT_SOURCE_DIRS, widths=DEFAULT_WIDTHS,
+                 jpeg_quality=82, webp_quality=80, compress_min_bytes=512):
+        self.source_root = source_root
+        self.output_dir = output_dir
+        self.source_dirs = source_dirs
+        self.widths = sorted(widths)
+        self.jpeg_quality = jpeg_quality
+        self.webp_quality = webp_quality
+        self.compress_min_bytes = compress_min_bytes
+        self.assets = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        try:
+            import brotli
+            self.brotli = brotli
+        except ImportError:
+            self.brotli = None
+
+    def sources(self):
+        # Original names as the templates use them under /static: "img/about-1.jpg"
+        names = []
+        for directory in self.source_dirs:
+            top = os.path.join(self.source_root, directory)
+            for root, dirs, files in os.walk(top):
+                dirs.sort()
+                for filename in sorted(files):
+                    if filename in SKIPPED_NAMES or os.path.splitext(filename)[1].lower() in SKIPPED_EXTENSIONS:
+                        continue
+                    names.append(os.path.relpath(os.path.join(root, filename), self.source_root).replace(os.sep, '/'))
+        return names
+
+    def build(self):
+        names = self.sources()
+        # CSS last, so url(...) references to fonts and images can point at their hashed names
+        for name in sorted(names, key=lambda n: n.lower().endswith('.css')):
+            with open(os.path.join(self.source_root, *name.split('/')), 'rb') as f:
+                data = f.read()
+            self.bytes_in += len(data)
+            extension = posixpath.splitext(name)[1].lower()
+            if extension in IMAGE_FORMATS:
+                self.assets[name] = self._image(name, data, extension)
+            else:
+                if extension == '.css':
+                    data = self._rewrite_css(name, data)
+                self.assets[name] = self._file(name, data)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest_path = os.path.join(self.output_dir, 'manifest.json')
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'assets': self.assets}, f, indent=1, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)  # Running servers never read half a manifest
+        return self.assets
+
+    def _write(self, name, data):
+        path = os.path.join(self.output_dir, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.bytes_out += len(data)
+
+    def _file(self, name, data):
+        digest = _digest(data)
+        hashed = _hashed_name(name, digest)
+        self._write(hashed, data)
+        entry = {'file': hashed, 'etag': digest, 'type': _mimetype(name), 'encodings': []}
+        extension = posixpath.splitext(name)[1].lower()
+        if extension in COMPRESSIBLE_EXTENSIONS and len(data) >= self.compress_min_bytes:
+            # Kept only when they save at least a tenth; woff/woff2 are compressed already
+            compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if self.brotli is not None:
+                compressed['br'] = self.brotli.compress(data, quality=11)
+            for encoding in ('br', 'gzip'):
+                if encoding in compressed and len(compressed[encoding]) < 0.9 * len(data):
+                    self._write(hashed + ('.br' if encoding == 'br' else '.gz'), compressed[encoding])
+                    entry['encodings'].append(encoding)
+        return entry
+
+    def _encode(self, image, image_format):
+        import io
+
+        buffer = io.BytesIO()
+        if image_format == 'JPEG':
+            image.convert('RGB').save(buffer, 'JPEG', quality=self.jpeg_quality, optimize=True, progressive=True)
+        elif image_format == 'PNG':
+            image.save(buffer, 'PNG', optimize=True)
+        else:
+            image.save(buffer, 'WEBP', quality=self.webp_quality, method=6)
+        return buffer.getvalue()
+
+    def _image(self, name, data, extension):
+        import io
+        from PIL import Image, ImageOps
+
+        image_format = IMAGE_FORMATS[extension]
+        output_extension = '.jpg' if extension == '.jfif' else extension
+        with Image.open(io.BytesIO(data)) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        # Nothing wider than the largest width is served; the 4000px camera originals were most of the bytes
+        width, height = image.size
+        base_width = min(width, self.widths[-1])
+        widths = [w for w in self.widths if w < base_width] + [base_width]
+
+        def resized(w):
+            return image if w == width else image.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+
+        base = self._encode(resized(base_width), image_format)
+        if base_width == width and len(base) >= len(data) and extension == output_extension:
+            base = data  # Re-encoding did not help
+        digest = _digest(base)
+        hashed = _hashed_name(name, digest, output_extension)
+        self._write(hashed, base)
+        entry = {'file': hashed, 'etag': digest, 'type': _mimetype(hashed), 'encodings': [],
+                 'width': base_width, 'height': round(height * base_width / width), 'variants': []}
+
+        for w in widths:
+            if w != base_width:
+                variant = self._encode(resized(w), image_format)
+                variant_digest = _digest(variant)
+                variant_name = _hashed_name(name, variant_digest, f'.{w}w{output_extension}')
+                self._write(variant_name, variant)
+                entry['variants'].append({'file': variant_name, 'width': w, 'type': entry['type'],
+                                          'etag': variant_digest})
+        if image_format != 'WEBP':
+            webp = [(w, self._encode(resized(w), 'WEBP')) for w in widths]
+            if len(webp[-1][1]) < len(base):  # Only offered when it is actually smaller
+                for w, variant in webp:
+                    variant_digest = _digest(variant)
+                    variant_name = _hashed_name(name, variant_digest, f'.{w}w.webp')
+                    self._write(variant_name, variant)
+                    entry['variants'].append({'file': variant_name, 'width': w, 'type': 'image/webp',
+                                              'etag': variant_digest})
+        return entry
+
+    def _rewrite_css(self, name, data):
+        css_dir = posixpath.dirname(name)
+
+        def replace(match):
+            quote, url = match.group(1), match.group(2).strip()
+            if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+                return match.group(0)
+            path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+            target = self.assets.get(posixpath.normpath(posixpath.join(css_dir, path)))
+            if target is None:
+                return match.group(0)
+            return f'url({quote}{posixpath.relpath(target["file"], css_dir)}{suffix}{quote})'
+
+        return CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+
+# ======= Serving and template helpers =======
+class StaticAssets:
+    def __init__(self, output_dir, source_root, source_dirs=DEFAULT_SOURCE_DIRS, url_prefix='/static'):
+        self.output_dir = output_dir
+        self.source_root = source_root
+        self.source_dirs = source_dirs
+        self.url_prefix = url_prefix
+        self.assets = {}
+        self._by_file = {}
+        self.reload()
+
+    def reload(self):
+        # Read at startup and after every build in this process; other processes need a restart
+        try:
+            with open(os.path.join(self.output_dir, 'manifest.json'), encoding='utf-8') as f:
+                assets = json.load(f)['assets']
+        except (OSError, ValueError, KeyError):
+            assets = {}
+        by_file = {}
+        for entry in assets.values():
+            by_file[entry['file']] = entry
+            for variant in entry.get('variants', ()):
+                by_file[variant['file']] = dict(variant, encodings=[])
+        self.assets, self._by_file = assets, by_file
+
+    def url(self, name):
+        entry = self.assets.get(name)
+        return f"{self.url_prefix}/{entry['file'] if entry else name}"
+
+    def srcset(self, name, mimetype=None):
+        # "…/about-1.320w.<hash>.jpg 320w, …" of one type (the original's by default); '' without a build
+        entry = self.assets.get(name)
+        if not entry or 'width' not in entry:
+            return ''
+        mimetype = mimetype or entry['type']
+        candidates = [(v['width'], v['file']) for v in entry['variants'] if v['type'] == mimetype]
+        if mimetype == entry['type']:
+            candidates.append((entry['width'], entry['file']))
+        return ', '.join(f'{self.url_prefix}/{file} {width}w' for width, file in sorted(candidates))
+
+    def picture(self, name, alt='', sizes='100vw', **attributes):
+        # <picture> with a WebP source and the original format as fallback; a plain <img> without a build
+        attributes = {key.rstrip('_').replace('_', '-'): value for key, value in attributes.items()}  # class_=
+        entry = self.assets.get(name) or {}
+        img = {'src': self.url(name), 'alt': alt}
+        if entry.get('width'):
+            img.update(width=entry['width'], height=entry['height'])
+            if any(variant['type'] == entry['type'] for variant in entry['variants']):
+                img.update(srcset=self.srcset(name), sizes=sizes)
+        img.update(attributes)
+        img_tag = '<img ' + ' '.join(f'{key}="{escape(value)}"' for key, value in img.items()) + '>'
+        webp = self.srcset(name, 'image/webp') if entry.get('type') != 'image/webp' else ''
+        if not webp:
+            return Markup(img_tag)
+        return Markup(f'<picture><source type="image/webp" srcset="{escape(webp)}" sizes="{escape(sizes)}">'
+                      f'{img_tag}</picture>')
+
+    def resolve(self, filename, accept_encoding=''):
+        # What /static/<filename> should send, or None to leave it to Flask's own static folder
+        entry = self._by_file.get(filename)
+        if entry is not None:
+            path = safe_join(self.output_dir, filename)
+            accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+            for encoding in entry['encodings']:
+                if encoding in accepted:
+                    suffix = '.br' if encoding == 'br' else '.gz'
+                    return ResolvedAsset(path + suffix, entry['type'], encoding, f"{entry['etag']}-{encoding}",
+                                         IMMUTABLE_MAX_AGE, True, True)
+            return ResolvedAsset(path, entry['type'], None, entry['etag'], IMMUTABLE_MAX_AGE, True,
+                                 bool(entry['encodings']))
+
+        # An original name: the built copy if there is one, else the source file; revalidated every time
+        top, _, rest = filename.partition('/')
+        if top not in self.source_dirs:
+            return None
+        entry = self.assets.get(filename)
+        if entry is not None:
+            return ResolvedAsset(safe_join(self.output_dir, entry['file']), entry['type'], None, entry['etag'], 0,
+                                 False, False)
+        path = safe_join(os.path.join(self.source_root, top), rest)  # Never outside css/, js/, lib/ or img/
+        if path is None or not os.path.isfile(path):
+            return None
+        return ResolvedAsset(path, _mimetype(filename), None, None, 0, False, False)
@@ -0,0 +1,77 @@
+# ======= Test setup =======
+# The app's modules live at the top of the repository and the stub servers in
+# benchmarks/, so both go on the path the same way the benchmarks do it.
+# model_dir is a MODEL_DIR holding a tiny MarianMT model made here: a 40-piece
+# sentencepiece vocabulary and one 16-wide layer each way.  app_module is the
+# Flask app, imported with throwaway storage and no online backends.
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# Models are made by the tests themselves; nothing should be fetched from the hub
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+TINY_MODEL_NAME = 'Helsinki-NLP/opus-mt-en-xx'
+TARGET_TOKENS = ['>>tam<<', '>>hin<<']
+
+
+def make_tiny_marian(path):
+    import sentencepiece
+    from transformers import MarianConfig, MarianMTModel, MarianTokenizer
+
+    os.makedirs(path)
+    corpus = os.path.join(path, 'corpus.txt')
+    with open(corpus, 'w', encoding='utf-8') as f:
+        for i in range(200):
+            f.write(f'hello world number {i} how are you\n')
+    prefix = os.path.join(path, 'spm')
+    # Target tokens are single pieces, as in the multilingual opus-mt models
+    sentencepiece.SentencePieceTrainer.train(input=corpus, model_prefix=prefix, vocab_size=40,
+                                             user_defined_symbols=TARGET_TOKENS)
+    processor = sentencepiece.SentencePieceProcessor(model_file=prefix + '.model')
+
+    vocab = {'</s>': 0, '<unk>': 1, '<pad>': 2}
+    for i in range(processor.get_piece_size()):
+        vocab.setdefault(processor.id_to_piece(i), len(vocab))
+    with open(os.path.join(path, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f)
+
+    tokenizer = MarianTokenizer(prefix + '.model', prefix + '.model', os.path.join(path, 'vocab.json'))
+    config = MarianConfig(
+        vocab_size=len(vocab), d_model=16, encoder_layers=1, decoder_layers=1, encoder_attention_heads=2,
+        decoder_attention_heads=2, encoder_ffn_dim=32, decoder_ffn_dim=32, max_position_embeddings=64,
+        pad_token_id=2, eos_token_id=0, decoder_start_token_id=2, forced_eos_token_id=0)
+    MarianMTModel(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    for filename in ('corpus.txt', 'spm.model', 'spm.vocab'):
+        os.remove(os.path.join(path, filename))
+
+
+@pytest.fixture(scope='session')
+def model_dir(tmp_path_factory):
+    # Holds TINY_MODEL_NAME as Helsinki-NLP--opus-mt-en-xx, like a flask download-models copy
+    pytest.importorskip('torch')
+    pytest.importorskip('sentencepiece')
+    directory = tmp_path_factory.mktemp('marian')
+    make_tiny_marian(os.path.join(directory, TINY_MODEL_NAME.replace('/', '--')))
+    return str(directory)
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    # app reads its settings when it is imported, so they are set before the first import
+    directory = tmp_path_factory.mktemp('app')
+    for name, value in {'DATABASE_URL': f"sqlite:///{directory / 'app.db'}", 'TRANSLATION_CACHE_DB': '',
+                        'TRANSLATION_MEMORY_DB': '', 'TRANSLATION_BACKENDS': '', 'PRELOAD_MODEL_PAIRS': '',
+                        'ASSETS_DIR': str(directory / 'assets')}.items():
+        os.environ.setdefault(name, value)
+    pytest.importorskip('flask_sqlalchemy')
+    return importlib.import_module('app')
@@ -0,0 +1,40 @@
+# The audio janitor must leave files that are still being written alone.
+import os
+import time
+
+from audio_janitor import AudioJanitor
+
+
+def write(path, size, age=0):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+
+
+def test_scan_skips_tts_temp_and_hidden_files(tmp_path):
+    write(tmp_path / 'old.mp3', 100, age=3600)
+    write(tmp_path / '.tts_abc.mp3.0123456789abcdef.tmp', 100, age=3600)
+    write(tmp_path / '.index.json', 100, age=3600)
+    janitor = AudioJanitor(str(tmp_path), max_age_seconds=60)
+
+    assert janitor.run_once() == {'files': 1, 'bytes': 100}
+    assert sorted(os.listdir(tmp_path)) == ['.index.json', '.tts_abc.mp3.0123456789abcdef.tmp']
+
+
+def test_size_limit_never_evicts_a_file_being_written(tmp_path):
+    write(tmp_path / 'a.mp3', 100, age=20)
+    temp = tmp_path / '.tts_b.mp3.0123.tmp'
+    write(temp, 100, age=30)  # Older than a.mp3, so it would go first if it were counted
+    janitor = AudioJanitor(str(tmp_path), max_age_seconds=None, max_bytes=150)
+    janitor.register(str(temp))  # Ignored, so no cleanup thread is started either
+
+    assert janitor.run_once()['files'] == 0
+    assert janitor.stats()['bytes'] == 100
+    assert temp.exists()
+
+    # Renamed into place it counts, and the folder is over the limit
+    os.replace(temp, tmp_path / 'b.mp3')
+    assert AudioJanitor(str(tmp_path), max_age_seconds=None, max_bytes=150).run_once()['files'] == 1
+    assert os.listdir(tmp_path) == ['a.mp3']
@@ -0,0 +1,29 @@
+# evaluation.py on the tiny MarianMT model: stdout carries only the JSON
+# report, so it can be piped into jq; progress goes to stderr.
+import json
+
+import evaluation
+from conftest import TINY_MODEL_NAME
+
+
+def test_stdout_is_only_the_report(model_dir, tmp_path, capsys):
+    corpus = tmp_path / 'corpus.tsv'
+    corpus.write_text('hello world\tnamaste duniya\nhow are you\taap kaise hain\n', encoding='utf-8')
+    output = tmp_path / 'report.json'
+    argv = [str(corpus), '--model', TINY_MODEL_NAME, '--model-dir', model_dir, '--backend', 'torch',
+            '--source-lang', 'en', '--target-lang', 'hi', '--workers', '1', '--num-beams', '1',
+            '--max-new-tokens', '8', '--cache-db', str(tmp_path / 'cache.db'), '--output', str(output)]
+
+    evaluation.main(argv)
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert len(lines) == 1
+    report = json.loads(lines[0])
+    assert report['sentences'] == 2 and report['decoded'] == 2
+    assert 'Evaluating' in captured.err and f'Wrote {output}' in captured.err
+    assert json.loads(output.read_text(encoding='utf-8'))['sentences'] == 2
+
+    # Second run comes from the hypothesis cache
+    evaluation.main(argv)
+    report = json.loads(capsys.readouterr().out)
+    assert report['cached'] == 2 and report['decoded'] == 0
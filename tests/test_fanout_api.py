@@ -0,0 +1,25 @@
+# Request validation of POST /api/translate/fanout: bad input is a 400, never a 500.
+import pytest
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('payload', [
+    {'text': 'hello', 'targets': [{'a': 1}]},
+    {'text': 'hello', 'targets': ['hi', ['ta']]},
+    {'text': 'hello', 'targets': 'hi'},
+    {'text': 'hello', 'source_lang': {'a': 1}},
+    {'text': ['hello'], 'targets': ['hi']},
+    {'text': '  ', 'targets': ['hi']},
+    {'text': 'hello', 'targets': ['xx']},
+    {'text': 'hello', 'targets': ['hi'], 'deadline_ms': 'soon'},
+    {'text': 'hello', 'targets': ['hi'], 'deadline_ms': -5},
+    {'text': 'hello', 'targets': ['hi'], 'deadline_ms': 'nan'},
+])
+def test_bad_requests_are_rejected(client, payload):
+    response = client.post('/api/translate/fanout', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['error']
@@ -0,0 +1,73 @@
+# Inference backends and convert_model.py against the tiny MarianMT model
+# from conftest.py, saved where MODEL_DIR copies go.
+import json
+
+import pytest
+
+import convert_model
+from conftest import TINY_MODEL_NAME as MODEL_NAME
+from inference_backends import make_loader
+
+SENTENCES = ['hello world', 'how are you', 'hello world number 7']
+
+
+def test_torch_loads_the_local_copy(model_dir):
+    entry = make_loader('torch', num_beams=1, max_new_tokens=8, model_dir=model_dir)(MODEL_NAME)
+    assert entry.generate_kwargs == {'num_beams': 1, 'max_new_tokens': 8}
+    assert entry.size_bytes > 0
+
+    translations = entry.translate_batch(SENTENCES)
+    assert len(translations) == len(SENTENCES)
+    assert all(isinstance(text, str) for text in translations)
+    assert entry.token_lengths(['hello', 'hello world number 7'])[0] < entry.token_lengths(['hello world number 7'])[0]
+
+
+def test_torch_int8_quantizes_the_linear_layers(model_dir):
+    import torch
+
+    reference = make_loader('torch', model_dir=model_dir)(MODEL_NAME)
+    entry = make_loader('torch-int8', num_beams=1, max_new_tokens=8, model_dir=model_dir)(MODEL_NAME)
+    linear = [module for module in entry.model.modules() if isinstance(module, torch.nn.Linear)]
+    quantized = [module for module in entry.model.modules() if type(module).__name__ == 'Linear' and
+                 'quantized' in type(module).__module__]
+    assert quantized and not linear
+    assert entry.size_bytes > 0 and entry.size_bytes != reference.size_bytes
+    assert len(entry.translate_batch(SENTENCES)) == len(SENTENCES)
+
+
+@pytest.mark.parametrize('backend', ['onnx', 'ctranslate2'])
+def test_unconverted_model_falls_back_to_torch(model_dir, tmp_path, capsys, backend):
+    from transformers import MarianMTModel
+
+    entry = make_loader(backend, num_beams=1, max_new_tokens=8, converted_dir=str(tmp_path), model_dir=model_dir)(
+        MODEL_NAME)
+    assert isinstance(entry.model, MarianMTModel)
+    assert 'run convert_model.py' in capsys.readouterr().out
+    assert len(entry.translate_batch(SENTENCES)) == len(SENTENCES)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match='Unknown inference backend'):
+        make_loader('tensorrt')
+
+
+def test_parity_check_uses_the_local_model(model_dir, tmp_path):
+    report, mismatches = convert_model.parity_check(MODEL_NAME, 'torch-int8', SENTENCES, threads=1, num_beams=1,
+                                                    converted_dir=str(tmp_path), batch_size=2, model_dir=model_dir)
+    assert report['model'] == MODEL_NAME
+    assert report['sentences'] == len(SENTENCES)
+    assert 0.0 <= report['char_similarity'] <= 1.0
+    assert len(mismatches) == round(len(SENTENCES) * (1 - report['exact_match']))
+
+
+def test_check_from_the_command_line(model_dir, tmp_path, capsys):
+    sentences = tmp_path / 'sentences.txt'
+    sentences.write_text('\n'.join(SENTENCES) + '\n', encoding='utf-8')
+    status = convert_model.main(['--model', MODEL_NAME, '--model-dir', model_dir, '--backend', 'torch-int8',
+                                 '--output-dir', str(tmp_path / 'converted'), '--check', '--num-beams', '1',
+                                 '--sentences', str(sentences), '--min-similarity', '0'])
+    assert status == 0
+    output = capsys.readouterr().out
+    report = json.loads(output[:output.index('}') + 1])
+    assert report['sentences'] == len(SENTENCES)
+    assert not (tmp_path / 'converted').exists()  # torch-int8 is quantized at load time; nothing is written
@@ -0,0 +1,94 @@
+# Spans from work done on other threads (batched generate(), backend calls)
+# have to reach the trace of the request they were done for.
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import metrics
+from batching import BatchScheduler
+from model_routing import Hop
+from stub_translation_server import start_stub_server
+from translation_backends import BackendChain, HTTPBackend
+
+
+class FakeEntry:
+    def token_lengths(self, texts):
+        return [len(text.split()) for text in texts]
+
+    def translate_batch(self, texts):
+        return [text.upper() for text in texts]
+
+
+class FakeRegistry:
+    @contextmanager
+    def borrow(self, model_name):
+        yield FakeEntry()
+
+
+class FakeRouter:
+    def __init__(self, hops):
+        self.hops = hops
+
+    def route(self, source_lang, target_lang):
+        return self.hops
+
+
+@pytest.fixture
+def trace():
+    token = metrics.start_trace()
+    yield metrics.trace_handle()
+    metrics.end_trace(token)
+
+
+@pytest.fixture
+def stub_server():
+    server = start_stub_server(delay_ms=5)
+    yield server
+    server.shutdown()
+
+
+def test_record_outside_a_request_only_counts():
+    assert metrics.trace_handle() is None
+    metrics.record('lookup', 0.01, backend='sqlite')  # No trace to add to, must not fail
+
+
+def test_batched_generate_reaches_the_request_trace(trace):
+    scheduler = BatchScheduler(FakeRegistry(), FakeRouter([Hop('model-a', None)]), max_wait_ms=50)
+    assert scheduler.translate_many('en', 'hi', ['one', 'two words', 'three more words']) == [
+        'ONE', 'TWO WORDS', 'THREE MORE WORDS']
+
+    generate = [item for item in trace if item['stage'] == 'generate']
+    assert generate and all(item['backend'] == 'model-a' for item in generate)
+    # Segments batched together are one generate() call, so one span
+    assert len(generate) == scheduler.batches
+
+
+def test_pivot_hops_keep_the_trace(trace):
+    scheduler = BatchScheduler(FakeRegistry(), FakeRouter([Hop('model-a', None), Hop('model-b', '>>ta<<')]))
+    assert scheduler.submit('hi', 'ta', 'text').result(timeout=5) == '>>TA<< TEXT'
+    assert [item['backend'] for item in trace if item['stage'] == 'generate'] == ['model-a', 'model-b']
+
+
+def test_batch_spans_go_to_each_request(trace):
+    scheduler = BatchScheduler(FakeRegistry(), FakeRouter([Hop('model-a', None)]), max_wait_ms=200)
+    other = {}
+
+    def other_request():
+        token = metrics.start_trace()
+        scheduler.submit('en', 'hi', 'from another request').result(timeout=5)
+        other['trace'] = metrics.end_trace(token)
+
+    thread = threading.Thread(target=other_request)
+    thread.start()
+    assert scheduler.submit('en', 'hi', 'mine').result(timeout=5) == 'MINE'
+    thread.join()
+
+    assert [item['stage'] for item in trace] == ['generate']
+    assert [item['stage'] for item in other['trace']] == ['generate']
+
+
+def test_remote_call_reaches_the_request_trace(trace, stub_server):
+    chain = BackendChain([HTTPBackend(stub_server.url)])
+    assert chain.translate('hello', 'en', 'hi') == '[hi] hello'
+    assert [(item['stage'], item['backend'], item['pair']) for item in trace] == [('remote_call', 'http', 'en-hi')]
@@ -0,0 +1,137 @@
+# Which local model(s) translate a pair: direct, multilingual with a >>xxx<<
+# target token, and two hops through English.  The translation tests run the
+# tiny model from conftest.py through the registry and the batch scheduler.
+import json
+import os
+
+import pytest
+
+from batching import BatchScheduler
+from conftest import TINY_MODEL_NAME
+from inference_backends import make_loader
+from model_registry import ModelRegistry
+from model_routing import Hop, ModelRouter, load_routes, local_model_path
+
+MISSING_MODEL = 'Helsinki-NLP/opus-mt-en-zz'
+
+
+def test_direct_pair():
+    assert ModelRouter().route('en', 'hi') == [Hop('Helsinki-NLP/opus-mt-en-hi', None)]
+    assert ModelRouter().route('mr', 'en') == [Hop('Helsinki-NLP/opus-mt-mr-en', None)]
+
+
+def test_multilingual_pairs():
+    router = ModelRouter()
+    assert router.route('en', 'ta') == [Hop('Helsinki-NLP/opus-mt-en-dra', '>>tam<<')]
+    assert router.route('en', 'bn') == [Hop('Helsinki-NLP/opus-mt-en-inc', '>>ben<<')]
+    # Many-to-one models need no token
+    assert router.route('te', 'en') == [Hop('Helsinki-NLP/opus-mt-dra-en', None)]
+
+
+def test_pivot_through_english():
+    router = ModelRouter()
+    # A direct model is preferred over a multilingual one on either leg
+    assert router.route('ta', 'hi') == [Hop('Helsinki-NLP/opus-mt-dra-en', None),
+                                        Hop('Helsinki-NLP/opus-mt-en-hi', None)]
+    assert router.route('ml', 'kn') == [Hop('Helsinki-NLP/opus-mt-ml-en', None),
+                                        Hop('Helsinki-NLP/opus-mt-en-dra', '>>kan<<')]
+
+
+def test_unroutable_pairs():
+    router = ModelRouter()
+    assert router.route('en', 'en') is None
+    assert router.route('en', 'fr') is None
+    assert router.route('fr', 'hi') is None  # No fr-en leg to pivot through
+
+
+def test_routes_file_overrides_and_pivots(tmp_path):
+    routes_file = tmp_path / 'routes.json'
+    routes_file.write_text(json.dumps({
+        'en-hi': '/models/tiny-en-hi',
+        'en-ta': {'model': '/models/opus-mt-en-dra', 'token': '>>tam<<'},
+        'kn-bn': [{'model': '/models/kn-en'}, {'model': '/models/en-inc', 'token': '>>ben<<'}],
+    }), encoding='utf-8')
+    router = ModelRouter(load_routes(str(routes_file)))
+
+    assert router.route('en', 'hi') == [Hop('/models/tiny-en-hi', None)]
+    assert router.route('kn', 'bn') == [Hop('/models/kn-en', None), Hop('/models/en-inc', '>>ben<<')]
+    # An overridden leg is used when pivoting too
+    assert router.route('mr', 'ta') == [Hop('Helsinki-NLP/opus-mt-mr-en', None),
+                                        Hop('/models/opus-mt-en-dra', '>>tam<<')]
+    assert router.models_for([('en', 'ta'), ('mr', 'ta')]) == ['/models/opus-mt-en-dra', 'Helsinki-NLP/opus-mt-mr-en']
+    assert router.table(['en', 'hi'])['en-hi'] == [{'model': '/models/tiny-en-hi', 'token': None}]
+
+
+def test_local_model_path(model_dir, tmp_path):
+    local = os.path.join(model_dir, TINY_MODEL_NAME.replace('/', '--'))
+    assert local_model_path(model_dir, TINY_MODEL_NAME) == local
+    assert local_model_path(model_dir, MISSING_MODEL) == MISSING_MODEL  # Left for the hub
+    assert local_model_path(None, TINY_MODEL_NAME) == TINY_MODEL_NAME
+    assert local_model_path(model_dir, local) == local
+
+    # Copies saved under the bare model name are found too
+    (tmp_path / 'opus-mt-en-yy').mkdir()
+    assert local_model_path(str(tmp_path), 'Helsinki-NLP/opus-mt-en-yy') == str(tmp_path / 'opus-mt-en-yy')
+
+
+@pytest.fixture(scope='module')
+def local_models(model_dir):
+    # The tiny model plays every hop: xx -> en, en -> ta (>>tam<<) and en -> hi (>>hin<<)
+    router = ModelRouter({
+        ('xx', 'en'): [Hop(TINY_MODEL_NAME, None)],
+        ('en', 'ta'): [Hop(TINY_MODEL_NAME, '>>tam<<')],
+        ('en', 'hi'): [Hop(TINY_MODEL_NAME, '>>hin<<')],
+        ('en', 'zz'): [Hop(MISSING_MODEL, None)],
+    })
+    registry = ModelRegistry(make_loader('torch', num_beams=1, max_new_tokens=8, model_dir=model_dir))
+    scheduler = BatchScheduler(registry, router, max_wait_ms=1)
+    with registry.borrow(TINY_MODEL_NAME) as entry:
+        return router, registry, scheduler, entry
+
+
+def test_token_route_prefixes_the_target_token(local_models):
+    router, registry, scheduler, entry = local_models
+    assert scheduler.submit('en', 'ta', 'hello world').result(timeout=60) == \
+        entry.translate_batch(['>>tam<< hello world'])[0]
+
+
+def test_pivot_translation_feeds_the_first_hop_into_the_second(local_models):
+    router, registry, scheduler, entry = local_models
+    assert router.route('xx', 'hi') == [Hop(TINY_MODEL_NAME, None), Hop(TINY_MODEL_NAME, '>>hin<<')]
+
+    english = entry.translate_batch(['how are you'])[0]
+    expected = entry.translate_batch(['>>hin<< ' + english])[0]
+    assert scheduler.submit('xx', 'hi', 'how are you').result(timeout=60) == expected
+
+
+def test_missing_model_fails_so_callers_fall_back(local_models):
+    router, registry, scheduler, entry = local_models
+    with pytest.raises(LookupError, match='not available'):
+        scheduler.submit('en', 'zz', 'hello').result(timeout=60)
+    assert not registry.is_available(MISSING_MODEL)
+    with pytest.raises(LookupError, match='No local model'):
+        scheduler.submit('en', 'fr', 'hello').result(timeout=60)
+
+
+class FakeRemote:
+    def translate(self, text, source_lang, target_lang):
+        return f'[{target_lang}] {text}'
+
+
+def test_translator_uses_local_models_and_falls_back_to_remote(app_module, local_models):
+    router, registry, scheduler, entry = local_models
+    translation_cache = app_module.TranslationCache()
+
+    def translator(target_lang):
+        return app_module.ContextAwareTranslator('en', target_lang, registry=registry, cache=translation_cache,
+                                                 batcher=scheduler, remote=FakeRemote(), router=router)
+
+    local = translator('ta')
+    assert local._backend() == 'marian'
+    assert local.translate('hello world') == entry.translate_batch(['>>tam<< hello world'])[0]
+
+    scheduler.submit('en', 'zz', 'hello').exception(timeout=60)  # Marks the model as failed
+    missing = translator('zz')
+    assert missing._backend() == 'remote'
+    assert missing.translate('hello') == '[zz] hello'
+    assert translator('fr').translate('hello') == '[fr] hello'
@@ -0,0 +1,125 @@
+# The backend chain against local LibreTranslate stubs: circuit breaker
+# transitions, falling back on a timeout, and hedged requests.
+import time
+
+import pytest
+
+from stub_translation_server import start_stub_server
+from translation_backends import BackendChain, HTTPBackend, TranslationBackendError, build_chain
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(**options):
+        server = start_stub_server(**dict({'delay_ms': 5, 'seed': 0}, **options))
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+class NamedHTTPBackend(HTTPBackend):
+    # Two stub servers in one chain need different names for their stats
+    def __init__(self, name, url, timeout=10.0):
+        super().__init__(url, timeout=timeout)
+        self.name = name
+
+
+def test_breaker_opens_skips_and_closes_after_a_good_trial(servers):
+    server = servers(error_rate=1.0)
+    chain = BackendChain([HTTPBackend(server.url)], failure_threshold=2, reset_timeout=0.2)
+
+    for _ in range(2):
+        with pytest.raises(TranslationBackendError, match='returned 500'):
+            chain.translate('hello', 'en', 'hi')
+    assert chain.stats()['backends']['http']['state'] == 'open'
+
+    # Open: skipped without a request reaching the server
+    requests = server.requests
+    with pytest.raises(TranslationBackendError, match='circuit open'):
+        chain.translate('hello', 'en', 'hi')
+    assert server.requests == requests
+    assert chain.stats()['backends']['http']['skipped'] == 1
+
+    time.sleep(0.25)
+    assert chain.stats()['backends']['http']['state'] == 'half-open'
+    server.error_rate = 0.0
+    assert chain.translate('hello', 'en', 'hi') == '[hi] hello'
+    assert chain.stats()['backends']['http']['state'] == 'closed'
+
+
+def test_failed_half_open_trial_opens_the_breaker_again(servers):
+    server = servers(error_rate=1.0)
+    chain = BackendChain([HTTPBackend(server.url)], failure_threshold=1, reset_timeout=0.2)
+
+    with pytest.raises(TranslationBackendError):
+        chain.translate('hello', 'en', 'hi')
+    time.sleep(0.25)
+    with pytest.raises(TranslationBackendError, match='returned 500'):
+        chain.translate('hello', 'en', 'hi')  # The trial call
+    assert chain.stats()['backends']['http']['state'] == 'open'
+
+
+def test_timeout_falls_back_to_the_next_backend(servers):
+    slow = servers(delay_ms=1000)
+    fast = servers()
+    chain = BackendChain([NamedHTTPBackend('slow', slow.url), NamedHTTPBackend('fast', fast.url)],
+                         timeouts={'slow': 0.1})
+
+    started = time.monotonic()
+    assert chain.translate('hello', 'en', 'hi') == '[hi] hello'
+    assert time.monotonic() - started < 0.8  # Did not wait for the slow server
+
+    stats = chain.stats()['backends']
+    assert stats['slow']['timeouts'] == 1
+    assert stats['slow']['failures'] == 1
+    assert stats['fast']['successes'] == 1
+
+
+def test_hedge_wins_against_a_slow_backend(servers):
+    slow = servers(delay_ms=600)
+    fast = servers()
+    chain = BackendChain([NamedHTTPBackend('slow', slow.url), NamedHTTPBackend('fast', fast.url)],
+                         hedge_after=0.05)
+
+    started = time.monotonic()
+    assert chain.translate('hello', 'en', 'hi') == '[hi] hello'
+    assert time.monotonic() - started < 0.5
+
+    stats = chain.stats()
+    assert stats['hedges'] == 1
+    assert stats['hedge_wins'] == 1
+    assert stats['backends']['slow']['timeouts'] == 0  # Still running, not abandoned
+
+    # The losing call finishes later and settles its breaker as a success
+    time.sleep(0.8)
+    assert chain.stats()['backends']['slow']['state'] == 'closed'
+    assert chain._states[0].breaker.failures == 0
+
+
+def test_no_hedge_when_the_first_backend_is_fast(servers):
+    chain = BackendChain([NamedHTTPBackend('one', servers().url), NamedHTTPBackend('two', servers().url)],
+                         hedge_after=0.5)
+    assert chain.translate('hello', 'en', 'hi') == '[hi] hello'
+    assert chain.stats()['hedges'] == 0
+    assert chain.stats()['backends']['two']['calls'] == 0
+
+
+def test_every_backend_failing_raises(servers):
+    chain = BackendChain([NamedHTTPBackend('one', servers(error_rate=1.0).url),
+                          NamedHTTPBackend('two', servers(error_rate=1.0).url)])
+    with pytest.raises(TranslationBackendError, match='one: .*; two: '):
+        chain.translate('hello', 'en', 'hi')
+    assert chain.stats()['exhausted'] == 1
+
+
+def test_build_chain_skips_http_without_a_url():
+    chain = build_chain('http', timeouts='http:2', http_url=None)
+    assert chain.names == []
+    with pytest.raises(TranslationBackendError, match='No translation backends configured'):
+        chain.translate('hello', 'en', 'hi')
@@ -0,0 +1,84 @@
+# The gunicorn entry point: gunicorn.conf.py settings, and a server started
+# from wsgi:application that runs a job from submission to its result.
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from bench_workers import ROOT, free_port, post_json, wait_ready
+from stub_translation_server import start_stub_server
+
+CONFIG = os.path.join(ROOT, 'gunicorn.conf.py')
+
+
+def test_one_threaded_worker_by_default(monkeypatch):
+    # Jobs, recording sessions and TTS streams are per worker, so more need sticky routing
+    monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    monkeypatch.delenv('WEB_THREADS', raising=False)
+    settings = runpy.run_path(CONFIG)
+    assert settings['workers'] == 1
+    assert settings['worker_class'] == 'gthread'
+    assert settings['threads'] > 1
+    assert settings['preload_app'] is True
+
+
+def test_worker_count_from_the_environment(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    assert runpy.run_path(CONFIG)['workers'] == 3
+
+
+@pytest.fixture
+def server(tmp_path):
+    pytest.importorskip('gunicorn')
+    stub = start_stub_server(delay_ms=5)
+    port = free_port()
+    env = dict(os.environ)
+    env.pop('WEB_CONCURRENCY', None)
+    env.update({
+        'BIND': f'127.0.0.1:{port}',
+        'PRELOAD_BEFORE_FORK': '0',
+        'PRELOAD_MODEL_PAIRS': '',
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'app.db'}",
+        'TRANSLATION_CACHE_DB': '',
+        'TRANSLATION_MEMORY_DB': '',
+        'TRANSLATION_BACKENDS': 'http',
+        'LIBRETRANSLATE_URL': stub.url,
+        'MODEL_DIR': str(tmp_path / 'models'),
+        'ASSETS_DIR': str(tmp_path / 'assets'),
+    })
+    # Run from a scratch directory: the audio folder is relative to the working directory
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', CONFIG, '--pythonpath', ROOT, 'wsgi:application'],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        wait_ready(f'{base}/ready', process, timeout=120)
+        yield base
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stub.shutdown()
+        stub.server_close()
+
+
+def test_job_is_found_by_the_follow_up_requests(server):
+    # translation1/2.html submit a job and then poll it; with one worker every poll finds it
+    accepted = post_json(f'{server}/api/jobs', {'text': 'hello', 'source_lang': 'en', 'target_lang': 'hi',
+                                                'audio': False})
+    deadline = time.monotonic() + 60
+    while True:
+        with urllib.request.urlopen(server + accepted['status_url'], timeout=10) as response:
+            job = json.loads(response.read().decode('utf-8'))
+        if job['state'] in ('done', 'failed') or time.monotonic() > deadline:
+            break
+        time.sleep(0.2)
+    assert job['state'] == 'done', job
+    assert job['result']['translated_text']
@@ -0,0 +1,313 @@
+# ======= Remote translation backends =======
+# One interface for every online translator the app talks to:
+#   google   - deep_translator's GoogleTranslator
+#   mymemory - the `translate` package (MyMemory provider)
+#   http     - any LibreTranslate-compatible server (POST {url}/translate)
+# BackendChain tries them in order.  Each call has its own timeout, each
+# backend has a circuit breaker so a provider that keeps failing is skipped
+# straight away, and with hedge_after set a second backend is started when the
+# first one is slow; whichever answers first wins.
+import contextvars
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import span
+
+
+class TranslationBackendError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    # closed: calls go through.  open: calls are skipped until reset_timeout has
+    # passed.  half-open: one trial call is let through; success closes the
+    # breaker again, failure opens it for another reset_timeout.
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class GoogleBackend:
+    name = 'google'
+
+    def translate(self, text, source_lang, target_lang):
+        from deep_translator import GoogleTranslator
+        return GoogleTranslator(source=source_lang, target=target_lang).translate(text)
+
+
+class MyMemoryBackend:
+    name = 'mymemory'
+
+    def translate(self, text, source_lang, target_lang):
+        from translate import Translator
+        translation = Translator(from_lang=source_lang, to_lang=target_lang).translate(text)
+        # MyMemory reports quota and errors in the translated text itself
+        if translation.startswith(('MYMEMORY WARNING', 'QUERY LENGTH LIMIT')):
+            raise TranslationBackendError(translation)
+        return translation
+
+
+class HTTPBackend:
+    # LibreTranslate API: POST /translate {"q", "source", "target", "format"} -> {"translatedText"}
+    name = 'http'
+
+    def __init__(self, url, api_key=None, timeout=10.0):
+        self.url = url.rstrip('/') + '/translate'
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def translate(self, text, source_lang, target_lang):
+        payload = {'q': text, 'source': source_lang, 'target': target_lang, 'format': 'text'}
+        if self.api_key:
+            payload['api_key'] = self.api_key
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            raise TranslationBackendError(f'{self.url} returned {e.code}')
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise TranslationBackendError(f'{self.url}: {e}')
+        if 'translatedText' not in body:
+            raise TranslationBackendError(body.get('error', 'No translatedText in response'))
+        return body['translatedText']
+
+
+def make_backend(name, http_url=None, http_api_key=None, timeout=10.0):
+    if name == 'google':
+        return GoogleBackend()
+    if name == 'mymemory':
+        return MyMemoryBackend()
+    if name == 'http':
+        if not http_url:
+            raise ValueError('The http translation backend needs a URL')
+        return HTTPBackend(http_url, http_api_key, timeout=timeout)
+    raise ValueError(f'Unknown translation backend: {name}')
+
+
+class _BackendState:
+    def __init__(self, backend, timeout, breaker):
+        self.backend = backend
+        self.timeout = timeout
+        self.breaker = breaker
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.latencies = deque(maxlen=1000)
+
+
+class BackendChain:
+    def __init__(self, backends, timeouts=None, hedge_after=None, failure_threshold=5, reset_timeout=30.0,
+                 max_workers=16):
+        # timeouts: {backend name: seconds}, 10 seconds for any backend not listed
+        timeouts = timeouts or {}
+        self._states = [
+            _BackendState(backend, timeouts.get(backend.name, 10.0), CircuitBreaker(failure_threshold, reset_timeout))
+            for backend in backends
+        ]
+        self.hedge_after = hedge_after
+        # Calls that time out keep their thread until the client gives up, so leave some headroom
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='translate-backend')
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.exhausted = 0
+
+    @property
+    def names(self):
+        return [state.backend.name for state in self._states]
+
+    def _call(self, state, text, source_lang, target_lang):
+        started = time.perf_counter()
+        with span('remote_call', backend=state.backend.name, pair=f'{source_lang}-{target_lang}'):
+            translation = state.backend.translate(text, source_lang, target_lang)
+        if not translation:
+            raise TranslationBackendError('Empty translation')
+        return translation, time.perf_counter() - started
+
+    def translate(self, text, source_lang, target_lang):
+        # Returns the first successful translation, raises TranslationBackendError when every backend failed
+        candidates = list(self._states)
+        errors = []
+        pending = {}  # future -> (state, deadline, started as a hedge)
+
+        def launch(hedge=False):
+            # Starts the next backend whose breaker lets the call through; False when none is left
+            while candidates:
+                state = candidates.pop(0)
+                if not state.breaker.allow():
+                    with self._lock:
+                        state.skipped += 1
+                    errors.append(f'{state.backend.name}: circuit open')
+                    continue
+                with self._lock:
+                    state.calls += 1
+                    if hedge:
+                        self.hedges += 1
+                # copy_context() so the remote_call span lands in the trace of the request being served
+                future = self._executor.submit(contextvars.copy_context().run, self._call, state, text, source_lang,
+                                               target_lang)
+                pending[future] = (state, time.monotonic() + state.timeout, hedge)
+                return True
+            return False
+
+        launch()
+        hedge_at = time.monotonic() + self.hedge_after if self.hedge_after is not None else None
+        while pending:
+            wake_at = min(deadline for _, deadline, _ in pending.values())
+            if hedge_at is not None and candidates:
+                wake_at = min(wake_at, hedge_at)
+            done, _ = wait(list(pending), timeout=max(0.0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                state, _, hedge = pending.pop(future)
+                try:
+                    translation, seconds = future.result()
+                except Exception as e:
+                    self._record_failure(state)
+                    errors.append(f'{state.backend.name}: {e}')
+                    continue
+                self._record_success(state, seconds, hedge)
+                for other, (other_state, _, _) in pending.items():
+                    # The loser of a hedge still has to settle its breaker (it may be a half-open trial)
+                    other.add_done_callback(lambda f, other_state=other_state: self._settle(other_state, f))
+                return translation
+
+            now = time.monotonic()
+            for future, (state, deadline, _) in list(pending.items()):
+                if now >= deadline:
+                    del pending[future]
+                    with self._lock:
+                        state.timeouts += 1
+                    self._record_failure(state)
+                    errors.append(f'{state.backend.name}: timed out after {state.timeout}s')
+
+            if not pending:
+                launch()
+            elif hedge_at is not None and now >= hedge_at:
+                # The current backend is slow: race the next one against it
+                hedge_at = None
+                launch(hedge=True)
+
+        with self._lock:
+            self.exhausted += 1
+        raise TranslationBackendError('; '.join(errors) or 'No translation backends configured')
+
+    def _record_success(self, state, seconds, hedged):
+        state.breaker.record_success()
+        with self._lock:
+            state.successes += 1
+            state.latencies.append(seconds)
+            if hedged:
+                self.hedge_wins += 1
+
+    def _settle(self, state, future):
+        if future.exception() is None:
+            state.breaker.record_success()
+        else:
+            state.breaker.record_failure()
+
+    def _record_failure(self, state):
+        state.breaker.record_failure()
+        with self._lock:
+            state.failures += 1
+
+    def stats(self):
+        with self._lock:
+            backends = {}
+            for state in self._states:
+                latencies = sorted(state.latencies)
+                backends[state.backend.name] = {
+                    'state': state.breaker.state,
+                    'timeout_seconds': state.timeout,
+                    'calls': state.calls,
+                    'successes': state.successes,
+                    'failures': state.failures,
+                    'timeouts': state.timeouts,
+                    'skipped': state.skipped,
+                    'latency_p50': round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+                    'latency_p95': round(latencies[int(len(latencies) * 0.95)], 3) if latencies else 0.0,
+                }
+            return {
+                'backends': backends,
+                'hedge_after_seconds': self.hedge_after,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'exhausted': self.exhausted,
+            }
+
+
+def parse_timeouts(value, default):
+    # "google:3,http:1.5" -> {'google': 3.0, 'http': 1.5}; bare numbers set the default
+    timeouts = {}
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if ':' in part:
+            name, seconds = part.split(':', 1)
+            timeouts[name.strip()] = float(seconds)
+        else:
+            default = float(part)
+    return timeouts, default
+
+
+def build_chain(names, timeouts='', default_timeout=10.0, hedge_after=None, failure_threshold=5,
+                reset_timeout=30.0, http_url=None, http_api_key=None):
+    # names: "google,mymemory" or a list; the http backend is skipped when no URL is configured
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    per_backend, default_timeout = parse_timeouts(timeouts, default_timeout)
+    backends = []
+    for name in names:
+        if name == 'http' and not http_url:
+            print("Translation backend 'http' skipped: no URL configured")
+            continue
+        timeout = per_backend.get(name, default_timeout)
+        per_backend[name] = timeout
+        backends.append(make_backend(name, http_url, http_api_key, timeout=timeout))
+    return BackendChain(backends, timeouts=per_backend, hedge_after=hedge_after,
+                        failure_threshold=failure_threshold, reset_timeout=reset_timeout)
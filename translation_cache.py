@@ -0,0 +1,198 @@
+# ======= Shared translation cache =======
+# One cache for the whole process, keyed on (text, source, target, backend).
+# Memory tier is an LRU with a TTL; the optional SQLite tier survives restarts.
+# Concurrent requests for the same key wait for a single upstream call.
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class _InflightCall:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class TranslationCache:
+    def __init__(self, max_entries=10000, ttl_seconds=7 * 86400, db_path=None, max_disk_entries=200000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+
+        self._entries = OrderedDict()  # key -> (translation, stored_at), least recently used first
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+        self._db = None
+        self._db_path = db_path
+        self._db_lock = threading.Lock()
+        self._disk_writes = 0
+        if db_path:
+            self._open_db(db_path)
+
+    def reopen(self):
+        # SQLite connections must not be used across fork(); each pre-fork worker opens its own
+        if self._db_path:
+            with self._db_lock:
+                self._open_db(self._db_path)
+
+    def _open_db(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            ' key_hash TEXT PRIMARY KEY,'
+            ' translation TEXT NOT NULL,'
+            ' stored_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS ix_translations_stored_at ON translations (stored_at)')
+
+    @staticmethod
+    def _hash_key(key):
+        return hashlib.sha256('\x1f'.join(key).encode('utf-8')).hexdigest()
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                if not self._expired(item[1], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return item[0]
+                del self._entries[key]
+                self.expirations += 1
+
+        translation = self._disk_get(key, now)
+        with self._lock:
+            if translation is not None:
+                self.disk_hits += 1
+                self._store_locked(key, translation, now)
+            else:
+                self.misses += 1
+        return translation
+
+    def set(self, key, translation):
+        now = time.time()
+        with self._lock:
+            self._store_locked(key, translation, now)
+        self._disk_set(key, translation, now)
+
+    def get_or_compute(self, key, compute):
+        # compute() returns the translation, or None when it failed (failures are not cached)
+        translation = self.get(key)
+        if translation is not None:
+            return translation
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+            if call.result is not None:
+                self.set(key, call.result)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    def _store_locked(self, key, translation, now):
+        self._entries[key] = (translation, now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                'SELECT translation, stored_at FROM translations WHERE key_hash = ?', (self._hash_key(key),)
+            ).fetchone()
+        if row is None or self._expired(row[1], now):
+            return None
+        return row[0]
+
+    def _disk_set(self, key, translation, now):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO translations (key_hash, translation, stored_at) VALUES (?, ?, ?)',
+                (self._hash_key(key), translation, now),
+            )
+            self._disk_writes += 1
+            # Prune now and then rather than on every write
+            if self._disk_writes % 1000 == 0:
+                self._prune_disk_locked(now)
+
+    def _prune_disk_locked(self, now):
+        if self.ttl_seconds is not None:
+            self._db.execute('DELETE FROM translations WHERE stored_at < ?', (now - self.ttl_seconds,))
+        if self.max_disk_entries is not None:
+            self._db.execute(
+                'DELETE FROM translations WHERE key_hash IN ('
+                ' SELECT key_hash FROM translations ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_disk_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute('DELETE FROM translations')
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+                'inflight': len(self._inflight),
+            }
+        if self._db is not None:
+            with self._db_lock:
+                stats['disk_entries'] = self._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+        return stats
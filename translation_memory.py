@@ -0,0 +1,316 @@
+# ======= Translation memory =======
+# Remembers source segments and their translations per language pair and finds
+# near-repeats: the same sentence with different casing, punctuation or a small
+# edit.  Text is normalized, split into character n-grams and summarized with a
+# MinHash signature; LSH bands of the signature are stored in SQLite, so a
+# lookup only compares against the handful of segments that share a band.
+# Candidates are then scored with the exact n-gram Jaccard similarity.
+#
+# The whole index lives in the SQLite file (nothing is kept in memory), so it
+# survives restarts and can hold a full parallel corpus such as hind_encorp.
+import csv
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+MemoryMatch = namedtuple('MemoryMatch', ['translation', 'similarity', 'source'])
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_MASK64 = (1 << 64) - 1
+
+
+def normalize(text):
+    # Case, punctuation (including the danda) and spacing do not change the translation
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ''.join(' ' if unicodedata.category(ch)[0] in 'PS' else ch for ch in text)
+    return ' '.join(text.split())
+
+
+def shingles(normalized, n=3):
+    padded = f' {normalized} '
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash64(value, signed=False):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big', signed=signed)
+
+
+class TranslationMemory:
+    def __init__(self, db_path=None, threshold=0.9, num_perm=64, bands=16, ngram=3, max_candidates=50):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.max_candidates = max_candidates
+
+        # Fixed seed: signatures have to match the ones already stored on disk
+        rng = random.Random(1)
+        self._permutations = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                              for _ in range(num_perm)]
+        self._numpy = None  # (numpy, a, b) once the first signature is computed, False without numpy
+
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.added = 0
+        self._db_path = db_path
+        self._open_db(db_path or ':memory:')
+
+    def reopen(self):
+        # SQLite connections must not be used across fork(); an in-memory memory is just kept
+        if self._db_path:
+            with self._lock:
+                self._open_db(self._db_path)
+
+    def _open_db(self, db_path):
+        directory = os.path.dirname(db_path)
+        if db_path != ':memory:' and directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS tm_segments ('
+            ' id INTEGER PRIMARY KEY,'
+            ' source_lang TEXT NOT NULL,'
+            ' target_lang TEXT NOT NULL,'
+            ' normalized TEXT NOT NULL,'
+            ' source TEXT NOT NULL,'
+            ' translation TEXT NOT NULL,'
+            ' origin TEXT NOT NULL,'
+            ' stored_at REAL NOT NULL,'
+            ' UNIQUE (source_lang, target_lang, normalized))'
+        )
+        # One row per (LSH band bucket, segment); the bucket hash already includes the pair and band number
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS tm_bands ('
+            ' bucket INTEGER NOT NULL,'
+            ' segment_id INTEGER NOT NULL,'
+            ' PRIMARY KEY (bucket, segment_id)) WITHOUT ROWID'
+        )
+        self._db.execute('CREATE TABLE IF NOT EXISTS tm_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+        settings = {'num_perm': str(self.num_perm), 'bands': str(self.bands), 'ngram': str(self.ngram)}
+        stored = dict(self._db.execute('SELECT key, value FROM tm_meta').fetchall())
+        if stored and stored != settings:
+            raise ValueError(f'Translation memory was built with {stored}, not {settings}; rebuild it or use those settings')
+        self._db.executemany('INSERT OR IGNORE INTO tm_meta (key, value) VALUES (?, ?)', settings.items())
+
+    def signature(self, grams):
+        # (a * h + b) wraps at 64 bits as in numpy, so both paths give the same signatures
+        hashes = [_hash64(gram) for gram in grams]
+        if self._numpy is None:
+            self._numpy = self._load_numpy()
+        if self._numpy:
+            numpy, a, b = self._numpy
+            values = (a * numpy.array(hashes, dtype=numpy.uint64) + b) % numpy.uint64(_MERSENNE_PRIME)
+            return (values & numpy.uint64(_MAX_HASH)).min(axis=1).tolist()
+        return [min((((a * h + b) & _MASK64) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+                for a, b in self._permutations]
+
+    def _load_numpy(self):
+        # Imported on first use so app startup does not pay for it; pure Python gives the same result, slower
+        try:
+            import numpy
+        except ImportError:
+            return False
+        a = numpy.array([a for a, _ in self._permutations], dtype=numpy.uint64)[:, None]
+        b = numpy.array([b for _, b in self._permutations], dtype=numpy.uint64)[:, None]
+        return numpy, a, b
+
+    def _buckets(self, signature, source_lang, target_lang):
+        return [
+            _hash64(f'{source_lang}\x1f{target_lang}\x1f{band}\x1f'
+                    + ','.join(map(str, signature[band * self.rows:(band + 1) * self.rows])), signed=True)
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, text, source_lang, target_lang, threshold=None):
+        # Returns the most similar stored segment at or above the threshold, or None
+        threshold = self.threshold if threshold is None else threshold
+        normalized = normalize(text)
+        if not normalized:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT translation, source FROM tm_segments WHERE source_lang = ? AND target_lang = ? AND normalized = ?',
+                (source_lang, target_lang, normalized),
+            ).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+                return MemoryMatch(row[0], 1.0, row[1])
+            if threshold >= 1.0:
+                self.misses += 1
+                return None
+
+        grams = shingles(normalized, self.ngram)
+        buckets = self._buckets(self.signature(grams), source_lang, target_lang)
+        placeholders = ','.join('?' * len(buckets))
+        with self._lock:
+            # Segments sharing the most bands are the likeliest matches
+            candidates = self._db.execute(
+                f'SELECT s.normalized, s.translation, s.source FROM tm_segments s JOIN ('
+                f' SELECT segment_id, COUNT(*) AS shared FROM tm_bands WHERE bucket IN ({placeholders})'
+                f' GROUP BY segment_id ORDER BY shared DESC LIMIT ?) c ON c.segment_id = s.id',
+                (*buckets, self.max_candidates),
+            ).fetchall()
+
+        best = None
+        for candidate, translation, source in candidates:
+            similarity = jaccard(grams, shingles(candidate, self.ngram))
+            if similarity >= threshold and (best is None or similarity > best.similarity):
+                best = MemoryMatch(translation, round(similarity, 3), source)
+
+        with self._lock:
+            if best is None:
+                self.misses += 1
+            else:
+                self.fuzzy_hits += 1
+        return best
+
+    def add(self, source, translation, source_lang, target_lang, origin='mt'):
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                added = self._insert_locked(source, translation, source_lang, target_lang, origin, time.time(),
+                                            replace=True)
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            self.added += added
+
+    def bulk_load(self, pairs, source_lang, target_lang, origin='corpus', batch_size=1000, limit=None):
+        # pairs: iterable of (source, translation).  Segments already in the memory are kept as they are.
+        # Returns the number of new segments.
+        added = 0
+        seen = 0
+        batch = []
+        for source, translation in pairs:
+            if not source or not translation:
+                continue
+            batch.append((source, translation))
+            seen += 1
+            if len(batch) >= batch_size:
+                added += self._load_batch(batch, source_lang, target_lang, origin)
+                batch = []
+            if limit is not None and seen >= limit:
+                break
+        if batch:
+            added += self._load_batch(batch, source_lang, target_lang, origin)
+        return added
+
+    def _load_batch(self, batch, source_lang, target_lang, origin):
+        # Signatures are computed outside the lock; one transaction per batch
+        now = time.time()
+        prepared = []
+        for source, translation in batch:
+            normalized = normalize(source)
+            if normalized:
+                buckets = self._buckets(self.signature(shingles(normalized, self.ngram)), source_lang, target_lang)
+                prepared.append((normalized, buckets, source, translation))
+        added = 0
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                for normalized, buckets, source, translation in prepared:
+                    added += self._insert_locked(source, translation, source_lang, target_lang, origin, now,
+                                                 normalized=normalized, buckets=buckets)
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            self.added += added
+        return added
+
+    def _insert_locked(self, source, translation, source_lang, target_lang, origin, now, normalized=None,
+                       buckets=None, replace=False):
+        normalized = normalized or normalize(source)
+        if not normalized:
+            return 0
+        cursor = self._db.execute(
+            'INSERT OR IGNORE INTO tm_segments (source_lang, target_lang, normalized, source, translation, origin, stored_at)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (source_lang, target_lang, normalized, source, translation, origin, now),
+        )
+        if cursor.rowcount == 0:
+            if replace:
+                self._db.execute(
+                    'UPDATE tm_segments SET translation = ?, origin = ?, stored_at = ?'
+                    ' WHERE source_lang = ? AND target_lang = ? AND normalized = ?',
+                    (translation, origin, now, source_lang, target_lang, normalized),
+                )
+            return 0
+
+        segment_id = cursor.lastrowid
+        if buckets is None:
+            buckets = self._buckets(self.signature(shingles(normalized, self.ngram)), source_lang, target_lang)
+        self._db.executemany('INSERT OR IGNORE INTO tm_bands (bucket, segment_id) VALUES (?, ?)',
+                             [(bucket, segment_id) for bucket in buckets])
+        return 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.fuzzy_hits + self.misses
+            segments = self._db.execute(
+                'SELECT source_lang, target_lang, COUNT(*) FROM tm_segments GROUP BY source_lang, target_lang'
+            ).fetchall()
+            return {
+                'segments': {f'{source}-{target}': count for source, target, count in segments},
+                'threshold': self.threshold,
+                'exact_hits': self.exact_hits,
+                'fuzzy_hits': self.fuzzy_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.exact_hits + self.fuzzy_hits) / lookups, 3) if lookups else 0.0,
+                'added': self.added,
+            }
+
+
+def read_parallel_file(path, source_lang, target_lang):
+    # Yields (source, translation) from:
+    #   .jsonl - {"en": "...", "hi": "..."} or {"translation": {"en": "...", "hi": "..."}} per line
+    #   .csv   - a header row with the two language codes as column names
+    #   other  - one "source<TAB>translation" pair per line
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    record = record.get('translation', record)
+                    yield record.get(source_lang), record.get(target_lang)
+        elif path.lower().endswith('.csv'):
+            for record in csv.DictReader(f):
+                yield record.get(source_lang), record.get(target_lang)
+        else:
+            for line in f:
+                parts = line.rstrip('\r\n').split('\t')
+                if len(parts) >= 2 and parts[:2] != [source_lang, target_lang]:  # Skip a header row
+                    yield parts[0], parts[1]
+
+
+def read_parallel_dataset(name, source_lang, target_lang, split='train'):
+    # Hugging Face datasets with a "translation" column, e.g. hind_encorp (the notebook's corpus)
+    from datasets import load_dataset
+
+    for item in load_dataset(name, split=split):
+        yield item['translation'][source_lang], item['translation'][target_lang]
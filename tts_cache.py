@@ -0,0 +1,195 @@
+# ======= Content-addressed TTS audio cache =======
+# Audio files are named after a hash of (text, lang, slow), so a phrase that
+# was synthesized before is served from disk instead of calling gTTS again.
+# New files are written to a temp name and renamed into place, and concurrent
+# requests for the same audio wait for one synthesis.  Texts can also be
+# registered under their key so the audio can be streamed by key before any
+# file exists.
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+CACHE_PREFIX = 'tts_'
+
+
+class _InflightSynthesis:
+    def __init__(self):
+        self.event = threading.Event()
+        self.path = None
+
+
+class TTSCache:
+    def __init__(self, folder, max_bytes=500 * 1024 * 1024, on_store=None, on_evict=None):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.on_store = on_store  # Called with the path of every newly written file
+        self.on_evict = on_evict  # Called with the file name of every file evicted for the size quota
+
+        self._index = None  # filename -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._texts = OrderedDict()  # key -> (text, lang, slow) waiting to be streamed, newest last
+        self.max_texts = 1000
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(text, lang, slow=False):
+        return hashlib.sha256(f'{lang}\x1f{int(slow)}\x1f{text}'.encode('utf-8')).hexdigest()[:32]
+
+    def path_for(self, text, lang, slow=False):
+        return os.path.join(self.folder, f'{CACHE_PREFIX}{self.key_for(text, lang, slow)}.mp3')
+
+    def path_for_key(self, key):
+        return os.path.join(self.folder, f'{CACHE_PREFIX}{key}.mp3')
+
+    def cached_path(self, key):
+        # Path of the finished audio for key, or None if it has not been made (or was evicted)
+        path = self.path_for_key(key)
+        with self._lock:
+            self._load_index_locked()
+            if f'{CACHE_PREFIX}{key}.mp3' not in self._index or not os.path.exists(path):
+                return None
+            self._index.move_to_end(f'{CACHE_PREFIX}{key}.mp3')
+            self.hits += 1
+        self._touch(path)
+        return path
+
+    def register_text(self, text, lang, slow=False):
+        # Remembers the text so GET by key can synthesize it on the fly; returns the key
+        key = self.key_for(text, lang, slow)
+        with self._lock:
+            self._texts[key] = (text, lang, slow)
+            self._texts.move_to_end(key)
+            while len(self._texts) > self.max_texts:
+                self._texts.popitem(last=False)
+        return key
+
+    def registered_text(self, key):
+        with self._lock:
+            return self._texts.get(key)
+
+    def _load_index_locked(self):
+        # Built once from the directory, oldest first, then kept up to date in memory
+        if self._index is not None:
+            return
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder, exist_ok=True)
+            return
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name.startswith(CACHE_PREFIX) and entry.name.endswith('.mp3'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._index[name] = size
+            self._total_bytes += size
+
+    def get_or_create(self, text, lang, synthesize, slow=False):
+        # synthesize(path) writes an MP3 to path and returns True on success.
+        # Returns the cached audio path, or None when synthesis failed.
+        path = self.path_for(text, lang, slow)
+        name = os.path.basename(path)
+
+        with self._lock:
+            self._load_index_locked()
+            if name in self._index and os.path.exists(path):
+                self._index.move_to_end(name)
+                self.hits += 1
+                hit = True
+            else:
+                hit = False
+                call = self._inflight.get(name)
+                leader = call is None
+                if leader:
+                    call = self._inflight[name] = _InflightSynthesis()
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+
+        if hit:
+            self._touch(path)
+            return path
+
+        if not leader:
+            call.event.wait()
+            return call.path
+
+        try:
+            call.path = self._synthesize(path, synthesize)
+            return call.path
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+            call.event.set()
+
+    def _synthesize(self, path, synthesize):
+        name = os.path.basename(path)
+        temp_path = os.path.join(self.folder, f'.{name}.{uuid.uuid4().hex}.tmp')
+        try:
+            if not synthesize(temp_path):
+                return None
+            os.replace(temp_path, path)  # Atomic, so readers never see a half-written file
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes += size - self._index.pop(name, 0)
+            self._index[name] = size
+            self._evict_locked(keep=name)
+        if self.on_store is not None:
+            self.on_store(path)
+        return path
+
+    def _touch(self, path):
+        # Keep mtime in step with last use so the order survives a restart
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def _evict_locked(self, keep=None):
+        for name in list(self._index):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            size = self._index.pop(name)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                pass
+            if self.on_evict is not None:
+                self.on_evict(name)
+
+    def forget(self, name):
+        # Called when a cached file is removed by someone else (e.g. the cleanup job)
+        with self._lock:
+            if self._index is not None and name in self._index:
+                self._total_bytes -= self._index.pop(name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._index or ()),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,24 @@
+# ======= Multi-process entry point =======
+#   gunicorn -c gunicorn.conf.py wsgi:application
+# With preload_app this module is imported once in the gunicorn parent.  The
+# preload models are loaded here, before the workers fork, so every worker
+# reads the same physical pages for the weights (copy-on-write, and nothing
+# ever writes to them) instead of holding its own copy.  Each worker then
+# runs app.after_fork() from the post_fork hook.
+import gc
+
+from app import app, init_storage, warm_up
+
+init_storage()
+
+# ONNX Runtime and CTranslate2 start their own thread pools while loading, which
+# do not survive fork(); those backends load in each worker on first use instead
+if app.config['PRELOAD_BEFORE_FORK'] and app.config['INFERENCE_BACKEND'] in ('torch', 'torch-int8'):
+    warm_up(pin=True)
+
+# Everything allocated so far lives for the whole process.  Moving it out of the
+# garbage collector's generations stops the workers' collections from writing to
+# (and so copying) the pages of these shared objects.
+gc.freeze()
+
+application = app